@@ -17,6 +17,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "cloudinary_storage",
     "cloudinary",
     "django_htmx",
@@ -29,9 +30,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "events.timing.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "events.staticfiles.StaticFilesMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
+    "events.routing.ReplicaPinMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
@@ -56,11 +59,10 @@ ROOT_URLCONF = "core.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "events.timing.TimedDjangoTemplates",
         "DIRS": [
             BASE_DIR / "templates",
         ],
-        "APP_DIRS": True,
         "OPTIONS": {
             "context_processors": [
                 "django.template.context_processors.debug",
@@ -68,6 +70,16 @@ TEMPLATES = [
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
             ],
+            # Compiled templates are kept per process, event cards are included many times
+            "loaders": [
+                (
+                    "django.template.loaders.cached.Loader",
+                    [
+                        "django.template.loaders.filesystem.Loader",
+                        "django.template.loaders.app_directories.Loader",
+                    ],
+                ),
+            ],
         },
     },
 ]
@@ -175,5 +187,47 @@ PASSWORD_HASHERS = [
 
 STRIPE_API_PUBLIC = os.environ.get("STRIPE_API_PUBLIC")
 STRIPE_API_SECRET = os.environ.get("STRIPE_API_SECRET")
+STRIPE_WEBHOOK_SECRET = os.environ.get("STRIPE_WEBHOOK_SECRET")
+
+PAYMENT_GATEWAY = "events.gateways.StripeGateway"
+# events.gateways.FakeGateway completes checkouts in-process for offline load tests, it is
+# only built with DEBUG on or with this set in a non production settings module
+PAYMENT_GATEWAY_ALLOW_FAKE = False
+# Seconds, a slow Stripe call fails the checkout instead of holding a worker
+PAYMENT_GATEWAY_TIMEOUT = 10
+PAYMENT_GATEWAY_CONNECT_TIMEOUT = 3
+PAYMENT_GATEWAY_MAX_RETRIES = 2
+# Simulated round trip of FakeGateway
+PAYMENT_GATEWAY_FAKE_LATENCY = 0.0
 
 STATIC_HOST = os.environ.get("STATIC_HOST", "")
+
+# Turns Event.location into coordinates, events.geo.NominatimGeocoder asks OpenStreetMap
+GEOCODER = os.environ.get("GEOCODER", "events.geo.FixtureGeocoder")
+GEOCODER_FIXTURE = BASE_DIR / "events" / "data" / "places.json"
+GEOCODER_TIMEOUT = 5
+GEOCODER_USER_AGENT = "Eventio (https://eventio.madgotten.me)"
+
+# Days after their date events are moved to the archive tables by archive_events
+EVENT_ARCHIVE_AFTER_DAYS = int(os.environ.get("EVENT_ARCHIVE_AFTER_DAYS", 180))
+
+# Seconds anonymous responses of the event pages are cached, 0 turns the page cache off
+PAGE_CACHE_TIMEOUT = 300
+
+DATABASE_ROUTERS = ["events.routing.ReplicaRouter"]
+# Aliases in DATABASES that replicate "default", the event pages read from them
+DATABASE_REPLICAS = []
+# Seconds a client reads from the primary after writing
+DATABASE_REPLICA_PIN_SECONDS = 15
+
+# Share of requests whose Server-Timing measurements are also logged
+SERVER_TIMING_LOG_SAMPLE_RATE = float(os.environ.get("SERVER_TIMING_LOG_SAMPLE_RATE", 0.0))
+
+# Process uploaded banners in-process instead of waiting for run_banner_worker
+BANNER_JOBS_EAGER = False
+
+# Geocode saved events in-process instead of waiting for run_geocode_worker
+GEOCODE_JOBS_EAGER = False
+
+# Flush the email outbox after commit instead of waiting for send_outbox
+EMAIL_OUTBOX_EAGER = False
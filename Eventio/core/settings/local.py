@@ -1,7 +1,9 @@
 from .base import *  # noqa: F401, F403
 from .base import INSTALLED_APPS
 from .base import MIDDLEWARE
+from .base import PAYMENT_GATEWAY
 from .base import STORAGES
+import os
 
 DEBUG = True
 
@@ -34,9 +36,22 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": "database",
-    }
+    },
+    # Add "replica" to DATABASE_REPLICAS to try the routing, tests give it its own database
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": "database",
+    },
 }
 
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
 STORAGES["default"] = {"BACKEND": "django.core.files.storage.FileSystemStorage"}
+
+# PAYMENT_GATEWAY=events.gateways.FakeGateway for offline load tests
+PAYMENT_GATEWAY = os.environ.get("PAYMENT_GATEWAY", PAYMENT_GATEWAY)
+PAYMENT_GATEWAY_FAKE_LATENCY = float(os.environ.get("PAYMENT_GATEWAY_FAKE_LATENCY", 0.0))
+
+BANNER_JOBS_EAGER = True
+GEOCODE_JOBS_EAGER = True
+EMAIL_OUTBOX_EAGER = True
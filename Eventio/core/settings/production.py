@@ -48,6 +48,15 @@ DATABASES = {
     }
 }
 
+# Comma separated hosts of streaming replicas of the primary
+for index, host in enumerate(filter(None, os.environ.get("DB_REPLICA_HOSTS", "").split(","))):
+    DATABASES[f"replica_{index}"] = {
+        **DATABASES["default"],
+        "HOST": host.strip(),
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias.startswith("replica_")]
+
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
 EMAIL_HOST = os.environ.get("EMAIL_HOST")
 EMAIL_USE_TLS = True
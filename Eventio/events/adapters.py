@@ -1,15 +1,20 @@
 import logging
-import threading
 from allauth.account.adapter import DefaultAccountAdapter
+from allauth.core import context as allauth_context
+from django.contrib.sites.shortcuts import get_current_site
+from events.mail import enqueue_message
 
 logger = logging.getLogger(__name__)
 
 
 class CustomAccountAdapter(DefaultAccountAdapter):
     def send_mail(self, template_prefix, email, context):
-        logger.info(f"Sending email to {email}")
-        mailing_thread = threading.Thread(
-            target=super().send_mail(template_prefix, email, context),
-            args=(template_prefix, email, context),
-        )
-        mailing_thread.start()
+        logger.info(f"Queueing email to {email}")
+        request = allauth_context.request
+        ctx = {
+            "request": request,
+            "email": email,
+            "current_site": get_current_site(request),
+        }
+        ctx.update(context)
+        enqueue_message(self.render_mail(template_prefix, email, ctx))
@@ -1,6 +1,16 @@
 from django.contrib import admin
 from allauth.account.decorators import secure_admin_login
-from events.models import Event, Ticket, Registration, Review, Purchase
+from events.models import (
+    Event,
+    Ticket,
+    Registration,
+    Review,
+    Purchase,
+    BannerJob,
+    GeocodeJob,
+    OutboxEmail,
+    EventDailyStats,
+)
 
 
 admin.autodiscover()
@@ -40,3 +50,31 @@ class PurchaseAdmin(admin.ModelAdmin):
     search_fields = ("user",)
     list_filter = ("purchased_at",)
     readonly_fields = ("purchased_at",)
+
+
+@admin.register(BannerJob)
+class BannerJobAdmin(admin.ModelAdmin):
+    list_display = ("event", "status", "attempts", "created_at")
+    list_filter = ("status",)
+    readonly_fields = ("created_at", "updated_at")
+
+
+@admin.register(GeocodeJob)
+class GeocodeJobAdmin(admin.ModelAdmin):
+    list_display = ("event", "location", "status", "attempts", "created_at")
+    list_filter = ("status",)
+    readonly_fields = ("created_at", "updated_at")
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ("subject", "status", "attempts", "next_attempt_at", "created_at")
+    list_filter = ("status",)
+    readonly_fields = ("created_at", "sent_at")
+
+
+@admin.register(EventDailyStats)
+class EventDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ("event", "day", "registrations", "tickets_sold", "revenue")
+    list_filter = ("day",)
+    search_fields = ("event__title",)
@@ -0,0 +1,141 @@
+"""
+Archival of finished events.
+
+``archive_batch()`` moves events that took place before a cutoff, with their registrations,
+reviews, purchases and daily stats, into the archive tables in one transaction. Archived rows
+keep their ids, so ``event_detail`` can redirect to the archived page and the live tables only
+hold events people can still attend or just attended. The live rows are deleted through the
+ORM's cascade while ``is_archiving()`` tells the signal receivers to leave them alone.
+"""
+
+from contextvars import ContextVar
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from events.caching import SECTIONS, bump_generations
+from events.facets import forget_facet_counts
+from events.membership import forget_membership
+from events.models import (
+    ArchivedEvent,
+    ArchivedEventDailyStats,
+    ArchivedPurchase,
+    ArchivedRegistration,
+    ArchivedReview,
+    Event,
+    EventDailyStats,
+    Purchase,
+    Registration,
+    Review,
+    Ticket,
+)
+from events.page_cache import purge_pages
+from events.querysets import events_to_archive
+
+EVENT_FIELDS = [
+    "id",
+    "title",
+    "description",
+    "location",
+    "date",
+    "category",
+    "banner",
+    "event_type",
+    "created_by_id",
+    "created_at",
+    "updated_at",
+    "status",
+    "registration_count",
+    "rating_sum",
+    "review_count",
+]
+
+
+_archiving = ContextVar("archiving", default=False)
+
+
+def is_archiving():
+    """
+    True while ``archive_batch`` deletes archived rows. Their copies keep counters and banners,
+    and caches are invalidated once per batch, so per row receivers have nothing to do.
+    """
+    return _archiving.get()
+
+
+def archive_cutoff(days=None):
+    if days is None:
+        days = settings.EVENT_ARCHIVE_AFTER_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+@transaction.atomic
+def archive_batch(cutoff, batch_size):
+    """Archive up to ``batch_size`` events that took place before ``cutoff``, return how many"""
+    # Registrations and purchases lock the event or ticket row they point to, so none can be
+    # added between copying and deleting
+    ids = list(
+        events_to_archive(cutoff).select_for_update().values_list("pk", flat=True)[:batch_size]
+    )
+    if not ids:
+        return 0
+    list(Ticket.objects.filter(event__in=ids).select_for_update().values_list("pk", flat=True))
+
+    events = Event.objects.filter(pk__in=ids).select_related("ticket")
+    ArchivedEvent.objects.bulk_create(
+        ArchivedEvent(
+            **{field: getattr(event, field) for field in EVENT_FIELDS},
+            ticket_price=event.ticket.price if hasattr(event, "ticket") else None,
+        )
+        for event in events
+    )
+
+    registrations = Registration.objects.filter(event__in=ids)
+    reviews = Review.objects.filter(event__in=ids)
+    purchases = Purchase.objects.filter(ticket__event__in=ids)
+    ArchivedRegistration.objects.bulk_create(
+        ArchivedRegistration(**row)
+        for row in registrations.values("id", "user_id", "event_id", "registered_at")
+    )
+    ArchivedReview.objects.bulk_create(
+        ArchivedReview(**row)
+        for row in reviews.values("id", "user_id", "event_id", "rating", "comment", "created_at")
+    )
+    ArchivedPurchase.objects.bulk_create(
+        ArchivedPurchase(**row)
+        for row in purchases.values(
+            "id",
+            "user_id",
+            "quantity",
+            "event_name",
+            "amount_paid",
+            "purchased_at",
+            "session_id",
+            event_id=F("ticket__event_id"),
+        )
+    )
+    ArchivedEventDailyStats.objects.bulk_create(
+        ArchivedEventDailyStats(**row)
+        for row in EventDailyStats.objects.filter(event__in=ids).values(
+            "event_id", "day", "registrations", "tickets_sold", "revenue"
+        )
+    )
+
+    user_ids = {
+        *registrations.values_list("user_id", flat=True),
+        *reviews.values_list("user_id", flat=True),
+        *purchases.values_list("user_id", flat=True),
+    }
+    # Cascades to every row pointing at the events, whatever tables are added later
+    token = _archiving.set(True)
+    try:
+        Event.objects.filter(pk__in=ids).delete()
+    finally:
+        _archiving.reset(token)
+
+    purge_pages("events", *(f"event:{pk}" for pk in ids))
+    bump_generations(*SECTIONS)
+    forget_facet_counts()
+    for user_id in user_ids:
+        forget_membership(user_id)
+    return len(ids)
@@ -0,0 +1,127 @@
+"""
+Background banner processing.
+
+``Event.save()`` stores the raw upload and queues a ``BannerJob``. The ``run_banner_worker``
+command claims queued jobs, renders them in a process pool and swaps the processed banner
+onto the event. Jobs of a worker that died mid-render are claimed again once their lease
+expires. With ``BANNER_JOBS_EAGER`` (local settings and tests) jobs run in-process
+as soon as they are queued.
+"""
+
+import logging
+import uuid
+from concurrent.futures import as_completed
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from events.helpers import render_banner
+from events.models import BannerJob, Event
+
+logger = logging.getLogger(__name__)
+
+# A claimed job is not picked up again by another worker until its lease expires
+LEASE = timedelta(minutes=5)
+
+
+def banner_storage():
+    return Event._meta.get_field("banner").storage
+
+
+def enqueue_banner(event, previous=""):
+    job = BannerJob.objects.create(event=event, source=event.banner.name, previous=previous or "")
+    logger.info(f"Queued banner job {job.id} for event {event.id}")
+
+    if settings.BANNER_JOBS_EAGER:
+        job.attempts = 1
+        run_job(job)
+        event.refresh_from_db(fields=["banner"])
+    return job
+
+
+def claim_jobs(limit):
+    now = timezone.now()
+    expired = Q(status="processing", claimed_at__lte=now - LEASE)
+    with transaction.atomic():
+        # A job that keeps taking its worker down is not handed to the next one
+        BannerJob.objects.filter(expired, attempts__gte=BannerJob.MAX_ATTEMPTS).update(
+            status="failed", error="Worker stopped while processing the job", updated_at=now
+        )
+        jobs = list(
+            BannerJob.objects.select_for_update(skip_locked=True).filter(
+                Q(status="pending") | expired
+            )[:limit]
+        )
+        BannerJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            status="processing", attempts=F("attempts") + 1, claimed_at=now
+        )
+    for job in jobs:
+        job.status = "processing"
+        job.attempts += 1
+        job.claimed_at = now
+    return jobs
+
+
+def read_source(job):
+    with banner_storage().open(job.source, "rb") as source:
+        return source.read()
+
+
+def complete_job(job, data):
+    storage = banner_storage()
+    name = storage.save(f"banners/{uuid.uuid4()}.webp", ContentFile(data))
+
+    with transaction.atomic():
+        event = Event.objects.select_for_update().filter(pk=job.event_id, banner=job.source).first()
+        if event is not None:
+            event.banner = name
+            event.save(update_fields=["banner", "updated_at"])
+        job.status = "done"
+        job.error = "" if event is not None else "Banner was replaced before processing finished"
+        job.save(update_fields=["status", "error", "updated_at"])
+
+    if event is None:
+        storage.delete(name)
+        return
+
+    storage.delete(job.source)
+    if job.previous:
+        storage.delete(job.previous)
+    logger.info(f"Banner job {job.id} swapped banner of event {job.event_id}")
+
+
+def fail_job(job, error):
+    job.status = "failed" if job.attempts >= BannerJob.MAX_ATTEMPTS else "pending"
+    job.error = str(error)
+    job.save(update_fields=["status", "attempts", "error", "updated_at"])
+    logger.error(f"Banner job {job.id} failed on attempt {job.attempts}: {error}")
+
+
+def run_job(job):
+    try:
+        complete_job(job, render_banner(read_source(job)))
+    except Exception as e:
+        fail_job(job, e)
+
+
+def process_jobs(pool, limit=10):
+    """Render up to ``limit`` queued jobs on ``pool`` and return how many were claimed"""
+    jobs = claim_jobs(limit)
+    futures = {}
+
+    for job in jobs:
+        try:
+            futures[pool.submit(render_banner, read_source(job))] = job
+        except Exception as e:
+            fail_job(job, e)
+
+    for future in as_completed(futures):
+        job = futures[future]
+        try:
+            complete_job(job, future.result())
+        except Exception as e:
+            fail_job(job, e)
+
+    return len(jobs)
@@ -0,0 +1,108 @@
+"""
+Generation counters for the home page fragment caches.
+
+Each section of ``event_list.html`` is cached under a key that includes its generation,
+bumping the generation makes every key of that section (all recent pages at once) stale
+without having to know or delete them. The sections also list and bucket events by the current
+time, ``expire_started_events()`` bumps them once an event started since they were cached.
+"""
+
+from datetime import timedelta
+from django.core.cache import cache
+from django.db.models import Min, Q
+from django.utils import timezone
+from events.facets import MONTH, WEEK, forget_facet_counts
+from events.models import Event
+from events.page_cache import purge_pages
+from events.querysets import popular_event_ids
+
+SECTIONS = ("popular", "featured", "recent")
+# Registrations reorder the popular events without bumping a generation
+POPULAR_TIMEOUT = 300
+LISTING_CHANGE_KEY = "events:listing-change"
+
+
+def _key(section):
+    return f"events:generation:{section}"
+
+
+def get_generations():
+    keys = {_key(section): section for section in SECTIONS}
+    found = cache.get_many(keys)
+    missing = {key: 1 for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return {section: found[key] for key, section in keys.items()}
+
+
+def next_listing_change(now):
+    """Next moment an approved event starts or moves to a nearer date facet, None if never"""
+    offsets = (timedelta(0), WEEK, MONTH)
+    edges = Event.objects.active().aggregate(
+        **{str(i): Min("date", filter=Q(date__gt=now + offset)) for i, offset in enumerate(offsets)}
+    )
+    changes = [edges[str(i)] - offset for i, offset in enumerate(offsets) if edges[str(i)]]
+    return min(changes, default=None)
+
+
+def expire_started_events(generations):
+    """
+    Bump every section and return the new generations if an event started or moved to a
+    nearer date facet since ``generations`` were cached, otherwise return them as they are.
+    """
+    now = timezone.now()
+    cached = cache.get(LISTING_CHANGE_KEY)
+    if cached is not None and cached[0] == generations:
+        change = cached[1]
+        if change is None or change > now:
+            return generations
+        bump_generations(*SECTIONS)
+        forget_facet_counts()
+        purge_pages("events")
+        generations = get_generations()
+    cache.set(LISTING_CHANGE_KEY, (generations, next_listing_change(now)), timeout=None)
+    return generations
+
+
+def get_popular_ids(generation):
+    """Ids of the popular section, the other sections and their cache keys depend on them"""
+    key = f"events:popular:{generation}"
+    popular_ids = cache.get(key)
+    if popular_ids is None:
+        popular_ids = [str(pk) for pk in popular_event_ids()[:4]]
+        cache.set(key, popular_ids, POPULAR_TIMEOUT)
+    return popular_ids
+
+
+def bump_generations(*sections):
+    for section in sections:
+        try:
+            cache.incr(_key(section))
+        except ValueError:
+            cache.set(_key(section), 2, timeout=None)
+
+
+def listed_sections(event):
+    """Sections of the home page listing ``event``, by what is stored for it right now"""
+    active = Event.objects.active().upcoming()
+    # Popular events are excluded from the recent list
+    if event.pk in set(active.popular().values_list("pk", flat=True)[:4]):
+        sections = {"popular"}
+    else:
+        sections = {"recent"}
+    if event.pk in set(active.recent().values_list("pk", flat=True)[:4]):
+        sections.add("featured")
+    return sections
+
+
+def invalidate_event_sections(event, membership_changed, listed_before=()):
+    """
+    Bump the sections showing ``event``. Events entering or leaving the approved set shift
+    every section, an edit of an approved event only touches the sections it was or is now
+    listed in, ``listed_before`` being those of ``listed_sections`` before the save.
+    """
+    if membership_changed:
+        bump_generations(*SECTIONS)
+        return
+    bump_generations(*sorted(listed_sections(event) | set(listed_before)))
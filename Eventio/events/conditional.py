@@ -0,0 +1,97 @@
+"""
+Conditional GET for the event pages.
+
+``conditional`` follows ``django.views.decorators.http.condition`` but also wraps async views,
+the page state function queries the database so it always runs in a thread. The ETag hashes
+the page state together with ``variant()``, everything else a render of the same URL depends
+on: the htmx flag and query string, the CSRF secret embedded in forms and, for logged in
+users, their membership state. Last-Modified is only sent to anonymous users, membership
+changes have no timestamp.
+"""
+
+import hashlib
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib import messages
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from events.membership import get_membership
+
+
+def variant(request):
+    user = request.user
+    parts = [bool(request.htmx), request.GET.urlencode(), request.META.get("CSRF_COOKIE", "")]
+    if user.is_authenticated:
+        membership = get_membership(user)
+        parts.append(user.pk)
+        parts.extend(sorted(map(str, membership[name])) for name in sorted(membership))
+    return parts
+
+
+def validators(request, page_state, *args, **kwargs):
+    # Pending messages are rendered into the page, it has to be sent again
+    if request.method not in ("GET", "HEAD") or len(messages.get_messages(request)):
+        return None, None
+
+    state = page_state(request, *args, **kwargs)
+    if state is None:
+        return None, None
+
+    parts, last_modified = state
+    digest = hashlib.md5(repr([parts, variant(request)]).encode(), usedforsecurity=False)
+    # Weak, the masked CSRF token makes every render differ byte for byte
+    etag = f'W/"{digest.hexdigest()}"'
+    if request.user.is_authenticated or last_modified is None:
+        return etag, None
+    return etag, int(last_modified.timestamp())
+
+
+def finish(request, response, etag, last_modified):
+    if etag and request.method in ("GET", "HEAD") and response.status_code in (200, 304):
+        response.headers.setdefault("ETag", etag)
+        if last_modified and not response.has_header("Last-Modified"):
+            response.headers["Last-Modified"] = http_date(last_modified)
+    patch_vary_headers(response, ["HX-Request"])
+    return response
+
+
+def conditional(page_state):
+    """
+    ``page_state(request, *args, **kwargs)`` returns ``(parts, last_modified)`` describing
+    what the page shows, or None to skip validation.
+    """
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+
+            @wraps(view)
+            async def inner(request, *args, **kwargs):
+                etag, last_modified = await sync_to_async(validators)(
+                    request, page_state, *args, **kwargs
+                )
+                response = None
+                if etag:
+                    response = get_conditional_response(
+                        request, etag=etag, last_modified=last_modified
+                    )
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return finish(request, response, etag, last_modified)
+
+        else:
+
+            @wraps(view)
+            def inner(request, *args, **kwargs):
+                etag, last_modified = validators(request, page_state, *args, **kwargs)
+                response = None
+                if etag:
+                    response = get_conditional_response(
+                        request, etag=etag, last_modified=last_modified
+                    )
+                if response is None:
+                    response = view(request, *args, **kwargs)
+                return finish(request, response, etag, last_modified)
+
+        return inner
+
+    return decorator
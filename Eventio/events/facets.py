@@ -0,0 +1,145 @@
+"""
+Facet filters and counts for event search and listing.
+
+Counts come from one grouped aggregation over the events before facet filters apply, each
+row is a combination of category, event type, date bucket and price band with its count.
+The counts of a facet are summed from the rows matching the selections of the other facets,
+so selecting a category still shows how many events the other categories have. The rows of
+all approved events are cached until the signals forget them.
+"""
+
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, CharField, Count, Q, Value, When
+from django.utils import timezone
+from events.models import Event
+
+FACETS_KEY = "events:facets:active"
+# Date buckets move with the clock, so the cached rows expire even without writes
+FACETS_TIMEOUT = 10 * 60
+
+FACET_LABELS = {
+    "category": "Category",
+    "event_type": "Type",
+    "when": "Date",
+    "price": "Price",
+}
+
+# Buckets don't overlap so every event is counted once, "month" starts after "week"
+WHEN_CHOICES = [
+    ("week", "Next 7 days"),
+    ("month", "In 7 to 30 days"),
+    ("later", "In over 30 days"),
+    ("past", "Past"),
+]
+
+PRICE_CHOICES = [
+    ("free", "Free"),
+    ("under_25", "Under 25$"),
+    ("25_100", "25$ to 100$"),
+    ("over_100", "100$ and more"),
+]
+
+
+# How far ahead the "month" and "later" date buckets start
+WEEK, MONTH = timedelta(days=7), timedelta(days=30)
+
+
+def when_buckets(now):
+    week, month = now + WEEK, now + MONTH
+    return {
+        "week": Q(date__gte=now, date__lt=week),
+        "month": Q(date__gte=week, date__lt=month),
+        "later": Q(date__gte=month),
+        "past": Q(date__lt=now),
+    }
+
+
+PRICE_BANDS = {
+    "free": Q(event_type="free"),
+    "under_25": Q(event_type="paid", ticket__price__lt=25),
+    "25_100": Q(event_type="paid", ticket__price__gte=25, ticket__price__lt=100),
+    "over_100": Q(event_type="paid", ticket__price__gte=100),
+}
+
+
+def _bucket(buckets):
+    return Case(
+        *(When(condition, then=Value(name)) for name, condition in buckets.items()),
+        default=Value(""),
+        output_field=CharField(),
+    )
+
+
+def facet_rows(queryset):
+    """Count ``queryset`` per combination of facet values in a single query"""
+    return list(
+        queryset.annotate(when=_bucket(when_buckets(timezone.now())), price=_bucket(PRICE_BANDS))
+        .order_by()
+        .values(*FACET_LABELS)
+        .annotate(count=Count("pk"))
+    )
+
+
+def active_facet_rows():
+    rows = cache.get(FACETS_KEY)
+    if rows is None:
+        rows = facet_rows(Event.objects.active())
+        cache.set(FACETS_KEY, rows, FACETS_TIMEOUT)
+    return rows
+
+
+def forget_facet_counts():
+    # Again after commit, a concurrent request may have cached the old rows meanwhile
+    cache.delete(FACETS_KEY)
+    transaction.on_commit(lambda: cache.delete(FACETS_KEY))
+
+
+def selection_key(selection):
+    """Stable text of the selected values for fragment cache keys"""
+    return "|".join(
+        f"{name}={','.join(sorted(values))}" for name, values in sorted(selection.items())
+    )
+
+
+def filter_events(queryset, selection):
+    """Narrow ``queryset`` to the selected values, OR within a facet and AND across facets"""
+    buckets = {"when": when_buckets(timezone.now()), "price": PRICE_BANDS}
+    for name, values in selection.items():
+        if name in buckets:
+            condition = Q()
+            for value in values:
+                condition |= buckets[name][value]
+            queryset = queryset.filter(condition)
+        else:
+            queryset = queryset.filter(**{f"{name}__in": values})
+    return queryset
+
+
+def facet_counts(rows, selection, choices):
+    """Facets with their options, counts and selected state as rendered by _facets.html"""
+    facets = []
+    for name, label in FACET_LABELS.items():
+        others = {key: values for key, values in selection.items() if key != name}
+        counts = {}
+        for row in rows:
+            if all(row[key] in values for key, values in others.items()):
+                counts[row[name]] = counts.get(row[name], 0) + row["count"]
+
+        facets.append(
+            {
+                "name": name,
+                "label": label,
+                "options": [
+                    {
+                        "value": value,
+                        "label": option_label,
+                        "count": counts.get(value, 0),
+                        "selected": value in selection.get(name, ()),
+                    }
+                    for value, option_label in choices[name]
+                ],
+            }
+        )
+    return facets
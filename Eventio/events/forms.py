@@ -1,5 +1,6 @@
 from django import forms
 from django.core.validators import MaxValueValidator
+from events.facets import PRICE_CHOICES, WHEN_CHOICES, facet_counts
 from events.models import Event, Ticket, Review
 from datetime import datetime
 
@@ -51,6 +52,39 @@ class ReviewForm(forms.ModelForm):
         fields = ("rating", "comment")
 
 
+class NearForm(forms.Form):
+    """Search filter for events around the visitor, filled in from the browser's location"""
+
+    DISTANCE_CHOICES = [(5, "5 km"), (25, "25 km"), (100, "100 km"), (500, "500 km")]
+
+    lat = forms.FloatField(min_value=-90, max_value=90, widget=forms.HiddenInput())
+    lon = forms.FloatField(min_value=-180, max_value=180, widget=forms.HiddenInput())
+    km = forms.TypedChoiceField(choices=DISTANCE_CHOICES, coerce=int, initial=25)
+
+
+class FacetForm(forms.Form):
+    """Facet selections of search and listing, categories are the ones present in ``rows``"""
+
+    category = forms.MultipleChoiceField(required=False)
+    event_type = forms.MultipleChoiceField(required=False, choices=Event.EVENT_TYPE_CHOICES)
+    when = forms.MultipleChoiceField(required=False, choices=WHEN_CHOICES)
+    price = forms.MultipleChoiceField(required=False, choices=PRICE_CHOICES)
+
+    def __init__(self, *args, rows=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        categories = sorted({row["category"] for row in rows})
+        self.fields["category"].choices = [(category, category) for category in categories]
+
+    def selection(self):
+        # Facets with invalid values are dropped, the others still apply
+        self.is_valid()
+        return {name: values for name, values in self.cleaned_data.items() if values}
+
+    def facets(self, rows):
+        choices = {name: field.choices for name, field in self.fields.items()}
+        return facet_counts(rows, self.selection(), choices)
+
+
 class ContactForm(forms.Form):
     email = forms.EmailField(label="Email")
     message = forms.CharField(label="Message", widget=forms.Textarea({"cols": 40, "rows": 6}))
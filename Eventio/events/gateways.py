@@ -0,0 +1,179 @@
+"""
+Payment gateways.
+
+``get_gateway()`` returns the gateway named by the ``PAYMENT_GATEWAY`` setting. ``StripeGateway``
+talks to Stripe through one pooled httpx client per process with strict timeouts and bounded
+retries. ``FakeGateway`` never leaves the process: checkout sessions are paid as soon as they
+are created and fulfilled through the webhook handler, so checkout and fulfillment can be load
+tested offline. It refuses to start unless ``DEBUG`` or ``PAYMENT_GATEWAY_ALLOW_FAKE`` is on.
+"""
+
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+import threading
+import time
+import uuid
+import httpx
+import stripe
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentError(Exception):
+    """The gateway could not create or read a checkout session"""
+
+
+class PaymentGateway(ABC):
+    @abstractmethod
+    def create_checkout(self, params: dict) -> str:
+        """Create a checkout session from Stripe style ``params`` and return its URL"""
+
+    async def acreate_checkout(self, params: dict) -> str:
+        return await sync_to_async(self.create_checkout)(params)
+
+    @abstractmethod
+    def refund_checkout(self, session: dict) -> None:
+        """Refund the whole payment of a paid checkout session, once however often it's called"""
+
+    def construct_event(self, payload: bytes, signature: str) -> dict:
+        """Parse a webhook request body, raises ValueError for bad payloads and signatures"""
+        try:
+            return stripe.Webhook.construct_event(
+                payload, signature, settings.STRIPE_WEBHOOK_SECRET
+            )
+        except stripe.SignatureVerificationError as e:
+            raise ValueError(str(e)) from e
+
+
+class StripeGateway(PaymentGateway):
+    def __init__(self):
+        timeout = httpx.Timeout(
+            settings.PAYMENT_GATEWAY_TIMEOUT, connect=settings.PAYMENT_GATEWAY_CONNECT_TIMEOUT
+        )
+        # Sync and async clients keep their connections to Stripe alive between requests
+        http_client = stripe.HTTPXClient(timeout=timeout, allow_sync_methods=True)
+        self.client = stripe.StripeClient(
+            settings.STRIPE_API_SECRET or "",
+            http_client=http_client,
+            # Retried POSTs reuse their idempotency key, a checkout is never created twice
+            max_network_retries=settings.PAYMENT_GATEWAY_MAX_RETRIES,
+        )
+
+    @staticmethod
+    def _checkout_url(checkout) -> str:
+        if checkout.url is None:
+            raise PaymentError("Failed to create checkout session")
+        return checkout.url
+
+    def create_checkout(self, params: dict) -> str:
+        try:
+            return self._checkout_url(self.client.v1.checkout.sessions.create(params))
+        except stripe.StripeError as e:
+            raise PaymentError(str(e)) from e
+
+    async def acreate_checkout(self, params: dict) -> str:
+        try:
+            checkout = await self.client.v1.checkout.sessions.create_async(params)
+        except stripe.StripeError as e:
+            raise PaymentError(str(e)) from e
+        return self._checkout_url(checkout)
+
+    def refund_checkout(self, session: dict) -> None:
+        try:
+            self.client.v1.refunds.create(
+                {"payment_intent": session["payment_intent"]},
+                # Redelivered webhooks refund the session once
+                {"idempotency_key": f"refund-{session['id']}"},
+            )
+        except stripe.StripeError as e:
+            raise PaymentError(str(e)) from e
+
+
+class FakeGateway(PaymentGateway):
+    """
+    Completes every checkout in-process, ``PAYMENT_GATEWAY_FAKE_LATENCY`` seconds stand in
+    for the round trip to Stripe. The customer is sent straight to the success URL.
+    """
+
+    MAX_SESSIONS = 10000
+
+    def __init__(self):
+        # Every checkout is paid for free, it must never be reachable in production
+        if not (settings.DEBUG or settings.PAYMENT_GATEWAY_ALLOW_FAKE):
+            raise ImproperlyConfigured(
+                "FakeGateway requires DEBUG or PAYMENT_GATEWAY_ALLOW_FAKE, use StripeGateway"
+            )
+        self.latency = settings.PAYMENT_GATEWAY_FAKE_LATENCY
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def _open_session(self, params: dict) -> dict:
+        session = {
+            "id": f"cs_fake_{uuid.uuid4().hex}",
+            "object": "checkout.session",
+            "mode": params["mode"],
+            "payment_status": "paid",
+            "amount_total": sum(
+                item["price_data"]["unit_amount"] * item["quantity"]
+                for item in params["line_items"]
+            ),
+            "metadata": {key: str(value) for key, value in params["metadata"].items()},
+        }
+        session["url"] = params["success_url"].replace("{CHECKOUT_SESSION_ID}", session["id"])
+
+        with self.lock:
+            if len(self.sessions) >= self.MAX_SESSIONS:
+                del self.sessions[next(iter(self.sessions))]
+            self.sessions[session["id"]] = session
+        return session
+
+    def _complete(self, session: dict) -> str:
+        # Imported here, events.payment imports this module
+        from events.payment import handle_webhook_event
+
+        webhook_event = {
+            "id": f"evt_fake_{uuid.uuid4().hex}",
+            "type": "checkout.session.completed",
+            "data": {"object": session},
+        }
+        handle_webhook_event(webhook_event)
+        return session["url"]
+
+    def create_checkout(self, params: dict) -> str:
+        time.sleep(self.latency)
+        return self._complete(self._open_session(params))
+
+    async def acreate_checkout(self, params: dict) -> str:
+        await asyncio.sleep(self.latency)
+        return await sync_to_async(self._complete)(self._open_session(params))
+
+    def refund_checkout(self, session: dict) -> None:
+        session["payment_status"] = "refunded"
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> PaymentGateway:
+    """The configured gateway, created once per process so its connections are reused"""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = import_string(settings.PAYMENT_GATEWAY)()
+    return _gateway
+
+
+@receiver(setting_changed)
+def reset_gateway(setting, **kwargs):
+    global _gateway
+    if setting.startswith("PAYMENT_GATEWAY") or setting in ("STRIPE_API_SECRET", "DEBUG"):
+        _gateway = None
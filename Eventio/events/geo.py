@@ -0,0 +1,249 @@
+"""
+Geocoding and proximity search.
+
+Geocode jobs (``events.geocoding``) turn ``Event.location`` into coordinates through the
+geocoder named by the ``GEOCODER`` setting and store their geohash. ``EventQueryset.near()`` covers the search
+radius with a few geohash cells, matches them as ranges on the indexed ``geohash`` column,
+then narrows the candidates to the bounding box and the exact great-circle distance.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import re
+import threading
+import time
+import unicodedata
+from abc import ABC, abstractmethod
+import httpx
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.db.models import FloatField, Q, Value
+from django.db.models.functions import ACos, Cos, Greatest, Least, Radians, Sin
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+# More cells make the index ranges tighter but the query longer
+MAX_CELLS = 12
+
+
+def encode(lat, lon, precision=GEOHASH_PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits = value = 0
+    even = True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, lon) if even else (lat_range, lat)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return "".join(chars)
+
+
+def cell_size(precision):
+    """Height and width of a geohash cell in degrees"""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180 / 2**lat_bits, 360 / 2**lon_bits
+
+
+def bounding_box(lat, lon, km):
+    """South, north, west and east edges, west > east when the box crosses the antimeridian"""
+    dlat = km / KM_PER_DEGREE
+    south, north = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+    cos_lat = math.cos(math.radians(max(abs(south), abs(north))))
+    dlon = km / (KM_PER_DEGREE * cos_lat) if cos_lat > 1e-9 else 180.0
+    if dlon >= 180:
+        return south, north, -180.0, 180.0
+    west = (lon - dlon + 180) % 360 - 180
+    east = (lon + dlon + 180) % 360 - 180
+    return south, north, west, east
+
+
+def covering_cells(south, north, west, east):
+    """The finest geohash cells, at most MAX_CELLS of them, covering the bounding box"""
+    lon_span = (east - west) % 360 or 360.0
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        first_row = math.floor((south + 90) / height)
+        last_row = min(math.floor((north + 90) / height), round(180 / height) - 1)
+        first_column = math.floor((west + 180) / width)
+        columns = min(
+            math.floor((west + 180 + lon_span) / width) - first_column + 1, round(360 / width)
+        )
+        if (last_row - first_row + 1) * columns > MAX_CELLS and precision > 1:
+            continue
+        return sorted(
+            {
+                encode(
+                    -90 + (row + 0.5) * height,
+                    -180 + ((first_column + column) % round(360 / width) + 0.5) * width,
+                    precision,
+                )
+                for row in range(first_row, last_row + 1)
+                for column in range(columns)
+            }
+        )
+
+
+def cell_range(cell):
+    """Match geohashes starting with ``cell`` as a range, so a plain btree index is used"""
+    prefix = cell.rstrip(BASE32[-1])
+    if not prefix:
+        return Q(geohash__gte=cell)
+    upper = prefix[:-1] + BASE32[BASE32.index(prefix[-1]) + 1]
+    return Q(geohash__gte=cell, geohash__lt=upper)
+
+
+def distance_km(lat, lon):
+    """Great-circle distance between the event and a point in km"""
+    lat, lon = math.radians(lat), math.radians(lon)
+    event_lat = Radians("latitude")
+    cos_angle = Sin(event_lat) * math.sin(lat) + Cos(event_lat) * math.cos(lat) * Cos(
+        Radians("longitude") - lon
+    )
+    # Rounding may leave the domain of ACos
+    clamped = Least(Greatest(cos_angle, Value(-1.0)), Value(1.0), output_field=FloatField())
+    return ACos(clamped) * EARTH_RADIUS_KM
+
+
+def near_events(queryset, lat, lon, km):
+    """Events within ``km`` of the point, annotated with their ``distance`` in km"""
+    south, north, west, east = bounding_box(lat, lon, km)
+    cells = Q()
+    for cell in covering_cells(south, north, west, east):
+        cells |= cell_range(cell)
+
+    if west <= east:
+        longitude = Q(longitude__range=(west, east))
+    else:
+        longitude = Q(longitude__gte=west) | Q(longitude__lte=east)
+    return (
+        queryset.filter(cells, longitude, latitude__range=(south, north))
+        .annotate(distance=distance_km(lat, lon))
+        .filter(distance__lte=km)
+    )
+
+
+def normalize(name):
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode()
+    return " ".join(re.findall(r"\w+", name.lower()))
+
+
+class Geocoder(ABC):
+    @abstractmethod
+    def geocode(self, location: str) -> tuple[float, float] | None:
+        """Coordinates of ``location`` or None when it can't be found"""
+
+
+class FixtureGeocoder(Geocoder):
+    """
+    Looks places up in the ``GEOCODER_FIXTURE`` JSON file of ``{"name": [lat, lon]}``, works
+    offline. "Main Square, Krakow" falls back to its parts and words, the last one known wins.
+    """
+
+    def __init__(self):
+        with open(settings.GEOCODER_FIXTURE) as f:
+            self.places = {normalize(name): tuple(point) for name, point in json.load(f).items()}
+
+    def geocode(self, location):
+        candidates = [location, *reversed(location.split(",")), *reversed(location.split())]
+        for candidate in map(normalize, candidates):
+            if candidate in self.places:
+                return self.places[candidate]
+        return None
+
+
+class NominatimGeocoder(Geocoder):
+    """
+    OpenStreetMap's Nominatim. Its usage policy allows 1 request/s, so answers are cached and
+    lookups of a process wait for their turn, a backfill of many places can't get us banned.
+    """
+
+    URL = "https://nominatim.openstreetmap.org/search"
+    CACHE_TIMEOUT = 60 * 60 * 24 * 30
+    # Seconds between two requests
+    MIN_INTERVAL = 1.0
+
+    def __init__(self):
+        self.client = httpx.Client(
+            timeout=settings.GEOCODER_TIMEOUT,
+            headers={"User-Agent": settings.GEOCODER_USER_AGENT},
+        )
+        self._throttle_lock = threading.Lock()
+        self._last_request = None
+
+    def _wait_for_turn(self):
+        with self._throttle_lock:
+            if self._last_request is not None:
+                delay = self._last_request + self.MIN_INTERVAL - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            self._last_request = time.monotonic()
+
+    def geocode(self, location):
+        digest = hashlib.md5(normalize(location).encode(), usedforsecurity=False).hexdigest()
+        key = f"events:geocode:{digest}"
+        point = cache.get(key)
+        if point is not None:
+            return tuple(point) or None
+
+        self._wait_for_turn()
+        try:
+            response = self.client.get(
+                self.URL, params={"q": location, "format": "jsonv2", "limit": 1}
+            )
+            response.raise_for_status()
+            results = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            logger.warning(f"Could not geocode {location!r}: {e}")
+            return None
+
+        point = (float(results[0]["lat"]), float(results[0]["lon"])) if results else ()
+        cache.set(key, point, self.CACHE_TIMEOUT)
+        return point or None
+
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+
+def get_geocoder() -> Geocoder:
+    global _geocoder
+    if _geocoder is None:
+        with _geocoder_lock:
+            if _geocoder is None:
+                _geocoder = import_string(settings.GEOCODER)()
+    return _geocoder
+
+
+@receiver(setting_changed)
+def reset_geocoder(setting, **kwargs):
+    global _geocoder
+    if setting.startswith("GEOCODER"):
+        _geocoder = None
+
+
+def geocode(location):
+    """Latitude, longitude and geohash of ``location``, all empty when it can't be found"""
+    point = get_geocoder().geocode(location) if location else None
+    if point is None:
+        return None, None, ""
+    return point[0], point[1], encode(*point)
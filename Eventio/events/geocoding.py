@@ -0,0 +1,92 @@
+"""
+Background geocoding.
+
+``Event.save()`` clears the coordinates of a moved event and queues a ``GeocodeJob``, so no
+request waits on the geocoder. The ``run_geocode_worker`` command claims queued jobs, looks
+their locations up one after another and stores the coordinates unless the location changed
+again meanwhile. Run a single worker, the throttle of ``NominatimGeocoder`` only spaces the
+lookups of its own process. With ``GEOCODE_JOBS_EAGER`` (local settings and tests) jobs run
+in-process as soon as they are queued.
+"""
+
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from events.geo import geocode
+from events.models import Event, GeocodeJob
+
+logger = logging.getLogger(__name__)
+
+# A claimed job is not picked up again by another worker until its lease expires
+LEASE = timedelta(minutes=5)
+
+
+def enqueue_geocoding(event):
+    job = GeocodeJob.objects.create(event=event, location=event.location)
+    logger.info(f"Queued geocode job {job.id} for event {event.id}")
+
+    if settings.GEOCODE_JOBS_EAGER:
+        job.attempts = 1
+        run_job(job)
+        event.refresh_from_db(fields=["latitude", "longitude", "geohash"])
+    return job
+
+
+def claim_jobs(limit):
+    now = timezone.now()
+    expired = Q(status="processing", claimed_at__lte=now - LEASE)
+    with transaction.atomic():
+        GeocodeJob.objects.filter(expired, attempts__gte=GeocodeJob.MAX_ATTEMPTS).update(
+            status="failed", error="Worker stopped while processing the job", updated_at=now
+        )
+        jobs = list(
+            GeocodeJob.objects.select_for_update(skip_locked=True).filter(
+                Q(status="pending") | expired
+            )[:limit]
+        )
+        GeocodeJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            status="processing", attempts=F("attempts") + 1, claimed_at=now
+        )
+    for job in jobs:
+        job.status = "processing"
+        job.attempts += 1
+        job.claimed_at = now
+    return jobs
+
+
+def complete_job(job, coordinates):
+    with transaction.atomic():
+        event = (
+            Event.objects.select_for_update().filter(pk=job.event_id, location=job.location).first()
+        )
+        if event is not None:
+            event.latitude, event.longitude, event.geohash = coordinates
+            event.save(update_fields=["latitude", "longitude", "geohash"])
+        job.status = "done"
+        job.error = "" if event is not None else "Location was changed before geocoding finished"
+        job.save(update_fields=["status", "error", "updated_at"])
+
+
+def fail_job(job, error):
+    job.status = "failed" if job.attempts >= GeocodeJob.MAX_ATTEMPTS else "pending"
+    job.error = str(error)
+    job.save(update_fields=["status", "attempts", "error", "updated_at"])
+    logger.error(f"Geocode job {job.id} failed on attempt {job.attempts}: {error}")
+
+
+def run_job(job):
+    try:
+        complete_job(job, geocode(job.location))
+    except Exception as e:
+        fail_job(job, e)
+
+
+def process_jobs(limit=10):
+    """Geocode up to ``limit`` queued jobs and return how many were claimed"""
+    jobs = claim_jobs(limit)
+    for job in jobs:
+        run_job(job)
+    return len(jobs)
@@ -1,18 +1,22 @@
 from io import BytesIO
 from PIL import Image, ImageOps
-from django.core.files.base import ContentFile
 
 
-def validate_image(image, size=(400, 300)):
+def verify_image(image):
+    """Cheap integrity check of an uploaded image, raises on files PIL can't read"""
     img = Image.open(image)
     img.verify()
-    img = Image.open(image)
+    image.seek(0)
+
+
+def render_banner(data, size=(400, 300)):
+    """Crop and encode raw image bytes into a WEBP banner, runs inside banner worker processes"""
+    img = Image.open(BytesIO(data))
 
     if img.mode in ("RGBA", "LA", "P"):
-        img.convert("RGB")
+        img = img.convert("RGB")
 
     img = ImageOps.cover(img, size, Image.Resampling.LANCZOS)
     temp_img = BytesIO()
     img.save(temp_img, format="WEBP", optimize=True, quality=95)
-    temp_img.seek(0)
-    return ContentFile(temp_img.read())
+    return temp_img.getvalue()
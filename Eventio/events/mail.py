@@ -0,0 +1,131 @@
+"""
+Outbox based email delivery.
+
+Mail is stored as an ``OutboxEmail`` row instead of being sent while the request waits on
+SMTP. The ``send_outbox`` command claims due messages in batches and sends each batch over
+a single backend connection, failed messages are retried with exponential backoff. With
+``EMAIL_OUTBOX_EAGER`` (local settings) the outbox is flushed once the transaction commits.
+"""
+
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from events.models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+# A claimed message is not picked up again by another worker until its lease expires
+LEASE = timedelta(minutes=5)
+RETRY_DELAY = timedelta(minutes=1)
+
+
+def enqueue_message(message):
+    """Store an ``EmailMessage`` (alternatives included) in the outbox"""
+    body, html_body = message.body, ""
+    if message.content_subtype == "html":
+        body, html_body = "", message.body
+    for content, mimetype in getattr(message, "alternatives", []):
+        if mimetype == "text/html":
+            html_body = content
+
+    email = OutboxEmail.objects.create(
+        subject=message.subject,
+        body=body,
+        html_body=html_body,
+        from_email=message.from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(message.to),
+    )
+    logger.info(f"Queued email {email.id} to {', '.join(email.to)}")
+
+    if settings.EMAIL_OUTBOX_EAGER:
+        transaction.on_commit(deliver_outbox)
+    return email
+
+
+def enqueue_mail(subject, message, from_email, recipient_list, html_message=None):
+    """Outbox counterpart of ``django.core.mail.send_mail``"""
+    email = EmailMultiAlternatives(subject, message, from_email, recipient_list)
+    if html_message:
+        email.attach_alternative(html_message, "text/html")
+    return enqueue_message(email)
+
+
+def build_message(email, connection=None):
+    if not email.body and email.html_body:
+        message = EmailMessage(
+            email.subject, email.html_body, email.from_email, email.to, connection=connection
+        )
+        message.content_subtype = "html"
+        return message
+
+    message = EmailMultiAlternatives(
+        email.subject, email.body, email.from_email, email.to, connection=connection
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, "text/html")
+    return message
+
+
+def claim_batch(limit):
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True).filter(
+                status="pending", next_attempt_at__lte=now
+            )[:limit]
+        )
+        OutboxEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+            attempts=F("attempts") + 1, next_attempt_at=now + LEASE
+        )
+    for email in emails:
+        email.attempts += 1
+    return emails
+
+
+def mark_sent(email):
+    email.status = "sent"
+    email.sent_at = timezone.now()
+    email.last_error = ""
+    email.save(update_fields=["status", "sent_at", "last_error"])
+
+
+def mark_failed(email, error):
+    if email.attempts >= OutboxEmail.MAX_ATTEMPTS:
+        email.status = "failed"
+    else:
+        email.next_attempt_at = timezone.now() + RETRY_DELAY * 2 ** (email.attempts - 1)
+    email.last_error = str(error)
+    email.save(update_fields=["status", "next_attempt_at", "last_error"])
+    logger.error(f"Email {email.id} failed on attempt {email.attempts}: {error}")
+
+
+def deliver_outbox(limit=50):
+    """Send up to ``limit`` due messages over one connection and return how many were claimed"""
+    emails = claim_batch(limit)
+    if not emails:
+        return 0
+
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        for email in emails:
+            mark_failed(email, e)
+        return len(emails)
+
+    try:
+        for email in emails:
+            try:
+                build_message(email, connection).send()
+            except Exception as e:
+                mark_failed(email, e)
+            else:
+                mark_sent(email)
+    finally:
+        connection.close()
+
+    return len(emails)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from events.archive import archive_batch, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = (
+        "Move events that took place more than EVENT_ARCHIVE_AFTER_DAYS ago, with their "
+        "registrations, reviews and purchases, into the archive tables"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, help="Archive events older than this many days")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options["days"])
+
+        # One transaction per batch keeps locks short on a large backlog
+        total = 0
+        while archived := archive_batch(cutoff, options["batch_size"]):
+            total += archived
+            self.stdout.write(f"Archived {total} events")
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {total} events before {cutoff:%Y-%m-%d}"))
@@ -0,0 +1,104 @@
+import json
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from django.utils import timezone
+from events.management.commands.benchmark_views import SEARCH_TERMS, percentile
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure concurrent throughput of a running server. Run it once against the WSGI "
+        "server and once against the ASGI server and compare the results."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000")
+        parser.add_argument("--label", default="server", help="Name of the measured setup")
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--timeout", type=float, default=30.0)
+        parser.add_argument("--output", help="Write results to this JSON file")
+        parser.add_argument("--compare", help="Print the change against a previous results file")
+
+    def handle(self, *args, **options):
+        events = list(Event.objects.active().values_list("pk", flat=True)[:50])
+        if not events:
+            raise CommandError("No approved events found, run seed_data first")
+
+        paths = [reverse("event_list")]
+        paths += [f"{reverse('event_search')}?q={term}" for term in SEARCH_TERMS]
+        paths += [reverse("event_detail", kwargs={"pk": pk}) for pk in events]
+        urls = [
+            options["url"].rstrip("/") + paths[i % len(paths)] for i in range(options["requests"])
+        ]
+
+        self.timeout = options["timeout"]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            samples = list(pool.map(self.fetch, urls))
+        elapsed = time.perf_counter() - started
+
+        timings = [duration for duration, ok in samples if ok]
+        if not timings:
+            raise CommandError(f"Every request to {options['url']} failed")
+
+        result = {
+            "requests_per_second": round(len(timings) / elapsed, 2),
+            "p50_ms": round(percentile(timings, 50), 2),
+            "p95_ms": round(percentile(timings, 95), 2),
+            "errors": len(samples) - len(timings),
+        }
+        self.stdout.write(
+            f"{options['label']}: {result['requests_per_second']:.1f} req/s  "
+            f"p50 {result['p50_ms']:.2f} ms  p95 {result['p95_ms']:.2f} ms  "
+            f"errors {result['errors']}"
+        )
+
+        report = {
+            "label": options["label"],
+            "url": options["url"],
+            "created_at": timezone.now().isoformat(),
+            "concurrency": options["concurrency"],
+            "requests": options["requests"],
+            "result": result,
+        }
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+        if options["compare"]:
+            self.compare(options["compare"], report)
+
+    def fetch(self, url):
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, timeout=self.timeout) as response:
+                response.read()
+                ok = response.status < 400
+        except (urllib.error.URLError, TimeoutError):
+            ok = False
+        return (time.perf_counter() - started) * 1000, ok
+
+    def compare(self, path, report):
+        with open(path) as f:
+            baseline = json.load(f)
+
+        before, after = baseline["result"], report["result"]
+        change = (
+            (after["requests_per_second"] - before["requests_per_second"])
+            / before["requests_per_second"]
+            * 100
+            if before["requests_per_second"]
+            else 0
+        )
+        self.stdout.write(
+            f"{baseline['label']} -> {report['label']}: "
+            f"{before['requests_per_second']:.1f} -> {after['requests_per_second']:.1f} req/s "
+            f"({change:+.1f}%)  p95 {before['p95_ms']:.2f} -> {after['p95_ms']:.2f} ms"
+        )
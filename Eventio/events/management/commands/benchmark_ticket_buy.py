@@ -0,0 +1,101 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from events.models import Event, Purchase, Ticket
+
+
+@transaction.atomic
+def buy_with_row_lock(user, event, quantity, amount_paid=0):
+    """Previous Ticket.buy implementation, kept as the benchmark baseline"""
+    ticket = Ticket.objects.select_for_update().get(event=event)
+
+    if ticket.quantity <= 0 or ticket.quantity < quantity:
+        raise IntegrityError("Ticket quantity insufficient")
+
+    ticket.quantity = F("quantity") - quantity
+    ticket.save()
+
+    return Purchase.objects.create(
+        ticket=ticket,
+        user=user,
+        quantity=quantity,
+        event_name=event.title,
+        amount_paid=amount_paid,
+    )
+
+
+STRATEGIES = {
+    "row_lock": buy_with_row_lock,
+    "conditional_update": Ticket.buy,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure concurrent ticket purchases per second for the row lock baseline and the "
+        "conditional update used by Ticket.buy. Run against PostgreSQL, SQLite serializes writers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--purchases", type=int, default=2000)
+        parser.add_argument("--stock", type=int, default=None, help="Defaults to --purchases")
+        parser.add_argument("--strategy", choices=STRATEGIES.keys(), action="append")
+
+    def handle(self, *args, **options):
+        stock = options["stock"] or options["purchases"]
+        user = User.objects.create(username=f"bench-{uuid.uuid4().hex[:12]}")
+
+        try:
+            for name in options["strategy"] or STRATEGIES:
+                self.run_strategy(name, user, stock, options["threads"], options["purchases"])
+        finally:
+            user.delete()
+
+    def run_strategy(self, name, user, stock, threads, purchases):
+        buy = STRATEGIES[name]
+        event = Event.objects.create(
+            title=f"Benchmark {name}",
+            description="Ticket buy benchmark",
+            location="Benchmark",
+            date=timezone.now(),
+            category="Benchmark",
+            event_type="paid",
+            created_by=user,
+        )
+        Ticket.objects.create(event=event, price=10, quantity=stock)
+
+        def worker(attempts):
+            bought = 0
+            try:
+                for _ in range(attempts):
+                    try:
+                        buy(user, event, 1, 1000)
+                        bought += 1
+                    except IntegrityError:
+                        pass
+            finally:
+                connection.close()
+            return bought
+
+        batches = [purchases // threads + (i < purchases % threads) for i in range(threads)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            bought = sum(pool.map(worker, batches))
+        elapsed = time.perf_counter() - started
+
+        sold = Purchase.objects.filter(ticket__event=event).aggregate(total=Sum("quantity"))
+        remaining = Ticket.objects.get(event=event).quantity
+        oversold = (sold["total"] or 0) + remaining != stock
+        event.delete()
+
+        self.stdout.write(
+            f"{name:<20} {bought:>6} bought {purchases - bought:>6} sold out "
+            f"{bought / elapsed:>10.1f} purchases/s"
+            + (self.style.ERROR("  OVERSOLD") if oversold else "")
+        )
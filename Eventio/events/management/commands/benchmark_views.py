@@ -0,0 +1,181 @@
+import json
+import random
+import statistics
+import subprocess
+import time
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from events.models import Event, Registration, Ticket
+
+SEARCH_TERMS = ["summer", "jazz", "python", "festival", "warsaw", "music", "data", "night"]
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure latency and query counts of the main views through the test client and "
+        "write the results as JSON. Run seed_data first for realistic volumes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--output", help="Write results to this JSON file")
+        parser.add_argument("--compare", help="Print the change against a previous results file")
+        parser.add_argument(
+            "--cold", action="store_true", help="Clear the cache before every request"
+        )
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        self.cold = options["cold"]
+        iterations = options["iterations"]
+
+        events = list(Event.objects.active().values_list("pk", flat=True)[:500])
+        if not events:
+            raise CommandError("No approved events found, run seed_data first")
+
+        busiest = (
+            Registration.objects.values("user")
+            .annotate(count=Count("pk"))
+            .order_by("-count")
+            .values_list("user", flat=True)
+            .first()
+        )
+        user = User.objects.filter(pk=busiest).first() or User.objects.first()
+        ticket = (
+            Ticket.objects.filter(event__status="approved", quantity__gt=0)
+            .select_related("event")
+            .first()
+        )
+
+        anonymous = Client(REMOTE_ADDR="192.0.2.1")
+        authenticated = Client(REMOTE_ADDR="192.0.2.1")
+        authenticated.force_login(user)
+
+        scenarios = {
+            "event_list": lambda: anonymous.get(reverse("event_list")),
+            "event_list_htmx": lambda: anonymous.get(
+                reverse("event_list"), headers={"HX-Request": "true"}
+            ),
+            "event_detail": lambda: anonymous.get(
+                reverse("event_detail", kwargs={"pk": self.random.choice(events)})
+            ),
+            "event_detail_authenticated": lambda: authenticated.get(
+                reverse("event_detail", kwargs={"pk": self.random.choice(events)})
+            ),
+            "event_search": lambda: anonymous.get(
+                reverse("event_search"), {"q": self.random.choice(SEARCH_TERMS)}
+            ),
+            "account_detail": lambda: authenticated.get(reverse("account_detail")),
+        }
+        if ticket is not None:
+            scenarios["ticket_buy"] = lambda: self.buy(user, ticket.event)
+
+        results = {}
+        # Served to "testserver" over plain HTTP regardless of the deployment settings
+        with override_settings(ALLOWED_HOSTS=["testserver"], SECURE_SSL_REDIRECT=False):
+            for name, scenario in scenarios.items():
+                results[name] = self.measure(scenario, iterations)
+                self.print_result(name, results[name])
+
+        report = {
+            "commit": self.current_commit(),
+            "created_at": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "iterations": iterations,
+            "cold_cache": self.cold,
+            "results": results,
+        }
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+        if options["compare"]:
+            self.compare(options["compare"], results)
+
+    @staticmethod
+    def buy(user, event):
+        # Roll back so repeated runs measure the same stock
+        with transaction.atomic():
+            try:
+                Ticket.buy(user, event, 1, 0)
+            except IntegrityError:
+                pass
+            transaction.set_rollback(True)
+
+    def measure(self, scenario, iterations):
+        timings = []
+        queries = []
+        for _ in range(iterations):
+            if self.cold:
+                cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = scenario()
+                timings.append((time.perf_counter() - started) * 1000)
+            if response is not None and response.status_code >= 400:
+                raise CommandError(f"Benchmark request failed with status {response.status_code}")
+            queries.append(len(context.captured_queries))
+
+        return {
+            "p50_ms": round(percentile(timings, 50), 2),
+            "p95_ms": round(percentile(timings, 95), 2),
+            "mean_ms": round(statistics.mean(timings), 2),
+            "queries_avg": round(statistics.mean(queries), 2),
+            "queries_max": max(queries),
+        }
+
+    def print_result(self, name, result):
+        self.stdout.write(
+            f"{name:<28} p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms  "
+            f"queries {result['queries_avg']:>6.1f} (max {result['queries_max']})"
+        )
+
+    def compare(self, path, results):
+        with open(path) as f:
+            baseline = json.load(f)["results"]
+
+        self.stdout.write(f"\nChange against {path}:")
+        for name, result in results.items():
+            if name not in baseline:
+                continue
+            before = baseline[name]
+            change = (
+                (result["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100
+                if before["p95_ms"]
+                else 0
+            )
+            self.stdout.write(
+                f"{name:<28} p95 {before['p95_ms']:>8.2f} -> {result['p95_ms']:>8.2f} ms "
+                f"({change:+.1f}%)  "
+                f"queries {before['queries_avg']:>6.1f} -> {result['queries_avg']:.1f}"
+            )
+
+    @staticmethod
+    def current_commit():
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=settings.BASE_DIR,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from events.geo import geocode
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = "Store coordinates and geohashes of events, by default only of events without them"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all", action="store_true", help="Geocode every event again, not just missing ones"
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        events = Event.objects.only("id", "location")
+        if not options["all"]:
+            events = events.filter(geohash="")
+
+        # Seeded and real events share a handful of locations, look each up once
+        places = {}
+        batch = []
+        found = total = 0
+        for event in events.iterator(chunk_size=options["batch_size"]):
+            if event.location not in places:
+                places[event.location] = geocode(event.location)
+            event.latitude, event.longitude, event.geohash = places[event.location]
+            found += bool(event.geohash)
+            total += 1
+            batch.append(event)
+            if len(batch) >= options["batch_size"]:
+                Event.objects.bulk_update(batch, ["latitude", "longitude", "geohash"])
+                batch = []
+        if batch:
+            Event.objects.bulk_update(batch, ["latitude", "longitude", "geohash"])
+
+        self.stdout.write(self.style.SUCCESS(f"Geocoded {found} of {total} events"))
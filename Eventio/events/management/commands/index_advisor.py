@@ -0,0 +1,111 @@
+import re
+import textwrap
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from events.archive import archive_cutoff
+from events.models import Event
+from events.querysets import (
+    LATEST_PURCHASES,
+    LATEST_REGISTRATIONS,
+    NEWEST_FIRST,
+    account_events,
+    account_purchases,
+    account_registrations,
+    detail_events,
+    event_reviews,
+    events_to_archive,
+    listed_events,
+    membership_querysets,
+    popular_event_ids,
+    search_results,
+)
+
+SEARCH_TERM = "music"
+# 25 km around Krakow, present in the geocoder fixture and the seeded data
+NEAR = {"lat": 50.0647, "lon": 19.945, "km": 25}
+
+# Full table scans in EXPLAIN output. SQLite reports ``SCAN <table>`` without an index,
+# ``SCAN <table> USING INDEX`` walks an index in order and virtual tables are FTS5 lookups.
+SEQUENTIAL_SCAN = {
+    "postgresql": re.compile(r"Seq Scan on (\w+)"),
+    "sqlite": re.compile(r"\bSCAN (\w+)\b(?! USING)(?! VIRTUAL)"),
+}
+
+
+def canonical_querysets(user, event):
+    """The querysets of views/event.py and views/account.py, sliced like their pages"""
+    listed = listed_events()
+    popular_ids = list(popular_event_ids()[:4])
+    search, ranked = search_results(SEARCH_TERM)
+    nearby, newest = search_results(near=NEAR)
+    purchases, archived_purchases = account_purchases(user)
+    querysets = {
+        "event_list.popular_ids": popular_event_ids()[:4],
+        "event_list.popular": listed.filter(pk__in=popular_ids).popular(),
+        "event_list.featured": listed[:4],
+        "event_list.recent": listed.exclude(pk__in=popular_ids).order_by(*NEWEST_FIRST)[:5],
+        "event_detail.event": detail_events().filter(pk=event.pk),
+        "event_detail.reviews": event_reviews(event).order_by(*NEWEST_FIRST)[:5],
+        "event_search": search.order_by(*ranked)[:5],
+        "event_search.near": nearby.order_by(*newest)[:5],
+        "archive_events": events_to_archive(archive_cutoff()).values_list("pk", flat=True)[:500],
+        "account_detail.purchases": purchases.order_by(*LATEST_PURCHASES)[:6],
+        "account_detail.archived_purchases": archived_purchases.order_by(*LATEST_PURCHASES)[:6],
+        "account_detail.registers": account_registrations(user).order_by(*LATEST_REGISTRATIONS)[:6],
+        "account_detail.events": account_events(user, "approved").order_by(*NEWEST_FIRST)[:6],
+    }
+    for name, queryset in membership_querysets(user).items():
+        querysets[f"membership.{name}"] = queryset
+    return querysets
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN on the querysets of the main views and flag sequential scans. "
+        "Plans depend on table statistics, run it against seeded or production-like data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--allow",
+            nargs="*",
+            default=[],
+            help="Tables that are small enough to be scanned, e.g. events_ticket",
+        )
+        parser.add_argument(
+            "--fail", action="store_true", help="Exit with an error when a scan is found"
+        )
+        parser.add_argument("--verbose-plans", action="store_true", help="Print every plan")
+
+    def handle(self, *args, **options):
+        pattern = SEQUENTIAL_SCAN.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f"EXPLAIN parsing is not supported for {connection.vendor}")
+
+        user = User.objects.order_by("pk").first()
+        event = Event.objects.active().order_by("pk").first()
+        if user is None or event is None:
+            raise CommandError("The advisor needs at least one user and one approved event")
+
+        querysets = canonical_querysets(user, event)
+        flagged = 0
+        for name, queryset in querysets.items():
+            plan = queryset.explain()
+            scans = [table for table in pattern.findall(plan) if table not in options["allow"]]
+
+            if scans:
+                flagged += 1
+                self.stdout.write(
+                    self.style.WARNING(f"{name}: sequential scan on {', '.join(scans)}")
+                )
+            else:
+                self.stdout.write(f"{name}: ok")
+            if scans or options["verbose_plans"]:
+                self.stdout.write(textwrap.indent(plan, "    "))
+
+        if flagged and options["fail"]:
+            raise CommandError(f"{flagged} queries use sequential scans")
+        self.stdout.write(
+            self.style.SUCCESS(f"Checked {len(querysets)} queries, {flagged} with sequential scans")
+        )
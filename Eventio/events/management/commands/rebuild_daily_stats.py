@@ -0,0 +1,54 @@
+from collections import defaultdict
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from events.models import EventDailyStats, Purchase, Registration
+
+
+class Command(BaseCommand):
+    help = "Recalculate the daily registration and sales rollups from registrations and purchases"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--event", help="Only rebuild the rollups of this event id")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        registrations = Registration.objects.all()
+        purchases = Purchase.objects.all()
+        stats = EventDailyStats.objects.all()
+        if options["event"]:
+            registrations = registrations.filter(event_id=options["event"])
+            purchases = purchases.filter(ticket__event_id=options["event"])
+            stats = stats.filter(event_id=options["event"])
+
+        rows = defaultdict(lambda: {"registrations": 0, "tickets_sold": 0, "revenue": 0})
+        for row in (
+            registrations.annotate(day=TruncDate("registered_at"))
+            .values("event_id", "day")
+            .annotate(count=Count("pk"))
+            .order_by()
+        ):
+            rows[row["event_id"], row["day"]]["registrations"] = row["count"]
+
+        for row in (
+            purchases.annotate(day=TruncDate("purchased_at"), event_id=F("ticket__event_id"))
+            .values("event_id", "day")
+            .annotate(tickets=Sum("quantity"), revenue=Sum("amount_paid"))
+            .order_by()
+        ):
+            rows[row["event_id"], row["day"]].update(
+                tickets_sold=row["tickets"], revenue=row["revenue"]
+            )
+
+        with transaction.atomic():
+            stats.delete()
+            EventDailyStats.objects.bulk_create(
+                (
+                    EventDailyStats(event_id=event_id, day=day, **counters)
+                    for (event_id, day), counters in rows.items()
+                ),
+                batch_size=options["batch_size"],
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(rows)} daily stats rows"))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from events.models import Event, Review
+
+
+class Command(BaseCommand):
+    help = "Recalculate Event.rating_sum and Event.review_count from the reviews table"
+
+    def handle(self, *args, **options):
+        reviews = Review.objects.filter(event=OuterRef("pk")).order_by().values("event")
+        updated = Event.objects.update(
+            rating_sum=Coalesce(Subquery(reviews.annotate(total=Sum("rating")).values("total")), 0),
+            review_count=Coalesce(Subquery(reviews.annotate(count=Count("pk")).values("count")), 0),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rating aggregates for {updated} events"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from events.models import Event, Registration
+
+
+class Command(BaseCommand):
+    help = "Recalculate Event.registration_count from the registrations table"
+
+    def handle(self, *args, **options):
+        counts = (
+            Registration.objects.filter(event=OuterRef("pk"))
+            .order_by()
+            .values("event")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        updated = Event.objects.update(registration_count=Coalesce(Subquery(counts), 0))
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt registration counts for {updated} events"))
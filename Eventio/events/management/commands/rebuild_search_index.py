@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from events.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of every event, e.g. after bulk inserts"
+
+    def handle(self, *args, **options):
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS("Rebuilt the event search index"))
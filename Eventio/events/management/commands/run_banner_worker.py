@@ -0,0 +1,25 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand
+from events.banners import process_jobs
+
+
+class Command(BaseCommand):
+    help = "Render queued event banners in a pool of worker processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=2)
+        parser.add_argument("--batch-size", type=int, default=10)
+        parser.add_argument("--poll-interval", type=float, default=2.0)
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is drained")
+
+    def handle(self, *args, **options):
+        with ProcessPoolExecutor(max_workers=options["processes"]) as pool:
+            while True:
+                processed = process_jobs(pool, limit=options["batch_size"])
+                if processed:
+                    self.stdout.write(f"Processed {processed} banner jobs")
+                    continue
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
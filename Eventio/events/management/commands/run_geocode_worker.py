@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from events.geocoding import process_jobs
+
+
+class Command(BaseCommand):
+    help = "Geocode the locations of saved events, run a single worker to respect the geocoder"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10)
+        parser.add_argument("--poll-interval", type=float, default=2.0)
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is drained")
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_jobs(limit=options["batch_size"])
+            if processed:
+                self.stdout.write(f"Processed {processed} geocode jobs")
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["poll_interval"])
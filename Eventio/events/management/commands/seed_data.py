@@ -0,0 +1,174 @@
+import random
+from datetime import timedelta
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from events.caching import SECTIONS, bump_generations
+from events.models import Event, Purchase, Registration, Review, Ticket
+from events.search import rebuild_search_index
+
+CATEGORIES = ["Music", "Tech", "Sports", "Art", "Food", "Business", "Health", "Education"]
+CITIES = ["Warsaw", "Krakow", "Berlin", "Prague", "Vienna", "Paris", "London", "Madrid"]
+WORDS = [
+    "summer", "winter", "open", "night", "festival", "meetup", "conference", "workshop",
+    "live", "jazz", "python", "django", "marathon", "gallery", "street", "food", "startup",
+    "yoga", "science", "film", "rock", "classic", "design", "data", "market", "charity",
+]  # fmt: skip
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with synthetic users, events, tickets, registrations, reviews "
+        "and purchases"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--events", type=int, default=5000)
+        parser.add_argument("--registrations", type=int, default=50000)
+        parser.add_argument("--reviews", type=int, default=20000)
+        parser.add_argument("--purchases", type=int, default=20000)
+        parser.add_argument("--paid-ratio", type=float, default=0.3)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--seed", type=int, default=None, help="Random seed for repeatable data"
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+
+        with transaction.atomic():
+            users = self.create_users(options["users"])
+            events = self.create_events(options["events"], users, options["paid_ratio"])
+            free = [event for event in events if event.is_free]
+            tickets = self.create_tickets([event for event in events if event.is_paid])
+
+            self.create_registrations(options["registrations"], users, free)
+            self.create_reviews(options["reviews"], users, events)
+            self.create_purchases(options["purchases"], users, tickets)
+
+        # bulk_create skips signals, so rebuild what they would have maintained
+        call_command("rebuild_registration_counts", stdout=self.stdout)
+        call_command("rebuild_rating_aggregates", stdout=self.stdout)
+        call_command("rebuild_daily_stats", stdout=self.stdout)
+        call_command("geocode_events", stdout=self.stdout)
+        rebuild_search_index()
+        bump_generations(*SECTIONS)
+
+        self.stdout.write(self.style.SUCCESS("Seeding finished"))
+
+    def report(self, model, count):
+        self.stdout.write(f"Created {count} {model._meta.verbose_name_plural}")
+
+    def unique_pairs(self, count, left, right):
+        count = min(count, len(left) * len(right))
+        pairs = set()
+        while len(pairs) < count:
+            pairs.add((self.random.choice(left), self.random.choice(right)))
+        return pairs
+
+    def create_users(self, count):
+        prefix = timezone.now().strftime("%Y%m%d%H%M%S")
+        password = make_password(None)
+        users = User.objects.bulk_create(
+            (
+                User(
+                    username=f"seed-{prefix}-{i}",
+                    email=f"seed-{prefix}-{i}@example.com",
+                    password=password,
+                )
+                for i in range(count)
+            ),
+            batch_size=self.batch_size,
+        )
+        self.report(User, len(users))
+        # SQLite doesn't return primary keys from bulk_create on every version
+        return list(User.objects.filter(username__startswith=f"seed-{prefix}-"))
+
+    def create_events(self, count, users, paid_ratio):
+        now = timezone.now()
+        events = []
+        for _ in range(count):
+            title = " ".join(self.random.sample(WORDS, 3)).title()
+            events.append(
+                Event(
+                    title=title,
+                    description=f"{title} " + " ".join(self.random.choices(WORDS, k=30)),
+                    location=self.random.choice(CITIES),
+                    category=self.random.choice(CATEGORIES),
+                    date=now + timedelta(days=self.random.randint(-365, 365)),
+                    event_type="paid" if self.random.random() < paid_ratio else "free",
+                    status="approved" if self.random.random() < 0.9 else "pending",
+                    created_by=self.random.choice(users),
+                )
+            )
+        events = Event.objects.bulk_create(events, batch_size=self.batch_size)
+        self.report(Event, len(events))
+        return events
+
+    def create_tickets(self, events):
+        tickets = Ticket.objects.bulk_create(
+            (
+                Ticket(
+                    event=event,
+                    price=self.random.randint(5, 300),
+                    quantity=self.random.randint(100, 100000),
+                )
+                for event in events
+            ),
+            batch_size=self.batch_size,
+        )
+        self.report(Ticket, len(tickets))
+        return list(Ticket.objects.filter(event__in=events).select_related("event"))
+
+    def create_registrations(self, count, users, events):
+        if not events:
+            return
+        registrations = Registration.objects.bulk_create(
+            (
+                Registration(user=user, event=event)
+                for user, event in self.unique_pairs(count, users, events)
+            ),
+            batch_size=self.batch_size,
+        )
+        self.report(Registration, len(registrations))
+
+    def create_reviews(self, count, users, events):
+        if not events:
+            return
+        reviews = Review.objects.bulk_create(
+            (
+                Review(
+                    user=user,
+                    event=event,
+                    rating=self.random.randint(1, 5),
+                    comment=" ".join(self.random.choices(WORDS, k=12)),
+                )
+                for user, event in self.unique_pairs(count, users, events)
+            ),
+            batch_size=self.batch_size,
+        )
+        self.report(Review, len(reviews))
+
+    def create_purchases(self, count, users, tickets):
+        if not tickets:
+            return
+        purchases = []
+        for _ in range(count):
+            ticket = self.random.choice(tickets)
+            quantity = self.random.randint(1, 4)
+            purchases.append(
+                Purchase(
+                    ticket=ticket,
+                    user=self.random.choice(users),
+                    quantity=quantity,
+                    event_name=ticket.event.title,
+                    amount_paid=ticket.price_to_cents * quantity,
+                )
+            )
+        purchases = Purchase.objects.bulk_create(purchases, batch_size=self.batch_size)
+        self.report(Purchase, len(purchases))
@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from events.mail import deliver_outbox
+
+
+class Command(BaseCommand):
+    help = "Send queued outbox emails in batches over a reused mail connection"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument("--poll-interval", type=float, default=5.0)
+        parser.add_argument("--once", action="store_true", help="Exit once the outbox is drained")
+
+    def handle(self, *args, **options):
+        while True:
+            sent = deliver_outbox(limit=options["batch_size"])
+            if sent:
+                self.stdout.write(f"Processed {sent} outbox emails")
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["poll_interval"])
@@ -0,0 +1,40 @@
+"""
+Per-user membership cache.
+
+The ids of the events a user registered for, bought tickets for or reviewed are loaded
+once into the cache, so detail pages and list cards can check them without queries.
+Signals drop the entry whenever one of those rows is written, the next read reloads it.
+"""
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from events.querysets import membership_querysets
+
+MEMBERSHIP_TIMEOUT = 60 * 60
+
+
+def _key(user_id):
+    return f"events:membership:{user_id}"
+
+
+def get_membership(user):
+    membership = cache.get(_key(user.pk))
+    if membership is None:
+        membership = {name: set(queryset) for name, queryset in membership_querysets(user).items()}
+        cache.set(_key(user.pk), membership, MEMBERSHIP_TIMEOUT)
+    return membership
+
+
+aget_membership = sync_to_async(get_membership)
+
+
+def member_event_ids(membership):
+    """Ids of the events the user takes part in, as rendered into list pages"""
+    return sorted(str(pk) for pk in membership["joined"] | membership["purchased"])
+
+
+def forget_membership(user_id):
+    # Delete again after commit, a concurrent request may have cached the old rows meanwhile
+    cache.delete(_key(user_id))
+    transaction.on_commit(lambda: cache.delete(_key(user_id)))
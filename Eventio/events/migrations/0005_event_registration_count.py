@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:39
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_registration_count(apps, schema_editor):
+    Event = apps.get_model("events", "Event")
+    Registration = apps.get_model("events", "Registration")
+
+    counts = (
+        Registration.objects.filter(event=OuterRef("pk"))
+        .order_by()
+        .values("event")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    Event.objects.update(registration_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("events", "0004_purchase_event_name"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="registration_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_registration_count, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(fields=["status", "-registration_count"], name="event_popular_idx"),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:05
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    Event = apps.get_model("events", "Event")
+    vendor = schema_editor.connection.vendor
+
+    if vendor == "postgresql":
+        from django.contrib.postgres.search import SearchVector
+
+        schema_editor.execute(
+            "CREATE INDEX event_search_vector_idx ON events_event USING gin (search_vector)"
+        )
+        Event.objects.update(
+            search_vector=SearchVector("title", weight="A")
+            + SearchVector("category", weight="B")
+            + SearchVector("location", weight="C")
+            + SearchVector("description", weight="D")
+        )
+    elif vendor == "sqlite":
+        # FTS rows are keyed by an explicit INTEGER PRIMARY KEY per event id, the implicit rowid
+        # of the UUID keyed events table may be renumbered by VACUUM
+        schema_editor.execute(
+            "CREATE TABLE events_event_fts_docs ("
+            "rowid INTEGER PRIMARY KEY, event_id char(32) NOT NULL UNIQUE)"
+        )
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE events_event_fts USING fts5("
+            "title, description, location, category)"
+        )
+        schema_editor.execute(
+            "INSERT INTO events_event_fts_docs (event_id) SELECT id FROM events_event"
+        )
+        schema_editor.execute(
+            "INSERT INTO events_event_fts (rowid, title, description, location, category) "
+            "SELECT docs.rowid, event.title, event.description, event.location, event.category "
+            "FROM events_event AS event "
+            "JOIN events_event_fts_docs AS docs ON docs.event_id = event.id"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS event_search_vector_idx")
+    elif vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS events_event_fts")
+        schema_editor.execute("DROP TABLE IF EXISTS events_event_fts_docs")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("events", "0005_event_registration_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        # GIN index and FTS5 table are backend specific, so they are not declared on the model.
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
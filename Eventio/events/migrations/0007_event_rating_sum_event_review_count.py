@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:40
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def populate_rating_aggregates(apps, schema_editor):
+    Event = apps.get_model("events", "Event")
+    Review = apps.get_model("events", "Review")
+
+    reviews = Review.objects.filter(event=OuterRef("pk")).order_by().values("event")
+    Event.objects.update(
+        rating_sum=Coalesce(Subquery(reviews.annotate(total=Sum("rating")).values("total")), 0),
+        review_count=Coalesce(Subquery(reviews.annotate(count=Count("pk")).values("count")), 0),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("events", "0006_event_search_vector"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="rating_sum",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="review_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("events", "0008_bannerjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="purchase",
+            name="session_id",
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("events", "0011_outboxemail"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(fields=["status", "-created_at"], name="event_status_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(fields=["status", "title"], name="event_status_title_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(fields=["created_by", "status"], name="event_owner_status_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="purchase",
+            index=models.Index(fields=["user", "-purchased_at"], name="purchase_user_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="registration",
+            index=models.Index(
+                fields=["user", "-registered_at"], name="registration_user_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(fields=["event", "-created_at"], name="review_event_date_idx"),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def populate_daily_stats(apps, schema_editor):
+    EventDailyStats = apps.get_model("events", "EventDailyStats")
+    Registration = apps.get_model("events", "Registration")
+    Purchase = apps.get_model("events", "Purchase")
+
+    rows = {}
+    for row in (
+        Registration.objects.annotate(day=TruncDate("registered_at"))
+        .values("event_id", "day")
+        .annotate(count=Count("pk"))
+        .order_by()
+    ):
+        rows[row["event_id"], row["day"]] = {"registrations": row["count"]}
+
+    for row in (
+        Purchase.objects.annotate(day=TruncDate("purchased_at"), event_id=F("ticket__event_id"))
+        .values("event_id", "day")
+        .annotate(tickets=Sum("quantity"), revenue=Sum("amount_paid"))
+        .order_by()
+    ):
+        rows.setdefault((row["event_id"], row["day"]), {}).update(
+            tickets_sold=row["tickets"], revenue=row["revenue"]
+        )
+
+    EventDailyStats.objects.bulk_create(
+        (
+            EventDailyStats(event_id=event_id, day=day, **counters)
+            for (event_id, day), counters in rows.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("events", "0012_composite_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EventDailyStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("registrations", models.IntegerField(default=0)),
+                ("tickets_sold", models.IntegerField(default=0)),
+                ("revenue", models.BigIntegerField(default=0)),
+                (
+                    "event",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_stats",
+                        to="events.event",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "event daily stats",
+                "ordering": ["day"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("event", "day"), name="eventdailystats_event_day"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(populate_daily_stats, migrations.RunPython.noop),
+    ]
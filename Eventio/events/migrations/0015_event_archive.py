@@ -0,0 +1,160 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("events", "0014_event_geolocation"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedEvent",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(editable=False, primary_key=True, serialize=False),
+                ),
+                ("title", models.CharField(max_length=200)),
+                ("description", models.TextField()),
+                ("location", models.CharField(max_length=200)),
+                ("date", models.DateTimeField()),
+                ("category", models.CharField(max_length=100)),
+                (
+                    "banner",
+                    models.ImageField(blank=True, null=True, upload_to="banners/"),
+                ),
+                (
+                    "event_type",
+                    models.CharField(choices=[("free", "Free"), ("paid", "Paid")], max_length=4),
+                ),
+                ("created_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField()),
+                ("status", models.CharField(max_length=10)),
+                ("registration_count", models.PositiveIntegerField(default=0)),
+                ("rating_sum", models.PositiveIntegerField(default=0)),
+                ("review_count", models.PositiveIntegerField(default=0)),
+                (
+                    "ticket_price",
+                    models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+                ),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "ordering": ["-date"],
+            },
+        ),
+        migrations.CreateModel(
+            name="ArchivedPurchase",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("quantity", models.PositiveIntegerField()),
+                ("event_name", models.CharField(max_length=200)),
+                ("amount_paid", models.PositiveIntegerField()),
+                ("purchased_at", models.DateTimeField()),
+                ("session_id", models.CharField(blank=True, max_length=255, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ArchivedRegistration",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("registered_at", models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ArchivedReview",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("rating", models.PositiveIntegerField()),
+                ("comment", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField()),
+            ],
+            options={
+                "ordering": ["-created_at"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(fields=["date"], name="event_date_idx"),
+        ),
+        migrations.AddField(
+            model_name="archivedevent",
+            name="created_by",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="archived_events",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedpurchase",
+            name="event",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="purchases",
+                to="events.archivedevent",
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedpurchase",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="archived_purchases",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedregistration",
+            name="event",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="registrations",
+                to="events.archivedevent",
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedregistration",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="archived_registrations",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedreview",
+            name="event",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="reviews",
+                to="events.archivedevent",
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedreview",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="archived_reviews",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="archivedpurchase",
+            index=models.Index(
+                fields=["user", "-purchased_at"], name="archivedpurchase_user_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="archivedreview",
+            index=models.Index(
+                fields=["event", "-created_at"], name="archivedreview_event_date_idx"
+            ),
+        ),
+    ]
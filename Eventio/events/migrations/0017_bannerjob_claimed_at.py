@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("events", "0015_event_archive"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bannerjob",
+            name="claimed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
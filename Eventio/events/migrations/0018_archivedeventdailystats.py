@@ -0,0 +1,49 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("events", "0017_bannerjob_claimed_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedEventDailyStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("registrations", models.IntegerField(default=0)),
+                ("tickets_sold", models.IntegerField(default=0)),
+                ("revenue", models.BigIntegerField(default=0)),
+                (
+                    "event",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_stats",
+                        to="events.archivedevent",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "archived event daily stats",
+                "ordering": ["day"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("event", "day"),
+                        name="archivedeventdailystats_event_day",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("events", "0018_archivedeventdailystats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="card_updated_at",
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -1,7 +1,33 @@
+from .archive import (
+    ArchivedEvent,
+    ArchivedEventDailyStats,
+    ArchivedPurchase,
+    ArchivedRegistration,
+    ArchivedReview,
+)
+from .banner_job import BannerJob
+from .daily_stats import EventDailyStats
 from .events import Event
+from .geocode_job import GeocodeJob
+from .outbox import OutboxEmail
 from .purchase import Purchase
 from .registration import Registration
 from .review import Review
 from .ticket import Ticket
 
-__all__ = ["Event", "Ticket", "Review", "Registration", "Purchase"]
+__all__ = [
+    "Event",
+    "Ticket",
+    "Review",
+    "Registration",
+    "Purchase",
+    "BannerJob",
+    "GeocodeJob",
+    "OutboxEmail",
+    "EventDailyStats",
+    "ArchivedEvent",
+    "ArchivedRegistration",
+    "ArchivedReview",
+    "ArchivedPurchase",
+    "ArchivedEventDailyStats",
+]
@@ -0,0 +1,122 @@
+from django.contrib.auth.models import User
+from django.db import models
+
+
+class ArchivedEvent(models.Model):
+    """A finished event moved out of the live tables by archive_events, it keeps its id"""
+
+    id = models.UUIDField(primary_key=True, editable=False)
+    title = models.CharField(max_length=200)
+    description = models.TextField()
+    location = models.CharField(max_length=200)
+    date = models.DateTimeField()
+    category = models.CharField(max_length=100)
+    banner = models.ImageField(upload_to="banners/", null=True, blank=True)
+    event_type = models.CharField(max_length=4, choices=[("free", "Free"), ("paid", "Paid")])
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="archived_events")
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    status = models.CharField(max_length=10)
+    registration_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    review_count = models.PositiveIntegerField(default=0)
+    ticket_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-date"]
+
+    def __str__(self):
+        return self.title
+
+    @property
+    def is_paid(self):
+        return self.event_type == "paid"
+
+    @property
+    def is_active(self):
+        return self.status == "approved"
+
+    @property
+    def avg_rating(self):
+        return round(self.rating_sum / self.review_count, 2) if self.review_count else 0
+
+    def is_allowed_to_view(self, user):
+        return user.is_staff or self.created_by == user
+
+
+class ArchivedRegistration(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="archived_registrations")
+    event = models.ForeignKey(ArchivedEvent, on_delete=models.CASCADE, related_name="registrations")
+    registered_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.user.username} registered for {self.event.title}"
+
+
+class ArchivedReview(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="archived_reviews")
+    event = models.ForeignKey(ArchivedEvent, on_delete=models.CASCADE, related_name="reviews")
+    rating = models.PositiveIntegerField()
+    comment = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["event", "-created_at"], name="archivedreview_event_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"Review by {self.user.username} for {self.event.title} - {self.rating}"
+
+
+class ArchivedPurchase(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="archived_purchases")
+    event = models.ForeignKey(ArchivedEvent, on_delete=models.CASCADE, related_name="purchases")
+    quantity = models.PositiveIntegerField()
+    event_name = models.CharField(max_length=200)
+    amount_paid = models.PositiveIntegerField()
+    purchased_at = models.DateTimeField()
+    session_id = models.CharField(max_length=255, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-purchased_at"], name="archivedpurchase_user_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} bought ticket for {self.event_name}"
+
+    @property
+    def total(self):
+        return f"{self.amount_paid // 100}.{self.amount_paid % 100:02}"
+
+
+class ArchivedEventDailyStats(models.Model):
+    """Daily rollup of an archived event, the organizer dashboard keeps showing it"""
+
+    event = models.ForeignKey(ArchivedEvent, on_delete=models.CASCADE, related_name="daily_stats")
+    day = models.DateField()
+    registrations = models.IntegerField(default=0)
+    tickets_sold = models.IntegerField(default=0)
+    revenue = models.BigIntegerField(default=0)
+
+    class Meta:
+        ordering = ["day"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["event", "day"], name="archivedeventdailystats_event_day"
+            )
+        ]
+        verbose_name_plural = "archived event daily stats"
+
+    def __str__(self):
+        return f"Stats of {self.event_id} on {self.day}"
+
+    @property
+    def revenue_total(self):
+        return f"{self.revenue // 100}.{self.revenue % 100:02}"
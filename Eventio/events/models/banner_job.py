@@ -0,0 +1,28 @@
+from django.db import models
+
+
+class BannerJob(models.Model):
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("processing", "Processing"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+    MAX_ATTEMPTS = 3
+
+    event = models.ForeignKey("Event", on_delete=models.CASCADE, related_name="banner_jobs")
+    source = models.CharField(max_length=255)
+    previous = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["created_at"]
+        indexes = [models.Index(fields=["status", "created_at"], name="bannerjob_queue_idx")]
+
+    def __str__(self):
+        return f"Banner job for {self.event_id} ({self.status})"
@@ -0,0 +1,39 @@
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+
+
+class EventDailyStats(models.Model):
+    """Per day rollup of an event's registrations and ticket sales, kept up to date by signals"""
+
+    event = models.ForeignKey("Event", on_delete=models.CASCADE, related_name="daily_stats")
+    day = models.DateField()
+    registrations = models.IntegerField(default=0)
+    tickets_sold = models.IntegerField(default=0)
+    revenue = models.BigIntegerField(default=0)
+
+    class Meta:
+        ordering = ["day"]
+        constraints = [
+            models.UniqueConstraint(fields=["event", "day"], name="eventdailystats_event_day")
+        ]
+        verbose_name_plural = "event daily stats"
+
+    def __str__(self):
+        return f"Stats of {self.event_id} on {self.day}"
+
+    @property
+    def revenue_total(self):
+        return f"{self.revenue // 100}.{self.revenue % 100:02}"
+
+    @classmethod
+    def add(cls, event_id, day, **deltas):
+        """Add ``deltas`` to the counters of ``event_id`` on ``day``, creating the row if needed"""
+        changes = {field: F(field) + delta for field, delta in deltas.items()}
+        if cls.objects.filter(event_id=event_id, day=day).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(event_id=event_id, day=day, **deltas)
+        except IntegrityError:
+            # Created by a concurrent write in the meantime
+            cls.objects.filter(event_id=event_id, day=day).update(**changes)
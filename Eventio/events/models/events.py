@@ -1,8 +1,13 @@
+import os
 import uuid
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.contrib.auth.models import User
 from django.urls import reverse
-from events.helpers import validate_image
+from django.utils import timezone
+from events.geo import near_events
+from events.helpers import verify_image
+from events.models.tracking import TrackChangesMixin
 from django.conf import settings
 
 
@@ -10,6 +15,12 @@ class EventQueryset(models.QuerySet):
     def active(self):
         return self.filter(status="approved")
 
+    def upcoming(self):
+        return self.filter(date__gte=timezone.now())
+
+    def past(self):
+        return self.filter(date__lt=timezone.now())
+
     def free(self):
         return self.filter(event_type="free")
 
@@ -17,13 +28,21 @@ class EventQueryset(models.QuerySet):
         return self.filter(event_type="paid")
 
     def popular(self):
-        return self.annotate(num_registers=models.Count("registrations")).order_by("-num_registers")
+        return self.order_by("-registration_count")
 
     def recent(self):
         return self.order_by("-created_at")
 
+    def search(self, query):
+        from events.search import search_events
+
+        return search_events(self, query)
+
+    def near(self, lat, lon, km):
+        return near_events(self, lat, lon, km)
 
-class Event(models.Model):
+
+class Event(TrackChangesMixin, models.Model):
     EVENT_TYPE_CHOICES = [
         ("free", "Free"),
         ("paid", "Paid"),
@@ -44,12 +63,36 @@ class Event(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="events")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Moves only with what an event card shows, counter updates leave cached cards alone
+    card_updated_at = models.DateTimeField(default=timezone.now, editable=False)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    registration_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+    latitude = models.FloatField(null=True, blank=True, editable=False)
+    longitude = models.FloatField(null=True, blank=True, editable=False)
+    # Indexed for proximity search, empty when the location couldn't be geocoded
+    geohash = models.CharField(max_length=12, blank=True, default="", editable=False)
 
     objects = EventQueryset.as_manager()
 
+    # Saving touches them without changing anything pages show
+    untracked_fields = ("updated_at", "card_updated_at", "search_vector")
+    # The ticket price is on the card too, its signal moves card_updated_at
+    card_fields = ("title", "date", "banner", "event_type")
+
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "-registration_count"], name="event_popular_idx"),
+            models.Index(fields=["status", "-created_at"], name="event_status_created_idx"),
+            models.Index(fields=["status", "title"], name="event_status_title_idx"),
+            models.Index(fields=["created_by", "status"], name="event_owner_status_idx"),
+            models.Index(fields=["geohash"], name="event_geohash_idx"),
+            # Splits upcoming from past events and finds the ones to archive
+            models.Index(fields=["date"], name="event_date_idx"),
+        ]
 
     def __str__(self):
         return self.title
@@ -66,6 +109,10 @@ class Event(models.Model):
     def is_active(self):
         return self.status == "approved"
 
+    @property
+    def avg_rating(self):
+        return round(self.rating_sum / self.review_count, 2) if self.review_count else 0
+
     def get_banner_url(self):
         return settings.STATIC_HOST + self.banner.url if self.banner else None
 
@@ -76,25 +123,49 @@ class Event(models.Model):
         return reverse("event_detail", kwargs={"pk": self.pk})
 
     def save(self, *args, **kwargs):
-        if self.banner:
-            old_banner = None
+        update_fields = kwargs.get("update_fields")
+        changed = self.changed_fields(update_fields)
+        relocated = "location" in changed
+        if relocated:
+            # Filled in by a geocode job, the request doesn't wait on the geocoder
+            self.latitude, self.longitude, self.geohash = None, None, ""
+            if update_fields is not None:
+                update_fields = kwargs["update_fields"] = {
+                    *update_fields,
+                    "latitude",
+                    "longitude",
+                    "geohash",
+                }
+        if not self._state.adding and changed.intersection(self.card_fields):
+            self.card_updated_at = timezone.now()
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "card_updated_at"}
+
+        previous = None
+        if self.banner and not self.banner._committed:
+            # New upload: store the raw file as is and let a banner job render it
             try:
-                old_banner = Event.objects.get(pk=self.pk).banner
-                if old_banner and old_banner.url == self.banner.url:
-                    return super().save(*args, **kwargs)
-            except Event.DoesNotExist:
-                pass
+                verify_image(self.banner)
+            except (IOError, SyntaxError) as e:
+                raise ValueError(f"The uploaded file is not a valid image: {e}")
 
-            try:
-                content_file = validate_image(self.banner)
-                new_filename = f"{uuid.uuid4()}.webp"
+            if self._state.adding:
+                previous = ""
+            elif self.was_loaded("banner"):
+                previous = self.loaded_value("banner")
+            else:
+                previous = Event.objects.filter(pk=self.pk).values_list("banner", flat=True).first()
 
-                self.banner.save(new_filename, content_file, save=False)
+            extension = os.path.splitext(self.banner.name)[1].lower()
+            self.banner.name = f"raw/{uuid.uuid4()}{extension}"
 
-                if old_banner:
-                    old_banner.delete(save=False)
+        super().save(*args, **kwargs)
 
-            except (IOError, SyntaxError) as e:
-                raise ValueError(f"The uploaded file is not a valid image: {e}")
+        if previous is not None:
+            from events.banners import enqueue_banner
+
+            enqueue_banner(self, previous)
+        if relocated and self.location:
+            from events.geocoding import enqueue_geocoding
 
-        return super().save(*args, **kwargs)
+            enqueue_geocoding(self)
@@ -9,6 +9,12 @@ class Purchase(models.Model):
     event_name = models.CharField(max_length=200)
     amount_paid = models.PositiveIntegerField()
     purchased_at = models.DateTimeField(auto_now_add=True)
+    session_id = models.CharField(max_length=255, unique=True, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-purchased_at"], name="purchase_user_date_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user.username} bought ticket for {self.event_name}"
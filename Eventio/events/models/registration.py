@@ -9,6 +9,9 @@ class Registration(models.Model):
 
     class Meta:
         unique_together = ["user", "event"]
+        indexes = [
+            models.Index(fields=["user", "-registered_at"], name="registration_user_date_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user.username} registered for {self.event.title}"
@@ -13,6 +13,9 @@ class Review(models.Model):
     class Meta:
         unique_together = ["user", "event"]
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["event", "-created_at"], name="review_event_date_idx"),
+        ]
 
     def __str__(self):
         return f"Review by {self.user.username} for {self.event.title} - {self.rating}"
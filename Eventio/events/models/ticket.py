@@ -2,9 +2,10 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models, IntegrityError, transaction
 from django.db.models import F
 from events.models import Purchase
+from events.models.tracking import TrackChangesMixin
 
 
-class Ticket(models.Model):
+class Ticket(TrackChangesMixin, models.Model):
     event = models.OneToOneField("Event", on_delete=models.CASCADE, related_name="ticket")
     price = models.DecimalField(
         max_digits=10,
@@ -21,22 +22,29 @@ class Ticket(models.Model):
 
     @staticmethod
     @transaction.atomic
-    def buy(user, event, quantity, amount_paid=0):
-        ticket = Ticket.objects.select_for_update().get(event=event)
-
-        if ticket.quantity <= 0 or ticket.quantity < quantity:
+    def buy(user, event, quantity, amount_paid=0, session_id=None):
+        try:
+            ticket = event.ticket
+        except Ticket.DoesNotExist:
             raise IntegrityError("Ticket quantity insufficient")
 
-        ticket.quantity = F("quantity") - quantity
-        ticket.save()
-
         purchase = Purchase.objects.create(
             ticket=ticket,
             user=user,
             quantity=quantity,
             event_name=event.title,
             amount_paid=amount_paid,
+            session_id=session_id,
         )
+
+        # The decrement locks the ticket row until commit, so it is the last statement and
+        # concurrent buyers only wait for the commit. The WHERE clause keeps them from
+        # overselling, no match rolls the purchase back.
+        updated = Ticket.objects.filter(
+            pk=ticket.pk, quantity__gt=0, quantity__gte=quantity
+        ).update(quantity=F("quantity") - quantity)
+        if not updated:
+            raise IntegrityError("Ticket quantity insufficient")
         return purchase
 
     def __str__(self):
@@ -0,0 +1,82 @@
+from django.db import models
+from django.db.models.fields.files import FieldFile
+
+
+class TrackChangesMixin(models.Model):
+    """
+    Remembers the field values an instance was loaded or last saved with, so what changed is
+    known without reading the row again. Fields listed in ``untracked_fields`` never count as
+    changed, deferred fields only once they were loaded.
+    """
+
+    untracked_fields = ()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember()
+        return instance
+
+    def _tracked_value(self, field):
+        value = getattr(self, field.attname)
+        # Files compare by name, a new upload has a name of its own until it is stored
+        if isinstance(value, FieldFile):
+            return value.name or None
+        return value
+
+    def _remember(self, fields=None):
+        if not hasattr(self, "_loaded_values"):
+            self._loaded_values = {}
+        for field in self._meta.concrete_fields:
+            if field.attname not in self.__dict__:
+                continue
+            if fields is None or field.name in fields or field.attname in fields:
+                self._loaded_values[field.name] = self._tracked_value(field)
+
+    def was_loaded(self, name):
+        return name in getattr(self, "_loaded_values", {})
+
+    def loaded_value(self, name, default=None):
+        """Value of field ``name`` when the instance was loaded or last saved"""
+        return getattr(self, "_loaded_values", {}).get(name, default)
+
+    def changed_fields(self, fields=None):
+        """Names of the fields, of ``fields`` if given, that differ from their loaded value"""
+        loaded = getattr(self, "_loaded_values", {})
+        changed = set()
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.name in self.untracked_fields:
+                continue
+            if fields is not None and field.name not in fields and field.attname not in fields:
+                continue
+            if self._state.adding or (
+                field.name in loaded and self._tracked_value(field) != loaded[field.name]
+            ):
+                changed.add(field.name)
+        return changed
+
+    def save_changes(self):
+        """Save only the changed fields, skip the query when nothing changed, return their names"""
+        changed = self.changed_fields()
+        if self._state.adding:
+            self.save()
+        elif changed:
+            auto_now = {
+                field.name
+                for field in self._meta.concrete_fields
+                if getattr(field, "auto_now", False)
+            }
+            self.save(update_fields=changed | auto_now)
+        return changed
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # After the post_save receivers, they still see what the save changed
+        self._remember(kwargs.get("update_fields"))
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using, fields, **kwargs)
+        self._remember(fields)
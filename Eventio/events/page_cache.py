@@ -0,0 +1,175 @@
+"""
+Full-page cache for anonymous visitors.
+
+``cache_anonymous_page`` stores whole responses of a view keyed on path, query string and
+the ``HX-Request`` header, so full pages and htmx partials never collide. Requests carrying
+a session or messages cookie always reach the view. Every cached page lists the tags it
+depends on; ``purge_pages()`` gives a tag a new version, which turns every page stored
+under the old version into a miss.
+
+Pages embed a CSRF token. It is stored as a placeholder and each visitor gets their own
+token when the page is served. Pages are rendered from the primary database, never from a
+replica that may not have caught up with the write that purged them.
+"""
+
+import hashlib
+import re
+import time
+import uuid
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.middleware.csrf import (
+    CSRF_ALLOWED_CHARS,
+    CSRF_TOKEN_LENGTH,
+    _unmask_cipher_token,
+    get_token,
+)
+from django.utils.cache import get_conditional_response
+from events.routing import read_from_primary
+
+CSRF_PLACEHOLDER = b"__csrf_token__"
+_token_char = f"[{CSRF_ALLOWED_CHARS}]"
+CSRF_CANDIDATE = re.compile(
+    rf"(?<!{_token_char}){_token_char}{{{CSRF_TOKEN_LENGTH}}}(?!{_token_char})".encode()
+)
+# The stored ETag covers the CSRF secret of the visitor the page was rendered for
+SKIPPED_HEADERS = {"etag", "content-length"}
+
+
+def _tag_key(tag):
+    return f"events:page-tag:{tag}"
+
+
+def _page_key(request):
+    variant = f"{request.get_full_path()}|{bool(request.htmx)}"
+    return f"events:page:{hashlib.md5(variant.encode(), usedforsecurity=False).hexdigest()}"
+
+
+def purge_pages(*tags):
+    """Drop every cached page tagged with one of ``tags``"""
+
+    def purge():
+        # Time based so a version lost to eviction is never reused
+        cache.set_many({_tag_key(tag): time.time_ns() for tag in tags}, timeout=None)
+
+    # Again after commit, a concurrent request may have cached the old rows meanwhile
+    purge()
+    transaction.on_commit(purge)
+
+
+def cacheable(request):
+    return (
+        settings.PAGE_CACHE_TIMEOUT
+        and request.method in ("GET", "HEAD")
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and CookieStorage.cookie_name not in request.COOKIES
+    )
+
+
+def lookup(request, tags):
+    """Return the cached page and the current versions of its tags"""
+    keys = [_page_key(request), *map(_tag_key, tags)]
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys[1:] if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+
+    versions = [found[key] for key in keys[1:]]
+    page = found.get(keys[0])
+    if page is not None and page["versions"] != versions:
+        page = None
+    return page, versions
+
+
+def store(request, response, versions):
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return
+    # Messages added while rendering are part of the page
+    if len(messages.get_messages(request)):
+        return
+
+    content = response.content
+    secret = request.META.get("CSRF_COOKIE")
+    if secret:
+        for token in set(CSRF_CANDIDATE.findall(content)):
+            if _unmask_cipher_token(token.decode()) == secret:
+                content = content.replace(token, CSRF_PLACEHOLDER)
+
+    page = {
+        "id": uuid.uuid4().hex,
+        "versions": versions,
+        "content": content,
+        "headers": {
+            name: value
+            for name, value in response.headers.items()
+            if name.lower() not in SKIPPED_HEADERS
+        },
+    }
+    cache.set(_page_key(request), page, settings.PAGE_CACHE_TIMEOUT)
+
+
+def serve(request, page):
+    content = page["content"]
+    variant = page["id"]
+    if CSRF_PLACEHOLDER in content:
+        content = content.replace(CSRF_PLACEHOLDER, get_token(request).encode())
+        variant += request.META["CSRF_COOKIE"]
+
+    etag = f'W/"{hashlib.md5(variant.encode(), usedforsecurity=False).hexdigest()}"'
+    last_modified = page["headers"].get("Last-Modified")
+    response = get_conditional_response(request, etag=etag) or HttpResponse(
+        content, headers=page["headers"]
+    )
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = last_modified
+    response["X-Page-Cache"] = "hit"
+    return response
+
+
+def cache_anonymous_page(tags):
+    """``tags(request, *args, **kwargs)`` returns the tags of the page a view renders"""
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+
+            @wraps(view)
+            async def inner(request, *args, **kwargs):
+                if not cacheable(request):
+                    return await view(request, *args, **kwargs)
+
+                page, versions = await sync_to_async(lookup)(
+                    request, tags(request, *args, **kwargs)
+                )
+                if page is not None:
+                    return serve(request, page)
+                read_from_primary()
+                response = await view(request, *args, **kwargs)
+                await sync_to_async(store)(request, response, versions)
+                return response
+
+        else:
+
+            @wraps(view)
+            def inner(request, *args, **kwargs):
+                if not cacheable(request):
+                    return view(request, *args, **kwargs)
+
+                page, versions = lookup(request, tags(request, *args, **kwargs))
+                if page is not None:
+                    return serve(request, page)
+                read_from_primary()
+                response = view(request, *args, **kwargs)
+                store(request, response, versions)
+                return response
+
+        return inner
+
+    return decorator
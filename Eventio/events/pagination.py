@@ -0,0 +1,169 @@
+import base64
+import binascii
+import json
+from operator import attrgetter
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+
+class CursorPage:
+    """
+    Page of a CursorPaginator, the query only runs once the page is first read. Async views
+    have to ``await page.aload()`` before the page is rendered.
+    """
+
+    def __init__(self, paginator, values, backwards):
+        self.paginator = paginator
+        self._values = values
+        self._backwards = backwards
+        self._result = None
+
+    def _load(self):
+        if self._result is None:
+            self._result = self.paginator._fetch(self._values, self._backwards)
+        return self._result
+
+    async def aload(self):
+        if self._result is None:
+            self._result = await self.paginator._afetch(self._values, self._backwards)
+        return self
+
+    @property
+    def object_list(self):
+        return self._load()[0]
+
+    @property
+    def next_cursor(self):
+        return self._load()[1]
+
+    @property
+    def previous_cursor(self):
+        return self._load()[2]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator:
+    """
+    Keyset paginator, every page is a single range query on ``ordering`` instead of
+    ``COUNT(*)`` plus ``OFFSET``. The last ordering field must be unique (usually ``id``)
+    and none of the ordering fields may be nullable. ``queryset`` may also be a tuple of
+    querysets whose models share the ordering fields and whose rows never collide on them,
+    each page then merges a page of every queryset.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.querysets = queryset if isinstance(queryset, tuple) else (queryset,)
+        self.ordering = [(name.lstrip("-"), name.startswith("-")) for name in ordering]
+        self.per_page = per_page
+
+    def encode_cursor(self, obj, backwards=False):
+        values = [getattr(obj, name) for name, _ in self.ordering]
+        payload = json.dumps({"v": values, "b": backwards}, default=str, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            values = payload["v"]
+            backwards = bool(payload["b"])
+            if len(values) != len(self.ordering):
+                return None
+            values = [
+                self._to_python(name, value) for (name, _), value in zip(self.ordering, values)
+            ]
+            return values, backwards
+        except (binascii.Error, ValueError, KeyError, TypeError, ValidationError):
+            return None
+
+    def _to_python(self, name, value):
+        try:
+            return self.querysets[0].model._meta.get_field(name).to_python(value)
+        except FieldDoesNotExist:
+            # Annotations such as search rank are stored as plain JSON values
+            return value
+
+    def _seek(self, values, backwards):
+        condition = Q()
+        for index, (name, descending) in enumerate(self.ordering):
+            lookup = "lt" if descending != backwards else "gt"
+            step = Q(**{f"{name}__{lookup}": values[index]})
+            for (prev_name, _), prev_value in zip(self.ordering[:index], values):
+                step &= Q(**{prev_name: prev_value})
+            condition |= step
+        return condition
+
+    def get_page(self, cursor=None):
+        values, backwards = None, False
+        decoded = self.decode_cursor(cursor) if cursor else None
+        if decoded is not None:
+            values, backwards = decoded
+
+        return CursorPage(self, values, backwards)
+
+    def _page_querysets(self, values, backwards):
+        order_by = [
+            f"-{name}" if descending != backwards else name for name, descending in self.ordering
+        ]
+        for queryset in self.querysets:
+            queryset = queryset.order_by(*order_by)
+            if values is not None:
+                queryset = queryset.filter(self._seek(values, backwards))
+            yield queryset[: self.per_page + 1]
+
+    def _fetch(self, values, backwards):
+        rows = [row for queryset in self._page_querysets(values, backwards) for row in queryset]
+        return self._build_page(rows, values, backwards)
+
+    async def _afetch(self, values, backwards):
+        rows = [
+            row for queryset in self._page_querysets(values, backwards) async for row in queryset
+        ]
+        return self._build_page(rows, values, backwards)
+
+    def _build_page(self, rows, values, backwards):
+        if len(self.querysets) > 1:
+            # Stable sorts, least significant field first
+            for name, descending in reversed(self.ordering):
+                rows.sort(key=attrgetter(name), reverse=descending != backwards)
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if backwards:
+            rows.reverse()
+
+        if not rows:
+            return rows, None, None
+
+        has_next = has_more if not backwards else True
+        has_previous = values is not None if not backwards else has_more
+
+        return (
+            rows,
+            self.encode_cursor(rows[-1]) if has_next else None,
+            self.encode_cursor(rows[0], backwards=True) if has_previous else None,
+        )
+
+
+def paginate_queryset(request, queryset, ordering, page_param="page", per_page=4):
+    paginator = CursorPaginator(queryset, ordering, per_page)
+    return paginator.get_page(request.GET.get(page_param))
+
+
+async def apaginate_queryset(request, queryset, ordering, page_param="page", per_page=4):
+    page = paginate_queryset(request, queryset, ordering, page_param, per_page)
+    return await page.aload()
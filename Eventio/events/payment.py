@@ -1,24 +1,30 @@
-import stripe
-from django.conf import settings
+import logging
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from events.gateways import get_gateway
+from events.models import Event, Purchase, Ticket
 
-stripe.api_key = settings.STRIPE_API_SECRET
+logger = logging.getLogger(__name__)
 
+FULFILLMENT_EVENTS = ("checkout.session.completed", "checkout.session.async_payment_succeeded")
 
-def start_checkout_session(
+
+def _checkout_params(
     success_url: str,
     cancel_url: str,
     price: int,
     product_data: dict[str, str],
-    quantity: int = 1,
-    currency: str = "usd",
-) -> str:
+    quantity: int,
+    currency: str,
+    metadata: dict[str, str] | None,
+) -> dict:
     if "?session_id=" not in success_url:
         success_url += "?session_id={CHECKOUT_SESSION_ID}"
 
-    checkout = stripe.checkout.Session.create(
-        payment_method_types=["card"],
-        mode="payment",
-        line_items=[
+    return {
+        "payment_method_types": ["card"],
+        "mode": "payment",
+        "line_items": [
             {
                 "price_data": {
                     "currency": currency,
@@ -28,19 +34,97 @@ def start_checkout_session(
                 "quantity": quantity,
             }
         ],
-        metadata={
+        "metadata": {
             "product_id": product_data["name"],
             "quantity": quantity,
+            **(metadata or {}),
         },
-        success_url=success_url,
-        cancel_url=cancel_url,
+        "success_url": success_url,
+        "cancel_url": cancel_url,
+    }
+
+
+def start_checkout_session(
+    success_url: str,
+    cancel_url: str,
+    price: int,
+    product_data: dict[str, str],
+    quantity: int = 1,
+    currency: str = "usd",
+    metadata: dict[str, str] | None = None,
+) -> str:
+    params = _checkout_params(
+        success_url, cancel_url, price, product_data, quantity, currency, metadata
     )
+    return get_gateway().create_checkout(params)
+
+
+async def astart_checkout_session(
+    success_url: str,
+    cancel_url: str,
+    price: int,
+    product_data: dict[str, str],
+    quantity: int = 1,
+    currency: str = "usd",
+    metadata: dict[str, str] | None = None,
+) -> str:
+    """Async variant of start_checkout_session, Stripe is called through httpx"""
+    params = _checkout_params(
+        success_url, cancel_url, price, product_data, quantity, currency, metadata
+    )
+    return await get_gateway().acreate_checkout(params)
+
+
+def construct_webhook_event(payload: bytes, signature: str) -> dict:
+    """Parse a webhook request body, raises ValueError for bad payloads and signatures"""
+    return get_gateway().construct_event(payload, signature)
+
+
+def _refund(session, reason):
+    """Give the money back for a paid session that can't be fulfilled"""
+    logger.error(f"Refunding checkout session {session['id']}: {reason}")
+    get_gateway().refund_checkout(session)
+
+
+def fulfill_checkout_session(session) -> Purchase | None:
+    """
+    Create the purchase for a paid checkout session. Safe to call any number of times for
+    the same session, Purchase.session_id is unique so retries return the first purchase.
+    Sessions that can't be fulfilled, sold out or for a deleted user or event, are refunded.
+    """
+    if session["payment_status"] != "paid":
+        return None
+
+    existing = Purchase.objects.filter(session_id=session["id"]).first()
+    if existing:
+        return existing
+
+    metadata = session["metadata"]
+    user = User.objects.filter(pk=metadata["user_id"]).first()
+    event = Event.objects.select_related("ticket").filter(pk=metadata["event_id"]).first()
+    if user is None or event is None:
+        _refund(session, "the user or event no longer exists")
+        return None
+    quantity = int(metadata["quantity"])
 
-    if checkout.url is None:
-        raise stripe.error.StripeError("Failed to create checkout session")
+    try:
+        with transaction.atomic():
+            purchase = Ticket.buy(
+                user, event, quantity, int(session["amount_total"]), session_id=session["id"]
+            )
+    except IntegrityError:
+        existing = Purchase.objects.filter(session_id=session["id"]).first()
+        if existing:
+            return existing
+        # Sold out between checkout and payment
+        _refund(session, f"not enough tickets left for {quantity} of {event}")
+        return None
 
-    return checkout.url
+    logger.info(f"User {user.id} purchased successfully {quantity} tickets for {event}")
+    return purchase
 
 
-def get_checkout_session(session_id: str) -> stripe.checkout.Session:
-    return stripe.checkout.Session.retrieve(session_id)
+def handle_webhook_event(webhook_event) -> Purchase | None:
+    if webhook_event["type"] not in FULFILLMENT_EVENTS:
+        return None
+    return fulfill_checkout_session(webhook_event["data"]["object"])
@@ -0,0 +1,75 @@
+"""
+Querysets behind the main pages.
+
+Views build their querysets here and the ``index_advisor`` command explains the very same
+ones, so a view whose query stops using an index is flagged by the advisor.
+"""
+
+from events.models import ArchivedPurchase, Event, Purchase, Registration, Review
+
+NEWEST_FIRST = ("-created_at", "-id")
+RANKED_FIRST = ("-rank", "-created_at", "-id")
+LATEST_PURCHASES = ("-purchased_at", "-id")
+LATEST_REGISTRATIONS = ("-registered_at", "-id")
+
+
+def listed_events():
+    """Upcoming approved events, as the home page sections list them"""
+    return Event.objects.active().upcoming().select_related("ticket")
+
+
+def popular_event_ids():
+    return Event.objects.active().upcoming().popular().values_list("pk", flat=True)
+
+
+def detail_events():
+    return Event.objects.select_related("created_by")
+
+
+def event_reviews(event):
+    return event.reviews.all().select_related("user")
+
+
+def search_results(query=None, near=None):
+    """
+    Approved events matching ``query`` and within ``near``, the ``lat``, ``lon`` and ``km``
+    of a ``NearForm``, together with the ordering of their pages
+    """
+    events = Event.objects.active().select_related("ticket")
+    ordering = NEWEST_FIRST
+    if query:
+        events = events.search(query)
+        ordering = RANKED_FIRST
+    if near:
+        events = events.near(**near)
+    return events, ordering
+
+
+def membership_querysets(user):
+    """Ids of the events ``user`` joined, bought tickets for and reviewed"""
+    return {
+        "joined": Registration.objects.filter(user=user).values_list("event_id", flat=True),
+        "purchased": Purchase.objects.filter(user=user).values_list("ticket__event_id", flat=True),
+        "reviewed": Review.objects.filter(user=user).values_list("event_id", flat=True),
+    }
+
+
+def account_purchases(user):
+    """Purchases of ``user`` and those moved out by archive_events, paginated together"""
+    return (
+        user.purchases.all().select_related("user", "ticket__event"),
+        ArchivedPurchase.objects.filter(user=user).select_related("user"),
+    )
+
+
+def account_registrations(user):
+    return user.registartions.all().select_related("event", "user")
+
+
+def account_events(user, status):
+    return user.events.filter(status=status).select_related("ticket")
+
+
+def events_to_archive(cutoff):
+    """Events that took place before ``cutoff``, oldest first"""
+    return Event.objects.filter(date__lt=cutoff).order_by("date")
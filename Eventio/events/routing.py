@@ -0,0 +1,133 @@
+"""
+Read replica routing.
+
+Views marked with ``replica_reads`` read from one of the ``DATABASE_REPLICAS`` on GET and HEAD
+requests, everything else uses the primary. Writes, ``select_for_update`` and reads inside
+``transaction.atomic`` always go to the primary. Once a request writes, its remaining reads
+stay on the primary and ``ReplicaPinMiddleware`` sets a cookie that keeps the client's reads
+there for ``DATABASE_REPLICA_PIN_SECONDS``, long enough for the replicas to catch up. Pages
+rendered for the page cache read from the primary through ``read_from_primary``.
+"""
+
+import random
+from contextvars import ContextVar
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = "db_primary"
+
+_current_routing = ContextVar("request_routing", default=None)
+
+
+class RequestRouting:
+    __slots__ = ("replica", "pinned", "wrote")
+
+    def __init__(self, pinned):
+        self.replica = False
+        self.pinned = pinned
+        self.wrote = False
+
+    @property
+    def use_replica(self):
+        return self.replica and not (self.pinned or self.wrote)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _current_routing.get()
+        if routing is None or not routing.use_replica or not settings.DATABASE_REPLICAS:
+            return None
+        # A transaction has to see its own writes
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        routing = _current_routing.get()
+        if routing is not None:
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+
+def replica_reads(view):
+    """Let safe requests of ``view`` read from a replica"""
+
+    def start(request):
+        routing = _current_routing.get()
+        if routing is not None and request.method in ("GET", "HEAD"):
+            routing.replica = True
+
+    if iscoroutinefunction(view):
+
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            start(request)
+            return await view(request, *args, **kwargs)
+
+    else:
+
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            start(request)
+            return view(request, *args, **kwargs)
+
+    return inner
+
+
+def read_from_primary():
+    """
+    Keep the rest of the request on the primary. A page rendered from a lagging replica right
+    after a purge would be cached under the new tag version and stay stale until it expires.
+    """
+    routing = _current_routing.get()
+    if routing is not None:
+        routing.replica = False
+
+
+class ReplicaPinMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        routing = RequestRouting(PIN_COOKIE in request.COOKIES)
+        token = _current_routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_routing.reset(token)
+        return self.pin(response, routing)
+
+    async def __acall__(self, request):
+        routing = RequestRouting(PIN_COOKIE in request.COOKIES)
+        token = _current_routing.set(routing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_routing.reset(token)
+        return self.pin(response, routing)
+
+    def pin(self, response, routing):
+        if routing.wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=settings.DATABASE_REPLICA_PIN_SECONDS,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -0,0 +1,150 @@
+"""
+Full-text search over events.
+
+PostgreSQL keeps a weighted ``tsvector`` in ``Event.search_vector`` backed by a GIN index,
+SQLite keeps an FTS5 virtual table ``events_event_fts`` whose rows are keyed by
+``events_event_fts_docs``, a table mapping each event id to its FTS rowid. Both are refreshed
+from the ``post_save``/``post_delete`` signals and queried through ``search_events``.
+"""
+
+import re
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, Q
+from django.db.models.expressions import RawSQL
+from events.models import Event
+
+FTS_TABLE = "events_event_fts"
+# Explicit INTEGER PRIMARY KEY rowids survive VACUUM, the implicit rowid of a UUID keyed
+# table does not, so FTS rows are never keyed on ``events_event.rowid``
+FTS_DOCS_TABLE = "events_event_fts_docs"
+
+# title, description, location, category
+FTS_WEIGHTS = (10.0, 1.0, 2.0, 4.0)
+
+
+def search_vector():
+    return (
+        SearchVector("title", weight="A")
+        + SearchVector("category", weight="B")
+        + SearchVector("location", weight="C")
+        + SearchVector("description", weight="D")
+    )
+
+
+def _fts_match(query):
+    """Quote every word so user input can't break FTS5 syntax and prefix-match the last one"""
+    terms = [f'"{term}"' for term in re.findall(r"\w+", query)]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _event_db_id(event):
+    return event._meta.pk.get_db_prep_value(event.pk, connection)
+
+
+def update_search_index(event):
+    if connection.vendor == "postgresql":
+        type(event).objects.filter(pk=event.pk).update(search_vector=search_vector())
+    elif connection.vendor == "sqlite":
+        event_id = _event_db_id(event)
+        table = event._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid = "
+                f"(SELECT rowid FROM {FTS_DOCS_TABLE} WHERE event_id = %s)",
+                [event_id],
+            )
+            cursor.execute(
+                f"INSERT OR IGNORE INTO {FTS_DOCS_TABLE} (event_id) VALUES (%s)", [event_id]
+            )
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, description, location, category) "
+                "SELECT docs.rowid, event.title, event.description, event.location, event.category "
+                f"FROM {table} AS event JOIN {FTS_DOCS_TABLE} AS docs ON docs.event_id = event.id "
+                "WHERE event.id = %s",
+                [event_id],
+            )
+
+
+def remove_from_search_index(event):
+    if connection.vendor == "sqlite":
+        event_id = _event_db_id(event)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid = "
+                f"(SELECT rowid FROM {FTS_DOCS_TABLE} WHERE event_id = %s)",
+                [event_id],
+            )
+            cursor.execute(f"DELETE FROM {FTS_DOCS_TABLE} WHERE event_id = %s", [event_id])
+
+
+def search_events(queryset, query):
+    """Filter ``queryset`` to events matching ``query``, best matches first"""
+    query = query.strip()
+    if not query:
+        return queryset.none()
+
+    if connection.vendor == "postgresql":
+        search_query = SearchQuery(query, search_type="websearch")
+        return (
+            queryset.filter(search_vector=search_query)
+            .annotate(rank=SearchRank(F("search_vector"), search_query))
+            .order_by("-rank", "-created_at")
+        )
+
+    if connection.vendor == "sqlite":
+        match = _fts_match(query)
+        if not match:
+            return queryset.none()
+        weights = ", ".join(str(weight) for weight in FTS_WEIGHTS)
+        table = queryset.model._meta.db_table
+        return (
+            queryset.filter(
+                id__in=RawSQL(
+                    f"SELECT docs.event_id FROM {FTS_TABLE} "
+                    f"JOIN {FTS_DOCS_TABLE} AS docs ON docs.rowid = {FTS_TABLE}.rowid "
+                    f"WHERE {FTS_TABLE} MATCH %s",
+                    (match,),
+                )
+            )
+            .annotate(
+                # LIMIT -1 keeps SQLite from flattening the ranked matches into the correlated
+                # subquery, so they are computed once instead of running MATCH for every event
+                rank=RawSQL(
+                    "SELECT ranked.rank FROM ("
+                    f"SELECT docs.event_id, -bm25({FTS_TABLE}, {weights}) AS rank "
+                    f"FROM {FTS_TABLE} "
+                    f"JOIN {FTS_DOCS_TABLE} AS docs ON docs.rowid = {FTS_TABLE}.rowid "
+                    f"WHERE {FTS_TABLE} MATCH %s LIMIT -1"
+                    f") AS ranked WHERE ranked.event_id = {table}.id",
+                    (match,),
+                )
+            )
+            .order_by("-rank", "-created_at")
+        )
+
+    return queryset.filter(
+        Q(title__icontains=query)
+        | Q(description__icontains=query)
+        | Q(location__icontains=query)
+        | Q(category__icontains=query)
+    )
+
+
+def rebuild_search_index():
+    """Reindex every event, for rows written without signals such as bulk_create"""
+    if connection.vendor == "postgresql":
+        Event.objects.update(search_vector=search_vector())
+    elif connection.vendor == "sqlite":
+        table = Event._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(f"DELETE FROM {FTS_DOCS_TABLE}")
+            cursor.execute(f"INSERT INTO {FTS_DOCS_TABLE} (event_id) SELECT id FROM {table}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, description, location, category) "
+                "SELECT docs.rowid, event.title, event.description, event.location, event.category "
+                f"FROM {table} AS event JOIN {FTS_DOCS_TABLE} AS docs ON docs.event_id = event.id"
+            )
@@ -1,19 +1,290 @@
-from django.db.models.signals import post_delete, post_save
-from django.core.cache.utils import make_template_fragment_key
+from functools import partial, wraps
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+from .models.daily_stats import EventDailyStats
 from .models.events import Event
+from .models.purchase import Purchase
+from .models.registration import Registration
+from .models.review import Review
+from .models.ticket import Ticket
+from .search import remove_from_search_index, update_search_index
+from .caching import SECTIONS, bump_generations, invalidate_event_sections, listed_sections
+from .membership import forget_membership
+from .page_cache import purge_pages
+from .facets import forget_facet_counts
+from .timing import install_query_timer
+from .archive import is_archiving
+
+
+def _unchanged(instance, created, update_fields):
+    """Saves that left every tracked field as it was need no invalidation"""
+    return not created and not instance.changed_fields(update_fields)
+
+
+def _was_active(instance, created):
+    return not created and instance.loaded_value("status") == "approved"
+
+
+def unless_archiving(receiver_function):
+    """Skip the receiver for rows deleted by archiving, it invalidates once per batch itself"""
+
+    @wraps(receiver_function)
+    def inner(sender, instance, **kwargs):
+        if not is_archiving():
+            receiver_function(sender, instance, **kwargs)
+
+    return inner
+
+
+@receiver(connection_created)
+def time_connection_queries(sender, connection, **kwargs):
+    """Let ServerTimingMiddleware count the queries of every new connection"""
+    install_query_timer(connection)
 
 
 @receiver(post_delete, sender=Event)
+@unless_archiving
 def delete_cascade_event_img(sender, instance, **kwargs):
     """Cleanup associated image in bucket after event deletion"""
     if instance.banner:
         instance.banner.delete(save=False)
 
 
-@receiver([post_delete, post_save], sender=Event)
-def invalidate_event_cache(sender, instance, **kwargs):
-    """Invalidate event cache after event deletion or creation"""
-    key = make_template_fragment_key("event_list")
-    cache.delete(key)
+@receiver(post_save, sender=Event)
+def index_event_for_search(sender, instance, created, update_fields, **kwargs):
+    """Refresh the full-text search entry of a saved event"""
+    if not _unchanged(instance, created, update_fields):
+        update_search_index(instance)
+
+
+@receiver(post_delete, sender=Event)
+def unindex_event_for_search(sender, instance, **kwargs):
+    """Drop the full-text search entry of a deleted event"""
+    remove_from_search_index(instance)
+
+
+@receiver(post_save, sender=Event)
+def purge_event_pages(sender, instance, created, update_fields, **kwargs):
+    """Drop the cached pages of a saved event, and the list pages while it is or was listed"""
+    if _unchanged(instance, created, update_fields):
+        return
+    if instance.is_active or _was_active(instance, created):
+        purge_pages("events", f"event:{instance.pk}")
+    else:
+        purge_pages(f"event:{instance.pk}")
+
+
+@receiver(post_delete, sender=Event)
+@unless_archiving
+def purge_deleted_event_pages(sender, instance, **kwargs):
+    """Drop the cached pages showing a deleted event"""
+    purge_pages("events", f"event:{instance.pk}")
+
+
+@receiver(post_save, sender=Event)
+def forget_event_facets(sender, instance, created, update_fields, **kwargs):
+    """Drop the cached facet counts when an approved event changes"""
+    if _unchanged(instance, created, update_fields):
+        return
+    if instance.is_active or _was_active(instance, created):
+        forget_facet_counts()
+
+
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=Ticket)
+@unless_archiving
+def forget_facets(sender, instance, **kwargs):
+    """Drop the cached facet counts when an event or its ticket is deleted"""
+    forget_facet_counts()
+
+
+@receiver(post_save, sender=Ticket)
+def forget_ticket_facets(sender, instance, created, update_fields, **kwargs):
+    """Drop the cached facet counts when a ticket moves to another price band"""
+    if created or "price" in instance.changed_fields(update_fields):
+        forget_facet_counts()
+
+
+@receiver(post_save, sender=Ticket)
+def touch_event_on_price_change(sender, instance, created, update_fields, **kwargs):
+    """Event cards show the price, a new one has to move the event's card version and caches"""
+    if created or "price" not in instance.changed_fields(update_fields):
+        return
+    now = timezone.now()
+    Event.objects.filter(pk=instance.event_id).update(updated_at=now, card_updated_at=now)
+    # The detail page is purged on every ticket save
+    purge_pages("events")
+    bump_generations(*SECTIONS)
+
+
+@receiver(pre_save, sender=Event)
+def remember_listed_sections(sender, instance, update_fields, **kwargs):
+    """Note the sections an approved event is listed in, the save may move it out of them"""
+    created = instance._state.adding
+    if _was_active(instance, created) and not _unchanged(instance, created, update_fields):
+        instance._listed_sections = listed_sections(instance)
+
+
+@receiver(post_save, sender=Event)
+def invalidate_event_cache(sender, instance, created, update_fields, **kwargs):
+    """Bump the cache generations of home page sections affected by an approved event"""
+    listed_before = instance.__dict__.pop("_listed_sections", set())
+    if _unchanged(instance, created, update_fields):
+        return
+    active_before = _was_active(instance, created)
+    if instance.is_active or active_before:
+        invalidate_event_sections(
+            instance,
+            membership_changed=instance.is_active != active_before,
+            listed_before=listed_before,
+        )
+
+
+@receiver(post_delete, sender=Event)
+@unless_archiving
+def invalidate_event_cache_on_delete(sender, instance, **kwargs):
+    """Bump every home page section when an approved event is deleted"""
+    if instance.is_active:
+        bump_generations(*SECTIONS)
+
+
+@receiver(post_save, sender=Registration)
+def increment_registration_count(sender, instance, created, **kwargs):
+    """Keep Event.registration_count in sync when a registration is created"""
+    if created:
+        Event.objects.filter(pk=instance.event_id).update(
+            registration_count=F("registration_count") + 1, updated_at=timezone.now()
+        )
+
+
+@receiver(post_delete, sender=Registration)
+@unless_archiving
+def decrement_registration_count(sender, instance, **kwargs):
+    """Keep Event.registration_count in sync when a registration is deleted"""
+    Event.objects.filter(pk=instance.event_id, registration_count__gt=0).update(
+        registration_count=F("registration_count") - 1, updated_at=timezone.now()
+    )
+
+
+@receiver(post_save, sender=Review)
+def add_review_to_rating(sender, instance, created, **kwargs):
+    """Add a new review to Event.rating_sum and Event.review_count"""
+    if created:
+        Event.objects.filter(pk=instance.event_id).update(
+            rating_sum=F("rating_sum") + instance.rating,
+            review_count=F("review_count") + 1,
+            updated_at=timezone.now(),
+        )
+
+
+@receiver(post_delete, sender=Review)
+@unless_archiving
+def remove_review_from_rating(sender, instance, **kwargs):
+    """Subtract a deleted review from Event.rating_sum and Event.review_count"""
+    Event.objects.filter(
+        pk=instance.event_id, review_count__gt=0, rating_sum__gte=instance.rating
+    ).update(
+        rating_sum=F("rating_sum") - instance.rating,
+        review_count=F("review_count") - 1,
+        updated_at=timezone.now(),
+    )
+
+
+@receiver(post_save, sender=Registration)
+@receiver(post_delete, sender=Registration)
+@receiver(post_save, sender=Purchase)
+@receiver(post_delete, sender=Purchase)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@unless_archiving
+def forget_user_membership(sender, instance, **kwargs):
+    """Drop the cached membership of a user who joined, bought, reviewed or left an event"""
+    if kwargs.get("created", True):
+        forget_membership(instance.user_id)
+
+
+@receiver(post_save, sender=Registration)
+@receiver(post_delete, sender=Registration)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@unless_archiving
+def purge_event_detail_page(sender, instance, **kwargs):
+    """Drop the cached detail page showing the registration count and reviews"""
+    purge_pages(f"event:{instance.event_id}")
+
+
+@receiver(post_save, sender=Purchase)
+def purge_event_detail_page_on_purchase(sender, instance, created, **kwargs):
+    """Drop the cached detail page showing the remaining tickets once the sale committed"""
+    if created:
+        tag = f"event:{instance.ticket.event_id}"
+        transaction.on_commit(lambda: purge_pages(tag))
+
+
+@receiver(post_save, sender=Ticket)
+@receiver(post_delete, sender=Ticket)
+@unless_archiving
+def purge_event_detail_page_on_ticket(sender, instance, **kwargs):
+    """Drop the cached detail page showing the ticket's price and remaining tickets"""
+    purge_pages(f"event:{instance.event_id}")
+
+
+@receiver(post_save, sender=Registration)
+def add_registration_to_daily_stats(sender, instance, created, **kwargs):
+    """Count a new registration in the rollup of the day it was made"""
+    if created:
+        EventDailyStats.add(
+            instance.event_id, timezone.localdate(instance.registered_at), registrations=1
+        )
+
+
+@receiver(post_delete, sender=Registration)
+@unless_archiving
+def remove_registration_from_daily_stats(sender, instance, **kwargs):
+    """Take a cancelled registration out of the rollup of the day it was made"""
+    EventDailyStats.objects.filter(
+        event_id=instance.event_id,
+        day=timezone.localdate(instance.registered_at),
+        registrations__gt=0,
+    ).update(registrations=F("registrations") - 1)
+
+
+@receiver(post_save, sender=Purchase)
+def add_purchase_to_daily_stats(sender, instance, created, **kwargs):
+    """
+    Add the tickets and revenue of a new purchase to the rollup of its day once the sale
+    committed, the contended stats row is not locked by checkouts and can't roll one back
+    """
+    if created:
+        transaction.on_commit(
+            partial(
+                EventDailyStats.add,
+                instance.ticket.event_id,
+                timezone.localdate(instance.purchased_at),
+                tickets_sold=instance.quantity,
+                revenue=instance.amount_paid,
+            )
+        )
+
+
+@receiver(post_delete, sender=Purchase)
+@unless_archiving
+def remove_purchase_from_daily_stats(sender, instance, **kwargs):
+    """Take a deleted purchase out of the rollup of the day it was made once the delete committed"""
+    stats = EventDailyStats.objects.filter(
+        event__ticket=instance.ticket_id,
+        day=timezone.localdate(instance.purchased_at),
+        tickets_sold__gte=instance.quantity,
+        revenue__gte=instance.amount_paid,
+    )
+    transaction.on_commit(
+        partial(
+            stats.update,
+            tickets_sold=F("tickets_sold") - instance.quantity,
+            revenue=F("revenue") - instance.amount_paid,
+        )
+    )
@@ -0,0 +1,49 @@
+"""
+Static files served by WhiteNoise from an async capable middleware.
+
+``WhiteNoiseMiddleware`` is sync only, so under ASGI Django runs it and everything below it,
+async views included, in a worker thread. ``StaticFilesMiddleware`` wraps a stock
+``WhiteNoiseMiddleware`` that answers None for anything but a static file and passes other
+requests on in the event loop, only static file lookups run in a thread. Caching headers are
+configured through the usual ``WHITENOISE_*`` settings.
+"""
+
+from urllib.parse import urlparse
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class StaticFilesMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.static_files = WhiteNoiseMiddleware(lambda request: None)
+        # Files of WHITENOISE_ROOT are served from any path
+        self.prefix = urlparse(settings.STATIC_URL).path
+        if getattr(settings, "WHITENOISE_ROOT", None):
+            self.prefix = None
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def may_be_static(self, request):
+        return self.prefix is None or request.path_info.startswith(self.prefix)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.static_files(request) if self.may_be_static(request) else None
+        if response is None:
+            response = self.get_response(request)
+        return response
+
+    async def __acall__(self, request):
+        response = None
+        if self.may_be_static(request):
+            # Finds, opens and stats the file for the conditional and range headers
+            response = await sync_to_async(self.static_files)(request)
+        if response is None:
+            response = await self.get_response(request)
+        return response
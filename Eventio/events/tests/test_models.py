@@ -3,17 +3,51 @@ from django.test import TestCase, override_settings
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.files.uploadedfile import SimpleUploadedFile
-from events.models import Event, Registration, Purchase, Ticket, Review
+from django.core.management import call_command
+from events import geocoding
+from events.banners import LEASE, claim_jobs, process_jobs
+from events.geo import NominatimGeocoder, covering_cells, bounding_box, encode
+from events.mail import deliver_outbox, enqueue_mail
+from events.models import (
+    Event,
+    Registration,
+    Purchase,
+    Ticket,
+    Review,
+    BannerJob,
+    OutboxEmail,
+    EventDailyStats,
+    GeocodeJob,
+)
 from django.db.utils import IntegrityError
-from django.db import transaction
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.cache import cache
+from unittest import mock
+import httpx
 import io
+import shutil
+import tempfile
+
+
+def use_temporary_media(test):
+    """Store the uploads of ``test`` in a directory removed after it"""
+    media_root = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+    media = override_settings(MEDIA_ROOT=media_root)
+    media.enable()
+    test.addCleanup(media.disable)
 
 
 @override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
 class EventModelTest(TestCase):
     def setUp(self):
+        use_temporary_media(self)
         self.user = User.objects.create(username="user")
         self.user2 = User.objects.create(username="user2")
         self.super_user = User.objects.create(username="superuser", is_staff=True)
@@ -46,6 +80,42 @@ class EventModelTest(TestCase):
         temp_img.seek(0)
         return temp_img
 
+    def test_upcoming_and_past_split_on_date(self):
+        upcoming = Event.objects.create(
+            title="Upcoming",
+            description="Event Description",
+            location="Test Location",
+            date=timezone.now() + timezone.timedelta(days=1),
+            created_by=self.user,
+        )
+        self.assertEqual(list(Event.objects.upcoming()), [upcoming])
+        self.assertEqual(list(Event.objects.past()), [self.event])
+
+    def test_changed_fields_compare_with_loaded_values(self):
+        event = Event.objects.get(pk=self.event.pk)
+        self.assertEqual(event.changed_fields(), set())
+
+        event.title = "Renamed"
+        event.banner = self.mock_image
+        self.assertEqual(event.changed_fields(), {"title", "banner"})
+        self.assertEqual(event.changed_fields(["title", "location"]), {"title"})
+
+        event.save()
+        self.assertEqual(event.changed_fields(), set())
+        self.assertEqual(event.loaded_value("title"), "Renamed")
+
+    def test_save_changes_skips_unchanged_rows(self):
+        event = Event.objects.get(pk=self.event.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(event.save_changes(), set())
+
+        event.category = "Music"
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(event.save_changes(), {"category"})
+        update = next(q["sql"] for q in queries if q["sql"].startswith("UPDATE"))
+        self.assertIn('"category"', update)
+        self.assertNotIn('"title"', update)
+
     def test_event_creation(self):
         self.assertTrue(isinstance(self.event.id, uuid.UUID))
         self.assertEqual(self.event.title, "Test Event")
@@ -137,6 +207,161 @@ class EventModelTest(TestCase):
         self.assertEqual(self.event.get_banner_url(), settings.STATIC_HOST + self.event.banner.url)
 
 
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"], BANNER_JOBS_EAGER=False
+)
+class BannerJobTest(TestCase):
+    def setUp(self):
+        use_temporary_media(self)
+        self.user = User.objects.create(username="user")
+        self.event = Event.objects.create(
+            title="Test Event",
+            description="Event Description",
+            location="Test Location",
+            date=timezone.now(),
+            banner=self.create_upload(),
+            created_by=self.user,
+        )
+
+    def tearDown(self):
+        self.user.delete()
+
+    def create_upload(self):
+        image = io.BytesIO()
+        Image.new("RGB", (100, 100), color="red").save(image, format="JPEG")
+        return SimpleUploadedFile("banner.jpg", image.getvalue(), content_type="image/jpeg")
+
+    def process_jobs(self):
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            return process_jobs(pool)
+
+    def test_save_stores_raw_upload_and_queues_job(self):
+        self.assertTrue(self.event.banner.name.startswith("banners/raw/"))
+        job = BannerJob.objects.get(event=self.event)
+        self.assertEqual(job.status, "pending")
+        self.assertEqual(job.source, self.event.banner.name)
+
+    def test_worker_swaps_in_processed_banner(self):
+        raw_name = self.event.banner.name
+        self.assertEqual(self.process_jobs(), 1)
+
+        self.event.refresh_from_db()
+        self.assertTrue(self.event.banner.name.endswith(".webp"))
+        self.assertFalse(self.event.banner.storage.exists(raw_name))
+        self.assertEqual(BannerJob.objects.get(event=self.event).status, "done")
+
+    def test_worker_skips_banner_replaced_before_processing(self):
+        first_job = BannerJob.objects.get(event=self.event)
+        self.event.banner = self.create_upload()
+        self.event.save()
+
+        self.assertEqual(self.process_jobs(), 2)
+        first_job.refresh_from_db()
+        self.event.refresh_from_db()
+        self.assertEqual(first_job.status, "done")
+        self.assertTrue(first_job.error)
+        self.assertTrue(self.event.banner.name.endswith(".webp"))
+
+    def test_replaced_banner_is_known_without_reading_the_row(self):
+        raw_name = self.event.banner.name
+        event = Event.objects.get(pk=self.event.pk)
+        event.banner = self.create_upload()
+        with CaptureQueriesContext(connection) as queries:
+            event.save()
+
+        self.assertFalse(any('"banner" FROM' in q["sql"] for q in queries))
+        job = BannerJob.objects.filter(event=event).latest("id")
+        self.assertEqual(job.previous, raw_name)
+
+    def test_worker_retries_failed_job(self):
+        job = BannerJob.objects.get(event=self.event)
+        self.event.banner.storage.delete(job.source)
+
+        self.process_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, "pending")
+        self.assertEqual(job.attempts, 1)
+
+        for _ in range(BannerJob.MAX_ATTEMPTS - 1):
+            self.process_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+
+    def test_job_of_stopped_worker_is_claimed_after_lease(self):
+        job = BannerJob.objects.get(event=self.event)
+        self.assertEqual(claim_jobs(10), [job])
+        self.assertEqual(claim_jobs(10), [])
+
+        BannerJob.objects.filter(pk=job.pk).update(claimed_at=timezone.now() - LEASE)
+        self.assertEqual(self.process_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "done")
+        self.assertEqual(job.attempts, 2)
+
+    def test_job_stopping_every_worker_fails(self):
+        job = BannerJob.objects.get(event=self.event)
+        BannerJob.objects.filter(pk=job.pk).update(
+            status="processing",
+            attempts=BannerJob.MAX_ATTEMPTS,
+            claimed_at=timezone.now() - LEASE,
+        )
+
+        self.assertEqual(claim_jobs(10), [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionError("SMTP server unavailable")
+
+
+@override_settings(
+    EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend", EMAIL_OUTBOX_EAGER=False
+)
+class OutboxEmailTest(TestCase):
+    def test_enqueue_stores_message_without_sending(self):
+        enqueue_mail("Subject", "Body", "from@example.com", ["to@example.com"], "<p>Body</p>")
+
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.status, "pending")
+        self.assertEqual(email.to, ["to@example.com"])
+        self.assertEqual(email.html_body, "<p>Body</p>")
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_deliver_sends_batch_over_one_connection(self):
+        for i in range(3):
+            enqueue_mail(f"Subject {i}", "Body", "from@example.com", [f"to{i}@example.com"])
+
+        with mock.patch("events.mail.get_connection", wraps=mail.get_connection) as connection:
+            self.assertEqual(deliver_outbox(), 3)
+
+        connection.assert_called_once()
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(OutboxEmail.objects.filter(status="sent").count(), 3)
+        self.assertEqual(deliver_outbox(), 0)
+
+    @override_settings(EMAIL_BACKEND="events.tests.test_models.FailingEmailBackend")
+    def test_failed_delivery_is_retried_with_backoff(self):
+        enqueue_mail("Subject", "Body", "from@example.com", ["to@example.com"])
+
+        deliver_outbox()
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.status, "pending")
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertIn("SMTP server unavailable", email.last_error)
+
+        # Not due yet
+        self.assertEqual(deliver_outbox(), 0)
+
+        for _ in range(OutboxEmail.MAX_ATTEMPTS - 1):
+            OutboxEmail.objects.update(next_attempt_at=timezone.now())
+            deliver_outbox()
+        email.refresh_from_db()
+        self.assertEqual(email.status, "failed")
+
+
 @override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
 class RegistrationModelTest(TestCase):
     def setUp(self):
@@ -178,6 +403,34 @@ class RegistrationModelTest(TestCase):
         self.assertEqual(registration2.user, self.user2)
         self.assertEqual(registration2.event, self.event)
 
+    def test_registration_increments_event_registration_count(self):
+        Registration.objects.create(user=self.user2, event=self.event)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.registration_count, 2)
+
+    def test_registration_delete_decrements_event_registration_count(self):
+        Registration.objects.filter(pk=self.registration.pk).delete()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.registration_count, 0)
+
+    def test_popular_orders_by_registration_count(self):
+        event2 = Event.objects.create(
+            title="Second Event",
+            description="Event Description",
+            location="Test Location",
+            date=timezone.now(),
+            created_by=self.user,
+        )
+        Registration.objects.create(user=self.user, event=event2)
+        Registration.objects.create(user=self.user2, event=event2)
+        self.assertEqual(list(Event.objects.popular()), [event2, self.event])
+
+    def test_rebuild_registration_counts_command(self):
+        Event.objects.filter(pk=self.event.pk).update(registration_count=42)
+        call_command("rebuild_registration_counts", stdout=io.StringIO())
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.registration_count, 1)
+
 
 @override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
 class PurchaseModelTest(TestCase):
@@ -257,6 +510,28 @@ class ReviewModelTest(TestCase):
             f"Review by {self.user.username} for {self.event.title} - {self.review.rating}",
         )
 
+    def test_review_updates_event_rating_aggregates(self):
+        user2 = User.objects.create(username="user2")
+        Review.objects.create(user=user2, event=self.event, rating=2)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.rating_sum, 7)
+        self.assertEqual(self.event.review_count, 2)
+        self.assertEqual(self.event.avg_rating, 3.5)
+
+    def test_review_delete_updates_event_rating_aggregates(self):
+        self.review.delete()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.rating_sum, 0)
+        self.assertEqual(self.event.review_count, 0)
+        self.assertEqual(self.event.avg_rating, 0)
+
+    def test_rebuild_rating_aggregates_command(self):
+        Event.objects.filter(pk=self.event.pk).update(rating_sum=100, review_count=3)
+        call_command("rebuild_rating_aggregates", stdout=io.StringIO())
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.rating_sum, 5)
+        self.assertEqual(self.event.review_count, 1)
+
 
 @override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
 class TicketModelTest(TestCase):
@@ -292,3 +567,225 @@ class TicketModelTest(TestCase):
         self.assertEqual(self.ticket.quantity, 6)
         self.assertEqual(self.ticket.purchase_set.count(), 1)
         self.assertEqual(self.ticket.purchase_set.first().user, self.user)
+
+    def test_ticket_buy_more_than_available_raises_and_keeps_quantity(self):
+        with self.assertRaises(IntegrityError):
+            self.ticket.buy(self.user, self.event, 11)
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.quantity, 10)
+        self.assertEqual(self.ticket.purchase_set.count(), 0)
+
+    def test_ticket_buy_decrements_stock_last(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.ticket.buy(self.user, self.event, 2)
+        statements = [
+            query["sql"]
+            for query in queries
+            if not query["sql"].startswith(("SAVEPOINT", "RELEASE SAVEPOINT"))
+        ]
+        # The ticket row stays unlocked while the purchase and its receivers are written
+        self.assertTrue(statements[-1].startswith('UPDATE "events_ticket"'))
+        self.assertFalse(any('FROM "events_ticket"' in sql for sql in statements[:-1]))
+
+    def test_ticket_buy_sells_out_exactly(self):
+        self.ticket.buy(self.user, self.event, 10)
+        with self.assertRaises(IntegrityError):
+            self.ticket.buy(self.user, self.event, 1)
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.quantity, 0)
+
+
+class EventDailyStatsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="user")
+        self.other = User.objects.create(username="other")
+        self.event = Event.objects.create(
+            title="Test Event",
+            description="Event Description",
+            location="Test Location",
+            date=timezone.now(),
+            created_by=self.user,
+        )
+
+    def tearDown(self):
+        User.objects.all().delete()
+
+    def today(self):
+        return EventDailyStats.objects.get(event=self.event, day=timezone.localdate())
+
+    def test_registrations_are_rolled_up_per_day(self):
+        Registration.objects.create(user=self.user, event=self.event)
+        registration = Registration.objects.create(user=self.other, event=self.event)
+        self.assertEqual(self.today().registrations, 2)
+
+        registration.delete()
+        self.assertEqual(self.today().registrations, 1)
+
+    def test_ticket_buy_adds_tickets_and_revenue(self):
+        Ticket.objects.create(price=10, quantity=10, event=self.event)
+        with self.captureOnCommitCallbacks(execute=True):
+            Ticket.buy(self.user, self.event, 2, 2000)
+            Ticket.buy(self.other, self.event, 1, 1000)
+
+        stats = self.today()
+        self.assertEqual(stats.tickets_sold, 3)
+        self.assertEqual(stats.revenue, 3000)
+        self.assertEqual(stats.revenue_total, "30.00")
+
+    def test_sold_out_buy_leaves_the_rollup(self):
+        Ticket.objects.create(price=10, quantity=1, event=self.event)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(IntegrityError):
+                Ticket.buy(self.user, self.event, 2, 2000)
+        self.assertEqual(callbacks, [])
+        self.assertFalse(EventDailyStats.objects.exists())
+
+    def test_deleted_purchase_leaves_the_rollup(self):
+        Ticket.objects.create(price=10, quantity=10, event=self.event)
+        with self.captureOnCommitCallbacks(execute=True):
+            Ticket.buy(self.user, self.event, 2, 2000)
+            Ticket.buy(self.other, self.event, 1, 1000)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Purchase.objects.get(user=self.user).delete()
+        stats = self.today()
+        self.assertEqual(stats.tickets_sold, 1)
+        self.assertEqual(stats.revenue, 1000)
+
+        # Through the cascade of a deleted user as well
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.delete()
+        stats = self.today()
+        self.assertEqual((stats.tickets_sold, stats.revenue), (0, 0))
+
+    def test_rebuild_command_matches_incremental_rollups(self):
+        Ticket.objects.create(price=10, quantity=10, event=self.event)
+        with self.captureOnCommitCallbacks(execute=True):
+            Ticket.buy(self.user, self.event, 2, 2000)
+        Registration.objects.create(user=self.other, event=self.event)
+        fields = ("day", "registrations", "tickets_sold", "revenue")
+        expected = list(EventDailyStats.objects.values(*fields))
+
+        EventDailyStats.objects.all().delete()
+        call_command("rebuild_daily_stats", stdout=io.StringIO())
+
+        self.assertEqual(list(EventDailyStats.objects.values(*fields)), expected)
+
+
+class EventGeoTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="user")
+
+    def create_event(self, location):
+        return Event.objects.create(
+            title=location,
+            description="Event Description",
+            location=location,
+            date=timezone.now(),
+            created_by=self.user,
+            status="approved",
+        )
+
+    def test_geohash_matches_reference(self):
+        self.assertEqual(encode(57.64911, 10.40744, 11), "u4pruydqqvj")
+
+    def test_covering_cells_contain_the_whole_box(self):
+        box = bounding_box(50.0647, 19.945, 30)
+        cells = covering_cells(*box)
+        south, north, west, east = box
+        for lat, lon in [(south, west), (south, east), (north, west), (north, east)]:
+            self.assertTrue(any(encode(lat, lon).startswith(cell) for cell in cells))
+
+    def test_save_geocodes_location(self):
+        event = self.create_event("Main Square, Kraków")
+        self.assertAlmostEqual(event.latitude, 50.0647)
+        self.assertEqual(event.geohash, encode(event.latitude, event.longitude))
+
+        event.location = "Somewhere unknown"
+        event.save()
+        event.refresh_from_db()
+        self.assertIsNone(event.latitude)
+        self.assertEqual(event.geohash, "")
+
+    def test_save_without_location_change_skips_geocoder(self):
+        event = self.create_event("Krakow")
+        event = Event.objects.get(pk=event.pk)
+        with mock.patch("events.geocoding.geocode") as geocode:
+            event.title = "Renamed"
+            event.save(update_fields=["title"])
+            event.save()
+        geocode.assert_not_called()
+        self.assertEqual(GeocodeJob.objects.count(), 1)
+
+    @override_settings(GEOCODE_JOBS_EAGER=False)
+    def test_save_queues_geocoding_off_the_request(self):
+        with mock.patch("events.geocoding.geocode") as geocode:
+            event = self.create_event("Krakow")
+        geocode.assert_not_called()
+        event.refresh_from_db()
+        self.assertIsNone(event.latitude)
+        self.assertEqual(event.geohash, "")
+
+        self.assertEqual(geocoding.process_jobs(), 1)
+        event.refresh_from_db()
+        self.assertAlmostEqual(event.latitude, 50.0647)
+        self.assertEqual(event.geohash, encode(event.latitude, event.longitude))
+        self.assertEqual(GeocodeJob.objects.get().status, "done")
+
+    @override_settings(GEOCODE_JOBS_EAGER=False)
+    def test_geocode_job_skips_a_moved_event(self):
+        event = self.create_event("Krakow")
+        stale = GeocodeJob.objects.get()
+        event.location = "Wieliczka"
+        event.save()
+
+        geocoding.run_job(stale)
+        event.refresh_from_db()
+        self.assertIsNone(event.latitude)
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, "done")
+        self.assertNotEqual(stale.error, "")
+
+        call_command("run_geocode_worker", "--once", stdout=io.StringIO())
+        event.refresh_from_db()
+        self.assertEqual(event.geohash, encode(event.latitude, event.longitude))
+        self.assertEqual(GeocodeJob.objects.filter(status="pending").count(), 0)
+
+    @override_settings(GEOCODE_JOBS_EAGER=False)
+    def test_failed_geocode_job_is_retried(self):
+        self.create_event("Krakow")
+        with mock.patch("events.geocoding.geocode", side_effect=httpx.ConnectError("down")):
+            geocoding.process_jobs()
+        job = GeocodeJob.objects.get()
+        self.assertEqual((job.status, job.attempts), ("pending", 1))
+        self.assertIn("down", job.error)
+
+    def test_nominatim_waits_between_requests(self):
+        cache.clear()
+        geocoder = NominatimGeocoder()
+        geocoder.client = httpx.Client(
+            transport=httpx.MockTransport(
+                lambda request: httpx.Response(200, json=[{"lat": "50.06", "lon": "19.94"}])
+            )
+        )
+        clock = iter([100.0, 100.25, 101.0])
+        with (
+            mock.patch("events.geo.time.monotonic", lambda: next(clock)),
+            mock.patch("events.geo.time.sleep") as sleep,
+        ):
+            geocoder.geocode("Krakow")
+            geocoder.geocode("Wieliczka")
+            # Cached answers don't wait
+            geocoder.geocode("Krakow")
+        sleep.assert_called_once_with(0.75)
+
+    def test_near_filters_by_distance(self):
+        krakow = self.create_event("Krakow")
+        wieliczka = self.create_event("Wieliczka")
+        self.create_event("Warsaw")
+        self.create_event("Nowhere")
+
+        events = Event.objects.near(50.0614, 19.9366, 25).order_by("distance")
+        self.assertEqual(list(events), [krakow, wieliczka])
+        self.assertLess(events[1].distance, 25)
+        self.assertEqual(Event.objects.near(50.0614, 19.9366, 300).count(), 3)
@@ -1,8 +1,47 @@
-from django.test import TestCase, override_settings, Client
+import io
+import json
+import os
+import re
+import tempfile
+import tracemalloc
+import uuid
+import httpx
+from functools import partial
+from types import SimpleNamespace
+from unittest import mock
+import stripe
+from django.core.management import CommandError, call_command
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings, Client
 from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
-from events.models import Event
+from events.caching import expire_started_events, get_generations, get_popular_ids
+from events.exports import encoder, registration_rows, stream_rows
+from events.gateways import PaymentError, StripeGateway, get_gateway
+from events.models import (
+    ArchivedEvent,
+    ArchivedPurchase,
+    Event,
+    EventDailyStats,
+    OutboxEmail,
+    Purchase,
+    Registration,
+    Review,
+    Ticket,
+)
+from events.routing import PIN_COOKIE, RequestRouting, _current_routing
+from events.tests.fake_stripe import FakeStripeEvents
+
+TEST_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
 
 
 @override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
@@ -42,7 +81,7 @@ class ReviewViewsTest(TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertRedirects(
             response,
-            f"{reverse("account_login")}?next={reverse('event_detail', kwargs={'pk': self.event.id})}review/",
+            f"{reverse('account_login')}?next={reverse('event_detail', kwargs={'pk': self.event.id})}review/",
             fetch_redirect_response=False,
         )
 
@@ -55,3 +94,1481 @@ class ReviewViewsTest(TestCase):
         self.assertTemplateUsed(response, "partials/_review_form.html")
         self.assertTrue(response.has_header("HX-Retarget"))
         self.assertTrue(response.has_header("HX-Reswap"))
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"], STORAGES=TEST_STORAGES
+)
+class EventSearchViewsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="user")
+        self.concert = Event.objects.create(
+            title="Summer Concert",
+            description="Live music in the park",
+            location="Warsaw",
+            category="Music",
+            date=timezone.now(),
+            created_by=self.user,
+            status="approved",
+        )
+        self.meetup = Event.objects.create(
+            title="Python Meetup",
+            description="Talks about music generation with Python",
+            location="Krakow",
+            category="Tech",
+            date=timezone.now(),
+            created_by=self.user,
+            status="approved",
+        )
+        self.client = Client()
+
+    def tearDown(self):
+        self.user.delete()
+
+    def test_search_matches_description_location_and_category(self):
+        for query in ("park", "Krakow", "tech"):
+            response = self.client.get(reverse("event_search"), {"q": query})
+            self.assertEqual(len(response.context["events"]), 1)
+
+    def test_search_ranks_title_matches_first(self):
+        response = self.client.get(reverse("event_search"), {"q": "music"})
+        self.assertEqual(list(response.context["events"]), [self.concert, self.meetup])
+
+    def test_search_matches_word_prefix(self):
+        response = self.client.get(reverse("event_search"), {"q": "conc"})
+        self.assertEqual(list(response.context["events"]), [self.concert])
+
+    def test_search_reflects_updated_event(self):
+        self.meetup.title = "Django Meetup"
+        self.meetup.save()
+        response = self.client.get(reverse("event_search"), {"q": "django"})
+        self.assertEqual(list(response.context["events"]), [self.meetup])
+
+    def test_search_survives_renumbered_event_rowids(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("Only SQLite keys events by an implicit rowid")
+        # VACUUM may renumber the implicit rowid of the UUID keyed events table
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE events_event SET rowid = -rowid")
+        self.meetup.title = "Django Meetup"
+        self.meetup.save()
+        response = self.client.get(reverse("event_search"), {"q": "music"})
+        self.assertEqual(list(response.context["events"]), [self.concert, self.meetup])
+        response = self.client.get(reverse("event_search"), {"q": "django"})
+        self.assertEqual(list(response.context["events"]), [self.meetup])
+
+    def test_search_skips_pending_events(self):
+        self.concert.status = "pending"
+        self.concert.save()
+        response = self.client.get(reverse("event_search"), {"q": "music"})
+        self.assertEqual(list(response.context["events"]), [self.meetup])
+
+    def test_search_htmx_renders_partial(self):
+        response = self.client.get(
+            reverse("event_search"), {"q": "concert"}, headers={"HX-Request": "true"}
+        )
+        self.assertTemplateUsed(response, "partials/_event_search.html")
+        self.assertTemplateNotUsed(response, "event_search.html")
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"], STORAGES=TEST_STORAGES
+)
+class CursorPaginationViewsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="user")
+        now = timezone.now()
+        Event.objects.bulk_create(
+            Event(
+                title=f"Event {i}",
+                description="Event Description",
+                location="Test Location",
+                date=now + timezone.timedelta(days=1),
+                created_by=self.user,
+                status="approved",
+            )
+            for i in range(15)
+        )
+        # Same created_at for every event so the id tie-breaker is exercised
+        Event.objects.update(created_at=now)
+        cache.clear()
+        self.client = Client()
+
+    def tearDown(self):
+        self.user.delete()
+
+    def test_recent_events_pages_cover_all_events_once(self):
+        # Warms the cached popular ids the recent pages exclude
+        generations = expire_started_events(get_generations())
+        seen = {uuid.UUID(pk) for pk in get_popular_ids(generations["popular"])}
+        cursor = None
+
+        while True:
+            params = {"page": cursor} if cursor else {}
+            with self.assertNumQueries(1):
+                response = self.client.get(
+                    reverse("event_list"), params, headers={"HX-Request": "true"}
+                )
+            recent = response.context["recent"]
+            page_ids = {event.pk for event in recent}
+            self.assertFalse(seen & page_ids)
+            seen |= page_ids
+            if not recent.has_next:
+                break
+            cursor = recent.next_cursor
+
+        self.assertEqual(len(seen), 15)
+
+    def test_previous_cursor_returns_previous_page(self):
+        first = self.client.get(reverse("event_search")).context["events"]
+        second = self.client.get(reverse("event_search"), {"page": first.next_cursor}).context[
+            "events"
+        ]
+        self.assertTrue(second.has_previous)
+
+        previous = self.client.get(
+            reverse("event_search"), {"page": second.previous_cursor}
+        ).context["events"]
+        self.assertEqual(list(previous), list(first))
+
+    def test_invalid_cursor_returns_first_page(self):
+        first = self.client.get(reverse("event_search")).context["events"]
+        response = self.client.get(reverse("event_search"), {"page": "not-a-cursor"})
+        self.assertEqual(list(response.context["events"]), list(first))
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    STRIPE_WEBHOOK_SECRET="whsec_test",
+)
+class StripeWebhookViewsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="user")
+        self.event = Event.objects.create(
+            title="Test Event",
+            description="Event Description",
+            location="Test Location",
+            date=timezone.now(),
+            created_by=self.user,
+            event_type="paid",
+            status="approved",
+        )
+        self.ticket = Ticket.objects.create(event=self.event, price=10, quantity=10)
+        self.stripe = FakeStripeEvents("whsec_test")
+        self.url = reverse("stripe_webhook")
+        self.client = Client()
+
+    def tearDown(self):
+        self.user.delete()
+
+    def test_completed_checkout_creates_purchase(self):
+        session = self.stripe.checkout_session(self.user, self.event, quantity=2)
+        response = self.stripe.post(self.client, self.url, self.stripe.event(session))
+
+        self.assertEqual(response.status_code, 200)
+        purchase = Purchase.objects.get(session_id=session["id"])
+        self.assertEqual(purchase.quantity, 2)
+        self.assertEqual(purchase.amount_paid, 1000)
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.quantity, 8)
+
+    def test_redelivered_event_is_fulfilled_once(self):
+        session = self.stripe.checkout_session(self.user, self.event)
+        for _ in range(3):
+            self.stripe.post(self.client, self.url, self.stripe.event(session))
+
+        self.assertEqual(Purchase.objects.filter(session_id=session["id"]).count(), 1)
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.quantity, 9)
+
+    def test_unpaid_session_is_not_fulfilled(self):
+        session = self.stripe.checkout_session(self.user, self.event, payment_status="unpaid")
+        self.stripe.post(self.client, self.url, self.stripe.event(session))
+        self.assertFalse(Purchase.objects.exists())
+
+    def test_invalid_signature_is_rejected(self):
+        session = self.stripe.checkout_session(self.user, self.event)
+        response = self.stripe.post(
+            self.client, self.url, self.stripe.event(session), signature="t=1,v1=bad"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Purchase.objects.exists())
+
+    def test_payment_success_redirects_to_fulfilled_purchase(self):
+        session = self.stripe.checkout_session(self.user, self.event)
+        self.stripe.post(self.client, self.url, self.stripe.event(session))
+        purchase = Purchase.objects.get(session_id=session["id"])
+
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse("ticket_payment_success", kwargs={"pk": self.event.pk}),
+            {"session_id": session["id"]},
+        )
+        self.assertRedirects(
+            response,
+            reverse("purchase_detail", kwargs={"pk": purchase.pk}),
+            fetch_redirect_response=False,
+        )
+
+    def test_sold_out_checkout_is_refunded(self):
+        Ticket.objects.filter(pk=self.ticket.pk).update(quantity=1)
+        session = self.stripe.checkout_session(self.user, self.event, quantity=2)
+        with mock.patch("stripe.RefundService.create") as refund:
+            response = self.stripe.post(self.client, self.url, self.stripe.event(session))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Purchase.objects.exists())
+        params, options = refund.call_args.args
+        self.assertEqual(params, {"payment_intent": session["payment_intent"]})
+        self.assertEqual(options["idempotency_key"], f"refund-{session['id']}")
+
+    def test_checkout_of_deleted_event_is_refunded(self):
+        session = self.stripe.checkout_session(self.user, self.event)
+        self.event.delete()
+        with mock.patch("stripe.RefundService.create") as refund:
+            response = self.stripe.post(self.client, self.url, self.stripe.event(session))
+
+        self.assertEqual(response.status_code, 200)
+        refund.assert_called_once()
+
+    def test_failed_refund_asks_for_redelivery(self):
+        Ticket.objects.filter(pk=self.ticket.pk).update(quantity=0)
+        session = self.stripe.checkout_session(self.user, self.event)
+        error = stripe.APIConnectionError("Stripe is unreachable")
+        with mock.patch("stripe.RefundService.create", side_effect=error):
+            response = self.stripe.post(self.client, self.url, self.stripe.event(session))
+        self.assertEqual(response.status_code, 502)
+
+    def test_payment_success_without_session_is_not_found(self):
+        Ticket.buy(self.user, self.event, 1)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("ticket_payment_success", kwargs={"pk": self.event.pk}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_payment_success_before_webhook_does_not_create_purchase(self):
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse("ticket_payment_success", kwargs={"pk": self.event.pk}),
+            {"session_id": "cs_test_pending"},
+        )
+        self.assertRedirects(response, reverse("account_detail"), fetch_redirect_response=False)
+        self.assertFalse(Purchase.objects.exists())
+
+
+class StubHttpx:
+    """httpx for stripe.HTTPXClient, its clients answer every request with ``handler``"""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests = []
+
+    def respond(self, request):
+        self.requests.append(request)
+        return self.handler(request)
+
+    def Client(self, **kwargs):
+        return httpx.Client(transport=httpx.MockTransport(self.respond), **kwargs)
+
+    def AsyncClient(self, **kwargs):
+        return httpx.AsyncClient(transport=httpx.MockTransport(self.respond), **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(httpx, name)
+
+
+CHECKOUT = {"id": "cs_test_1", "object": "checkout.session", "url": "https://stripe.test/cs_1"}
+
+
+@override_settings(
+    STRIPE_API_SECRET="sk_test_secret",
+    PAYMENT_GATEWAY_TIMEOUT=7,
+    PAYMENT_GATEWAY_CONNECT_TIMEOUT=2,
+    PAYMENT_GATEWAY_MAX_RETRIES=2,
+)
+class StripeGatewayTest(TestCase):
+    def gateway(self, handler):
+        stub = StubHttpx(handler)
+        http_client = mock.Mock(side_effect=partial(stripe.HTTPXClient, _lib=stub))
+        with mock.patch("events.gateways.stripe.HTTPXClient", http_client):
+            gateway = StripeGateway()
+        return gateway, stub, http_client
+
+    def test_client_is_configured_from_settings(self):
+        _, _, http_client = self.gateway(lambda request: httpx.Response(200, json=CHECKOUT))
+        http_client.assert_called_once_with(
+            timeout=httpx.Timeout(7, connect=2), allow_sync_methods=True
+        )
+
+    def test_create_checkout_returns_its_url(self):
+        gateway, stub, _ = self.gateway(lambda request: httpx.Response(200, json=CHECKOUT))
+
+        self.assertEqual(gateway.create_checkout({"mode": "payment"}), CHECKOUT["url"])
+        request = stub.requests[0]
+        self.assertEqual(request.url.path, "/v1/checkout/sessions")
+        self.assertEqual(request.headers["Authorization"], "Bearer sk_test_secret")
+
+    async def test_async_checkout_uses_the_async_client(self):
+        gateway, stub, _ = self.gateway(lambda request: httpx.Response(200, json=CHECKOUT))
+        self.assertEqual(await gateway.acreate_checkout({"mode": "payment"}), CHECKOUT["url"])
+        self.assertEqual(len(stub.requests), 1)
+
+    def test_checkout_without_url_is_a_payment_error(self):
+        gateway, _, _ = self.gateway(
+            lambda request: httpx.Response(200, json={**CHECKOUT, "url": None})
+        )
+        with self.assertRaises(PaymentError):
+            gateway.create_checkout({"mode": "payment"})
+
+    @mock.patch("time.sleep")
+    def test_failed_checkout_is_retried_with_one_key_then_a_payment_error(self, sleep):
+        gateway, stub, _ = self.gateway(
+            lambda request: httpx.Response(
+                500,
+                json={"error": {"type": "api_error", "message": "Stripe is down"}},
+                headers={"Stripe-Should-Retry": "true"},
+            )
+        )
+
+        with self.assertRaisesMessage(PaymentError, "Stripe is down"):
+            gateway.create_checkout({"mode": "payment"})
+        self.assertEqual(len(stub.requests), 3)
+        self.assertEqual(len({request.headers["Idempotency-Key"] for request in stub.requests}), 1)
+
+    def test_refund_errors_are_payment_errors(self):
+        gateway, stub, _ = self.gateway(
+            lambda request: httpx.Response(
+                400, json={"error": {"type": "invalid_request_error", "message": "Refunded"}}
+            )
+        )
+
+        with self.assertRaisesMessage(PaymentError, "Refunded"):
+            gateway.refund_checkout({"id": "cs_test_1", "payment_intent": "pi_test_1"})
+        request = stub.requests[0]
+        self.assertEqual(request.url.path, "/v1/refunds")
+        self.assertEqual(request.headers["Idempotency-Key"], "refund-cs_test_1")
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"], STORAGES=TEST_STORAGES
+)
+class EventListCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="user")
+        self.events = [
+            Event.objects.create(
+                title=f"Event {i}",
+                description="Event Description",
+                location="Test Location",
+                date=timezone.now(),
+                created_by=self.user,
+                status="approved",
+            )
+            for i in range(10)
+        ]
+        self.client = Client()
+
+    def tearDown(self):
+        self.user.delete()
+
+    def test_pending_event_edit_keeps_generations(self):
+        before = get_generations()
+        event = Event.objects.create(
+            title="Pending",
+            description="Event Description",
+            location="Test Location",
+            date=timezone.now(),
+            created_by=self.user,
+        )
+        event.title = "Still pending"
+        event.save()
+        self.assertEqual(get_generations(), before)
+
+    def test_approving_event_bumps_every_section(self):
+        event = Event.objects.create(
+            title="Pending",
+            description="Event Description",
+            location="Test Location",
+            date=timezone.now(),
+            created_by=self.user,
+        )
+        before = get_generations()
+        event.status = "approved"
+        event.save()
+        after = get_generations()
+        self.assertTrue(all(after[section] > before[section] for section in before))
+
+    def test_recent_event_edit_bumps_only_recent(self):
+        popular = set(Event.objects.active().popular().values_list("pk", flat=True)[:4])
+        featured = set(Event.objects.active().recent().values_list("pk", flat=True)[:4])
+        event = next(e for e in self.events if e.pk not in popular | featured)
+
+        before = get_generations()
+        event.title = "Edited"
+        event.save()
+        after = get_generations()
+        self.assertEqual(after["popular"], before["popular"])
+        self.assertEqual(after["featured"], before["featured"])
+        self.assertGreater(after["recent"], before["recent"])
+
+    def test_event_leaving_popular_bumps_popular(self):
+        event = Event.objects.create(
+            title="Popular",
+            description="Event Description",
+            location="Test Location",
+            date=timezone.now() + timezone.timedelta(days=1),
+            created_by=self.user,
+            status="approved",
+        )
+        Event.objects.filter(pk=event.pk).update(registration_count=100)
+        event = Event.objects.get(pk=event.pk)
+
+        before = get_generations()
+        # No longer upcoming, so no longer listed as popular after the save
+        event.date = timezone.now() - timezone.timedelta(days=1)
+        event.save()
+        self.assertGreater(get_generations()["popular"], before["popular"])
+
+    def test_recent_page_is_served_from_cache(self):
+        self.client.get(reverse("event_list"), headers={"HX-Request": "true"})
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("event_list"), headers={"HX-Request": "true"})
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"], STORAGES=TEST_STORAGES
+)
+class SeedAndBenchmarkCommandsTest(TestCase):
+    def test_seed_data_creates_consistent_rows(self):
+        call_command(
+            "seed_data",
+            users=5,
+            events=20,
+            registrations=30,
+            reviews=10,
+            purchases=10,
+            seed=1,
+            stdout=io.StringIO(),
+        )
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(Event.objects.count(), 20)
+        self.assertEqual(Purchase.objects.count(), 10)
+        for event in Event.objects.all():
+            self.assertEqual(event.registration_count, event.registrations.count())
+            self.assertEqual(event.review_count, event.reviews.count())
+        # Every seeded city is in the geocoder fixture
+        self.assertFalse(Event.objects.filter(geohash="").exists())
+
+    def test_benchmark_views_writes_results(self):
+        call_command(
+            "seed_data",
+            users=5,
+            events=20,
+            registrations=30,
+            reviews=10,
+            purchases=10,
+            seed=1,
+            stdout=io.StringIO(),
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "results.json")
+            call_command("benchmark_views", iterations=2, output=output, stdout=io.StringIO())
+            with open(output) as f:
+                results = json.load(f)["results"]
+
+        self.assertIn("event_list", results)
+        self.assertIn("account_detail", results)
+        self.assertEqual(
+            set(results["event_search"]),
+            {"p50_ms", "p95_ms", "mean_ms", "queries_avg", "queries_max"},
+        )
+
+    def test_index_advisor_finds_no_sequential_scans(self):
+        call_command(
+            "seed_data",
+            users=5,
+            events=20,
+            registrations=30,
+            reviews=10,
+            purchases=10,
+            seed=1,
+            stdout=io.StringIO(),
+        )
+        out = io.StringIO()
+        call_command("index_advisor", "--fail", stdout=out)
+        self.assertIn("0 with sequential scans", out.getvalue())
+
+    def test_index_advisor_flags_sequential_scans(self):
+        call_command(
+            "seed_data",
+            users=5,
+            events=20,
+            registrations=30,
+            reviews=10,
+            purchases=10,
+            seed=1,
+            stdout=io.StringIO(),
+        )
+        unindexed = {"description": Event.objects.filter(description__contains="jazz")}
+
+        with mock.patch(
+            "events.management.commands.index_advisor.canonical_querysets",
+            return_value=unindexed,
+        ):
+            with self.assertRaises(CommandError):
+                call_command("index_advisor", "--fail", stdout=io.StringIO())
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"], STORAGES=TEST_STORAGES
+)
+class ServerTimingMiddlewareTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="user")
+        self.event = Event.objects.create(
+            title="Test Event",
+            description="Event Description",
+            location="Test Location",
+            date=timezone.now(),
+            created_by=self.user,
+            status="approved",
+        )
+        self.client = Client()
+
+    def tearDown(self):
+        self.user.delete()
+
+    def test_response_reports_queries_render_and_total_time(self):
+        response = self.client.get(reverse("event_detail", kwargs={"pk": self.event.pk}))
+        timing = response["Server-Timing"]
+
+        queries = int(re.search(r'desc="(\d+) queries"', timing).group(1))
+        self.assertGreater(queries, 0)
+        self.assertRegex(timing, r"render;dur=\d+\.\d")
+        self.assertRegex(timing, r"total;dur=\d+\.\d")
+
+    def test_sampled_requests_are_logged(self):
+        with self.settings(SERVER_TIMING_LOG_SAMPLE_RATE=1.0):
+            with self.assertLogs("events.timing", level="INFO") as logs:
+                self.client.get(reverse("event_detail", kwargs={"pk": self.event.pk}))
+        self.assertIn("queries=", logs.output[0])
+
+
+@override_settings(
+    EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+    EMAIL_OUTBOX_EAGER=True,
+    STORAGES=TEST_STORAGES,
+)
+class OutboxEmailViewsTest(TestCase):
+    def test_contact_form_queues_email(self):
+        response = self.client.post(
+            reverse("contact"), {"email": "visitor@example.com", "message": "Hello"}
+        )
+
+        self.assertEqual(response.status_code, 302)
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.to, ["visitor@example.com"])
+        self.assertEqual(email.body, "Hello")
+
+    def test_account_email_is_queued_and_flushed_after_commit(self):
+        User.objects.create(username="user", email="user@example.com")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("account_reset_password"), {"email": "user@example.com"})
+
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.status, "sent")
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["user@example.com"])
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"], STORAGES=TEST_STORAGES
+)
+class AsyncViewsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="user")
+        self.event = Event.objects.create(
+            title="Jazz Night",
+            description="Event Description",
+            location="Test Location",
+            date=timezone.now(),
+            created_by=self.user,
+            event_type="paid",
+            status="approved",
+        )
+        self.ticket = Ticket.objects.create(event=self.event, price=10, quantity=10)
+        self.client = AsyncClient()
+
+    def tearDown(self):
+        self.user.delete()
+
+    @override_settings(PAGE_CACHE_TIMEOUT=0)
+    async def test_event_pages_render_under_asgi(self):
+        for url in [
+            reverse("event_list"),
+            reverse("event_detail", kwargs={"pk": self.event.pk}),
+            reverse("event_search") + "?q=jazz",
+        ]:
+            response = await self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("Server-Timing", response)
+
+        response = await self.client.get(reverse("event_search") + "?q=jazz")
+        self.assertEqual(response.context["events"].object_list, [self.event])
+
+    async def test_event_detail_reports_purchase_of_logged_in_user(self):
+        await Purchase.objects.acreate(
+            ticket=self.ticket, user=self.user, event_name=self.event.title, amount_paid=1000
+        )
+        await self.client.aforce_login(self.user)
+
+        response = await self.client.get(reverse("event_detail", kwargs={"pk": self.event.pk}))
+        self.assertTrue(response.context["has_joined"])
+        self.assertFalse(response.context["has_reviewed"])
+
+    @override_settings(STRIPE_API_SECRET="sk_test")
+    async def test_buy_ticket_creates_checkout_session_asynchronously(self):
+        await self.client.aforce_login(self.user)
+        checkout = SimpleNamespace(url="https://checkout.stripe.com/c/pay/test")
+
+        with mock.patch(
+            "stripe.checkout.SessionService.create_async", new=mock.AsyncMock(return_value=checkout)
+        ) as create:
+            response = await self.client.post(
+                reverse("ticket_buy", kwargs={"pk": self.event.pk}), {"ticket_quantity": 2}
+            )
+
+        self.assertRedirects(response, checkout.url, fetch_redirect_response=False)
+        metadata = create.call_args.args[0]["metadata"]
+        self.assertEqual(metadata["user_id"], str(self.user.id))
+        self.assertEqual(metadata["quantity"], 2)
+
+    @override_settings(STRIPE_API_SECRET="sk_test")
+    async def test_buy_ticket_reports_gateway_errors(self):
+        await self.client.aforce_login(self.user)
+
+        with mock.patch(
+            "stripe.checkout.SessionService.create_async",
+            new=mock.AsyncMock(side_effect=stripe.APIConnectionError("Timed out")),
+        ):
+            response = await self.client.post(
+                reverse("ticket_buy", kwargs={"pk": self.event.pk}), {"ticket_quantity": 2}
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(await Purchase.objects.aexists())
+
+    @override_settings(
+        PAYMENT_GATEWAY="events.gateways.FakeGateway", PAYMENT_GATEWAY_ALLOW_FAKE=True
+    )
+    async def test_fake_gateway_fulfills_checkout_in_process(self):
+        await self.client.aforce_login(self.user)
+
+        response = await self.client.post(
+            reverse("ticket_buy", kwargs={"pk": self.event.pk}), {"ticket_quantity": 2}
+        )
+
+        purchase = await Purchase.objects.aget(user=self.user)
+        self.assertEqual(purchase.quantity, 2)
+        self.assertEqual(purchase.amount_paid, 2000)
+        self.assertEqual(
+            response.url,
+            "http://testserver"
+            + reverse("ticket_payment_success", kwargs={"pk": self.event.pk})
+            + f"?session_id={purchase.session_id}",
+        )
+        response = await self.client.get(response.url)
+        self.assertRedirects(
+            response,
+            reverse("purchase_detail", kwargs={"pk": purchase.pk}),
+            fetch_redirect_response=False,
+        )
+
+    @override_settings(PAYMENT_GATEWAY="events.gateways.FakeGateway")
+    def test_fake_gateway_is_refused_without_debug(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_gateway()
+
+    @override_settings(DEBUG=True)
+    def test_middleware_runs_in_the_event_loop(self):
+        # With DEBUG, Django logs every sync only middleware it adapts for an async handler
+        with self.assertNoLogs("django.request", "DEBUG"):
+            ASGIHandler()
+
+    @override_settings(WHITENOISE_USE_FINDERS=True, WHITENOISE_AUTOREFRESH=True)
+    async def test_static_files_are_served_under_asgi(self):
+        response = await AsyncClient().get("/static/favicon.svg")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/svg+xml")
+
+    @override_settings(
+        WHITENOISE_USE_FINDERS=True, WHITENOISE_AUTOREFRESH=True, WHITENOISE_MAX_AGE=123
+    )
+    def test_static_files_follow_whitenoise_settings(self):
+        response = Client().get("/static/favicon.svg")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "max-age=123, public")
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"], STORAGES=TEST_STORAGES
+)
+class MembershipCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="user")
+        self.event = Event.objects.create(
+            title="Test Event",
+            description="Event Description",
+            location="Test Location",
+            date=timezone.now(),
+            created_by=self.user,
+            status="approved",
+        )
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.url = reverse("event_detail", kwargs={"pk": self.event.pk})
+
+    def tearDown(self):
+        self.user.delete()
+
+    def test_membership_is_read_from_cache(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as cached:
+            self.client.get(self.url)
+
+        self.assertFalse(
+            any("events_registration" in query["sql"] for query in cached.captured_queries)
+        )
+
+    def test_register_and_review_update_membership(self):
+        self.assertFalse(self.client.get(self.url).context["has_joined"])
+
+        self.client.post(reverse("register_event", kwargs={"pk": self.event.pk}))
+        self.client.post(
+            reverse("review_create", kwargs={"pk": self.event.pk}), {"rating": 5, "comment": "Ok"}
+        )
+        response = self.client.get(self.url)
+        self.assertTrue(response.context["has_joined"])
+        self.assertTrue(response.context["has_reviewed"])
+
+        self.client.post(reverse("register_event", kwargs={"pk": self.event.pk}))
+        self.assertFalse(self.client.get(self.url).context["has_joined"])
+
+    def test_list_pages_mark_joined_events(self):
+        self.client.post(reverse("register_event", kwargs={"pk": self.event.pk}))
+
+        response = self.client.get(reverse("event_list"))
+        self.assertEqual(response.context["member_events"], [str(self.event.pk)])
+        self.assertContains(response, 'id="member-events"')
+
+
+class EventExportViewsTest(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create(username="organizer")
+        self.attendees = [
+            User.objects.create(username=f"attendee{i}", email=f"attendee{i}@example.com")
+            for i in range(3)
+        ]
+        self.event = Event.objects.create(
+            title="Test Event",
+            description="Event Description",
+            location="Test Location",
+            date=timezone.now(),
+            created_by=self.organizer,
+            status="approved",
+        )
+        for attendee in self.attendees:
+            Registration.objects.create(user=attendee, event=self.event)
+        self.url = reverse("event_export", kwargs={"pk": self.event.pk, "kind": "registrations"})
+        self.client = Client()
+        self.client.force_login(self.organizer)
+
+    def tearDown(self):
+        User.objects.all().delete()
+
+    def test_registrations_stream_as_csv(self):
+        response = self.client.get(self.url)
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn("test-event-registrations.csv", response["Content-Disposition"])
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "username,email,registered_at")
+        self.assertEqual(
+            [line.split(",")[0] for line in lines[1:]], ["attendee0", "attendee1", "attendee2"]
+        )
+
+    def test_purchases_stream_as_ndjson(self):
+        self.event.event_type = "paid"
+        self.event.save()
+        ticket = Ticket.objects.create(event=self.event, price=10, quantity=10)
+        Ticket.buy(self.attendees[0], self.event, 2, 2000)
+
+        response = self.client.get(
+            reverse("event_export", kwargs={"pk": self.event.pk, "kind": "purchases"}),
+            {"format": "ndjson"},
+        )
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["username"], "attendee0")
+        self.assertEqual(rows[0]["quantity"], 2)
+        self.assertEqual(rows[0]["amount_paid_cents"], 2000)
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.quantity, 8)
+
+    async def test_export_streams_asynchronously_under_asgi(self):
+        client = AsyncClient()
+        await client.aforce_login(self.organizer)
+
+        response = await client.get(self.url)
+        content = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(content.decode().splitlines()), 4)
+
+    def stream_peak(self, event):
+        """Peak memory allocated while streaming the registrations of ``event``"""
+        encode = encoder(("username", "email", "registered_at"), "csv")
+        tracemalloc.start()
+        try:
+            size = sum(len(chunk) for chunk in stream_rows(registration_rows(event), encode))
+            return size, tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    @mock.patch("events.exports.CHUNK_SIZE", 100)
+    @mock.patch("events.exports.LINES_PER_WRITE", 50)
+    def test_export_memory_stays_flat(self):
+        small, large = (
+            Event.objects.create(
+                title=title,
+                description="Event Description",
+                location="Test Location",
+                date=timezone.now(),
+                created_by=self.organizer,
+                status="approved",
+            )
+            for title in ("Small Event", "Large Event")
+        )
+        users = User.objects.bulk_create(
+            User(username=f"crowd{i}", email=f"crowd{i}@example.com") for i in range(4000)
+        )
+        Registration.objects.bulk_create(
+            [Registration(user=user, event=large) for user in users]
+            + [Registration(user=user, event=small) for user in users[:1000]]
+        )
+
+        # The first run pays for query compilation and imports
+        self.stream_peak(small)
+        _, small_peak = self.stream_peak(small)
+        size, large_peak = self.stream_peak(large)
+
+        self.assertLess(large_peak, size)
+        self.assertLess(large_peak, small_peak * 1.25)
+
+    def test_only_the_organizer_can_export(self):
+        self.client.force_login(self.attendees[0])
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+        self.client.force_login(self.organizer)
+        unknown = reverse("event_export", kwargs={"pk": self.event.pk, "kind": "reviews"})
+        self.assertEqual(self.client.get(unknown).status_code, 404)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class EventDashboardViewsTest(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create(username="organizer")
+        self.attendee = User.objects.create(username="attendee")
+        self.event = Event.objects.create(
+            title="Test Event",
+            description="Event Description",
+            location="Test Location",
+            date=timezone.now(),
+            created_by=self.organizer,
+            status="approved",
+        )
+        Registration.objects.create(user=self.attendee, event=self.event)
+        self.url = reverse("event_dashboard", kwargs={"pk": self.event.pk})
+        self.client = Client()
+
+    def tearDown(self):
+        User.objects.all().delete()
+
+    def test_dashboard_reads_only_rollups(self):
+        self.client.force_login(self.organizer)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["totals"]["registrations"], 1)
+        self.assertEqual(response.context["chart"][0]["registrations_width"], 100)
+        tables = " ".join(query["sql"] for query in queries.captured_queries)
+        self.assertNotIn("events_registration", tables)
+        self.assertNotIn("events_purchase", tables)
+
+    def test_dashboard_is_only_for_the_organizer(self):
+        self.client.force_login(self.attendee)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+# Anonymous requests would be answered by the page cache in front of the validators
+@override_settings(PAGE_CACHE_TIMEOUT=0, STORAGES=TEST_STORAGES)
+class ConditionalGetViewsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="user")
+        self.event = Event.objects.create(
+            title="Test Event",
+            description="Event Description",
+            location="Test Location",
+            date=timezone.now(),
+            created_by=self.user,
+            status="approved",
+        )
+        self.url = reverse("event_detail", kwargs={"pk": self.event.pk})
+        self.client = Client()
+
+    def tearDown(self):
+        self.user.delete()
+
+    def test_unchanged_pages_answer_not_modified(self):
+        # The first response sets the CSRF cookie the page embeds
+        self.client.get(reverse("event_list"))
+        etag = self.client.get(reverse("event_list"))["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("event_list"), headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(self.url)
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                self.url, headers={"If-Modified-Since": response["Last-Modified"]}
+            )
+        self.assertEqual(response.status_code, 304)
+
+    def test_registration_and_review_change_detail_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        Registration.objects.create(user=self.user, event=self.event)
+        registered = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(registered.status_code, 200)
+
+        Review.objects.create(user=self.user, event=self.event, rating=5, comment="Good")
+        reviewed = self.client.get(self.url, headers={"If-None-Match": registered["ETag"]})
+        self.assertEqual(reviewed.status_code, 200)
+
+    def test_etag_varies_with_user_and_htmx(self):
+        anonymous = self.client.get(reverse("event_list"))
+        htmx = self.client.get(reverse("event_list"), headers={"HX-Request": "true"})
+        self.client.force_login(self.user)
+        authenticated = self.client.get(reverse("event_list"))
+
+        self.assertEqual(len({anonymous["ETag"], htmx["ETag"], authenticated["ETag"]}), 3)
+        self.assertNotIn("Last-Modified", authenticated)
+        self.assertIn("HX-Request", anonymous["Vary"])
+
+    def test_started_event_changes_list_etag(self):
+        soon = Event.objects.create(
+            title="Starting soon",
+            description="Event Description",
+            location="Test Location",
+            date=timezone.now() + timezone.timedelta(hours=1),
+            created_by=self.user,
+            status="approved",
+        )
+        self.client.force_login(self.user)
+        # The first response sets the CSRF cookie the page embeds
+        self.client.get(reverse("event_list"))
+        response = self.client.get(reverse("event_list"))
+        self.assertIn(soon, response.context["events"])
+        etag = response["ETag"]
+        self.assertEqual(
+            self.client.get(reverse("event_list"), headers={"If-None-Match": etag}).status_code,
+            304,
+        )
+
+        later = timezone.now() + timezone.timedelta(hours=2)
+        with mock.patch("django.utils.timezone.now", return_value=later):
+            response = self.client.get(reverse("event_list"), headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(soon, response.context["events"])
+
+    def test_pending_messages_skip_validation(self):
+        etag = self.client.get(self.url)["ETag"]
+        with mock.patch("events.conditional.messages.get_messages", return_value=["Saved"]):
+            response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+
+
+@override_settings(
+    DATABASE_REPLICAS=["replica"],
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    STORAGES=TEST_STORAGES,
+)
+class ReplicaRoutingTest(TransactionTestCase):
+    # Transactions always read from the primary, so TestCase would never reach the replica
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="user")
+        self.event = Event.objects.create(
+            title="Primary copy",
+            description="Event Description",
+            location="Test Location",
+            date=timezone.now(),
+            created_by=self.user,
+            status="approved",
+        )
+        # The replica lags behind with an older title
+        self.user.save(using="replica")
+        self.event.title = "Replica copy"
+        self.event.save(using="replica")
+        self.url = reverse("event_detail", kwargs={"pk": self.event.pk})
+        self.client = Client()
+
+    def test_event_pages_read_from_replica(self):
+        self.client.force_login(self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.context["event"].title, "Replica copy")
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_cached_pages_are_rendered_from_primary(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.context["event"].title, "Primary copy")
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Page-Cache"], "hit")
+        self.assertIn(b"Primary copy", response.content)
+
+    @override_settings(PAGE_CACHE_TIMEOUT=0)
+    def test_uncached_anonymous_pages_read_from_replica(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.context["event"].title, "Replica copy")
+
+    def test_reads_after_a_write_stay_on_primary(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse("review_create", kwargs={"pk": self.event.pk}),
+            {"rating": 5, "comment": "Good"},
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.context["event"].title, "Primary copy")
+
+    def test_locking_reads_go_to_primary(self):
+        routing = RequestRouting(pinned=False)
+        routing.replica = True
+        token = _current_routing.set(routing)
+        try:
+            self.assertEqual(Event.objects.all().db, "replica")
+            self.assertEqual(Ticket.objects.select_for_update().db, "default")
+        finally:
+            _current_routing.reset(token)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class AnonymousPageCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="user")
+        self.event = Event.objects.create(
+            title="Test Event",
+            description="Event Description",
+            location="Test Location",
+            date=timezone.now() + timezone.timedelta(days=1),
+            created_by=self.user,
+            status="approved",
+        )
+        self.url = reverse("event_detail", kwargs={"pk": self.event.pk})
+        self.client = Client()
+
+    def tearDown(self):
+        self.user.delete()
+
+    def test_anonymous_pages_are_served_without_queries(self):
+        for url in [reverse("event_list"), self.url, reverse("event_search") + "?q=test"]:
+            first = self.client.get(url)
+            with self.assertNumQueries(0):
+                second = self.client.get(url)
+            self.assertEqual(second["X-Page-Cache"], "hit")
+            self.assertEqual(len(second.content), len(first.content))
+
+    def test_htmx_partial_and_full_page_are_cached_apart(self):
+        self.client.get(reverse("event_list"))
+        response = self.client.get(reverse("event_list"), headers={"HX-Request": "true"})
+        self.assertNotIn("X-Page-Cache", response)
+        self.assertTemplateUsed(response, "partials/_recent_events.html")
+
+    def test_cached_page_carries_visitors_csrf_token(self):
+        self.client.get(self.url)
+        visitor = Client(enforce_csrf_checks=True)
+        response = visitor.get(self.url)
+        self.assertEqual(response["X-Page-Cache"], "hit")
+
+        token = re.search(rb'name="csrfmiddlewaretoken" value="(\w+)"', response.content)[1]
+        response = visitor.post(
+            reverse("register_event", kwargs={"pk": self.event.pk}),
+            {"csrfmiddlewaretoken": token.decode()},
+        )
+        # Passes the CSRF check and reaches login_required
+        self.assertEqual(response.status_code, 302)
+
+    def test_logged_in_users_bypass_the_cache(self):
+        self.client.get(self.url)
+        self.client.force_login(self.user)
+        response = self.client.get(self.url)
+        self.assertNotIn("X-Page-Cache", response)
+        self.assertIsNotNone(response.context)
+
+    def test_review_and_event_edit_purge_cached_pages(self):
+        self.client.get(self.url)
+        self.client.get(reverse("event_list"))
+
+        Review.objects.create(user=self.user, event=self.event, rating=5, comment="Great")
+        self.assertContains(self.client.get(self.url), "Great")
+        self.assertEqual(self.client.get(reverse("event_list"))["X-Page-Cache"], "hit")
+
+        self.event.title = "Renamed"
+        self.event.save()
+        self.assertContains(self.client.get(reverse("event_list")), "Renamed")
+
+    def test_ticket_edit_purges_detail_page(self):
+        ticket = Ticket.objects.create(event=self.event, price=10, quantity=10)
+        self.client.get(self.url)
+        self.assertEqual(self.client.get(self.url)["X-Page-Cache"], "hit")
+
+        ticket.quantity = 5
+        ticket.save_changes()
+        self.assertNotIn("X-Page-Cache", self.client.get(self.url))
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class NearbySearchViewsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="user")
+        for title, location in [("Old town walk", "Main Square, Krakow"), ("Expo", "Warsaw")]:
+            Event.objects.create(
+                title=title,
+                description="Event Description",
+                location=location,
+                date=timezone.now(),
+                created_by=self.user,
+                status="approved",
+            )
+        self.client = Client()
+
+    def tearDown(self):
+        self.user.delete()
+
+    def test_search_filters_by_distance(self):
+        params = {"lat": 50.0614, "lon": 19.9366, "km": 25}
+        response = self.client.get(reverse("event_search"), params)
+        self.assertEqual([event.title for event in response.context["events"]], ["Old town walk"])
+
+        response = self.client.get(reverse("event_search"), {**params, "km": 500})
+        self.assertEqual(len(response.context["events"]), 2)
+
+    def test_invalid_location_is_ignored(self):
+        response = self.client.get(reverse("event_search"), {"lat": 200, "lon": 19.9, "km": 25})
+        self.assertEqual(len(response.context["events"]), 2)
+
+
+@override_settings(STORAGES=TEST_STORAGES, PAGE_CACHE_TIMEOUT=0)
+class FacetViewsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="user")
+        events = [
+            ("Jazz Night", "Music", "free", 2),
+            ("Rock Gig", "Music", "paid", 40),
+            ("Art Fair", "Art", "paid", 200),
+        ]
+        for title, category, event_type, days in events:
+            event = Event.objects.create(
+                title=title,
+                description="Event Description",
+                location="Test Location",
+                category=category,
+                event_type=event_type,
+                date=timezone.now() + timezone.timedelta(days=days),
+                created_by=self.user,
+                status="approved",
+            )
+            if event_type == "paid":
+                Ticket.objects.create(event=event, price=days, quantity=10)
+        self.client = Client()
+        cache.clear()
+
+    def tearDown(self):
+        self.user.delete()
+
+    def counts(self, response, name):
+        facet = next(facet for facet in response.context["facets"] if facet["name"] == name)
+        return {option["value"]: option["count"] for option in facet["options"]}
+
+    def test_search_filters_and_counts_other_facets(self):
+        response = self.client.get(reverse("event_search"), {"category": "Music"})
+        self.assertEqual(
+            {event.title for event in response.context["events"]}, {"Jazz Night", "Rock Gig"}
+        )
+        # Counts of a facet ignore its own selection
+        self.assertEqual(self.counts(response, "category"), {"Art": 1, "Music": 2})
+        self.assertEqual(self.counts(response, "price")["25_100"], 1)
+        self.assertEqual(self.counts(response, "price")["over_100"], 0)
+
+        response = self.client.get(
+            reverse("event_search"), {"category": "Music", "price": ["free", "over_100"]}
+        )
+        self.assertEqual([event.title for event in response.context["events"]], ["Jazz Night"])
+
+    def test_unknown_values_are_ignored(self):
+        response = self.client.get(reverse("event_search"), {"when": "someday", "category": "Art"})
+        self.assertEqual([event.title for event in response.context["events"]], ["Art Fair"])
+
+    def test_active_counts_are_cached_until_events_change(self):
+        self.client.get(reverse("event_search"))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("event_search"), {"when": "week"})
+        self.assertEqual(
+            self.counts(response, "when"), {"week": 1, "month": 0, "later": 2, "past": 0}
+        )
+
+        Ticket.objects.filter(event__title="Rock Gig").get().save()
+        Event.objects.get(title="Art Fair").delete()
+        response = self.client.get(reverse("event_search"))
+        self.assertEqual(self.counts(response, "category"), {"Music": 2})
+
+    def test_list_filters_recent_events(self):
+        response = self.client.get(reverse("event_list"), {"event_type": "paid"})
+        self.assertEqual(
+            {event.title for event in response.context["recent"]}, {"Rock Gig", "Art Fair"}
+        )
+        self.assertContains(response, 'value="paid"')
+
+        response = self.client.get(reverse("event_list"), {"category": "Art", "event_type": "free"})
+        self.assertContains(response, "No events match the filters")
+
+
+@override_settings(STORAGES=TEST_STORAGES, PAGE_CACHE_TIMEOUT=0)
+class ArchiveEventsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="user")
+        self.old = Event.objects.create(
+            title="Old Gig",
+            description="Event Description",
+            location="Test Location",
+            date=timezone.now() - timezone.timedelta(days=400),
+            created_by=self.user,
+            event_type="paid",
+            status="approved",
+        )
+        Ticket.objects.create(event=self.old, price=10, quantity=10)
+        with self.captureOnCommitCallbacks(execute=True):
+            Ticket.buy(self.user, self.old, 2, amount_paid=2000)
+        Review.objects.create(user=self.user, event=self.old, rating=4, comment="Loud")
+        self.recent = Event.objects.create(
+            title="Last Week",
+            description="Event Description",
+            location="Test Location",
+            date=timezone.now() - timezone.timedelta(days=7),
+            created_by=self.user,
+            status="approved",
+        )
+        Registration.objects.create(user=self.user, event=self.recent)
+        self.client = Client()
+
+    def tearDown(self):
+        self.user.delete()
+
+    def test_command_moves_old_events_with_their_rows(self):
+        out = io.StringIO()
+        call_command("archive_events", "--days", "30", "--batch-size", "1", stdout=out)
+        self.assertIn("Archived 1 events", out.getvalue())
+
+        self.assertEqual(list(Event.objects.all()), [self.recent])
+        self.assertFalse(Ticket.objects.exists())
+        self.assertFalse(Purchase.objects.exists())
+        self.assertEqual(Registration.objects.count(), 1)
+
+        archived = ArchivedEvent.objects.get(pk=self.old.pk)
+        self.assertEqual((archived.review_count, archived.rating_sum), (1, 4))
+        self.assertEqual(archived.ticket_price, 10)
+        self.assertEqual(archived.purchases.get().amount_paid, 2000)
+        self.assertEqual(archived.reviews.get().comment, "Loud")
+        self.assertFalse(Event.objects.search("Old").exists())
+        self.assertEqual(archived.daily_stats.get().revenue, 2000)
+        self.assertFalse(EventDailyStats.objects.filter(event_id=self.old.pk).exists())
+
+    def test_archived_event_keeps_its_dashboard(self):
+        call_command("archive_events", "--days", "30", stdout=io.StringIO())
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse("event_dashboard", kwargs={"pk": self.old.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["totals"]["tickets_sold"], 2)
+
+    def test_archived_event_stays_viewable(self):
+        call_command("archive_events", "--days", "30", stdout=io.StringIO())
+
+        response = self.client.get(reverse("event_detail", kwargs={"pk": self.old.pk}))
+        self.assertRedirects(
+            response,
+            reverse("archived_event_detail", kwargs={"pk": self.old.pk}),
+            status_code=301,
+        )
+        response = self.client.get(response["Location"])
+        self.assertContains(response, "This event has ended")
+        self.assertContains(response, "Loud")
+
+        missing = self.client.get(reverse("event_detail", kwargs={"pk": uuid.uuid4()}))
+        self.assertEqual(missing.status_code, 404)
+
+    def test_home_page_lists_only_upcoming_events(self):
+        response = self.client.get(reverse("event_list"))
+        self.assertNotContains(response, "Last Week")
+
+    def test_archived_purchases_stay_on_the_account_page(self):
+        call_command("archive_events", "--days", "30", stdout=io.StringIO())
+        archived = ArchivedPurchase.objects.get()
+        upcoming = Event.objects.create(
+            title="Next Gig",
+            description="Event Description",
+            location="Test Location",
+            date=timezone.now() + timezone.timedelta(days=7),
+            created_by=self.user,
+            event_type="paid",
+            status="approved",
+        )
+        Ticket.objects.create(event=upcoming, price=10, quantity=10)
+        for _ in range(5):
+            Ticket.buy(self.user, upcoming, 1, amount_paid=1000)
+        self.client.force_login(self.user)
+
+        first = self.client.get(reverse("account_detail")).context["purchases"]
+        self.assertNotIn(archived, first)
+        second = self.client.get(
+            reverse("account_detail"),
+            {"purchases": first.next_cursor},
+            headers={"HX-Request": "true"},
+        )
+        self.assertEqual(list(second.context["purchases"]), [archived])
+        self.assertFalse(second.context["purchases"].has_next)
+
+        response = self.client.get(reverse("purchase_detail", kwargs={"pk": archived.pk}))
+        self.assertContains(response, "Old Gig (archived)")
+        self.assertContains(response, "20.00$")
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"], STORAGES=TEST_STORAGES
+)
+class EventUpdateViewsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="user")
+        self.event = Event.objects.create(
+            title="Test Event",
+            description="Event Description",
+            location="Test Location",
+            date=timezone.now() + timezone.timedelta(days=1),
+            category="Music",
+            created_by=self.user,
+            status="approved",
+        )
+        self.url = reverse("event_update", kwargs={"pk": self.event.pk})
+        self.client = Client()
+        self.client.force_login(self.user)
+        cache.clear()
+
+    def tearDown(self):
+        self.user.delete()
+
+    def form_data(self, **changes):
+        return {
+            "title": self.event.title,
+            "description": self.event.description,
+            "location": self.event.location,
+            "date": timezone.localtime(self.event.date).strftime("%Y-%m-%dT%H:%M:%S.%f"),
+            "category": self.event.category,
+            "event_type": "free",
+            **changes,
+        }
+
+    def test_unchanged_form_writes_nothing(self):
+        generations = get_generations()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, self.form_data())
+
+        self.assertRedirects(response, reverse("event_detail", kwargs={"pk": self.event.pk}))
+        self.assertFalse(any('UPDATE "events_event"' in q["sql"] for q in queries))
+        self.assertEqual(get_generations(), generations)
+
+    def test_only_changed_fields_are_updated(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(self.url, self.form_data(title="Renamed"))
+
+        update = next(q["sql"] for q in queries if q["sql"].startswith('UPDATE "events_event"'))
+        self.assertIn('"title"', update)
+        self.assertNotIn('"description"', update)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.title, "Renamed")
+
+
+@override_settings(STORAGES=TEST_STORAGES, PAGE_CACHE_TIMEOUT=0)
+class EventCardCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="user")
+        self.events = [
+            Event.objects.create(
+                title=f"Event {i}",
+                description="Event Description",
+                location="Test Location",
+                date=timezone.now() + timezone.timedelta(days=1),
+                event_type="paid",
+                created_by=self.user,
+                status="approved",
+            )
+            for i in range(3)
+        ]
+        self.tickets = [
+            Ticket.objects.create(event=event, price=10, quantity=10) for event in self.events
+        ]
+        self.client = Client()
+
+    def tearDown(self):
+        self.user.delete()
+
+    def test_stale_section_only_rerenders_changed_cards(self):
+        self.client.get(reverse("event_list"))
+        first, second = self.events[:2]
+        # Without a new card_updated_at the cached card is kept
+        Event.objects.filter(pk=second.pk).update(title="Quietly renamed")
+        first.title = "Renamed"
+        first.save()
+
+        response = self.client.get(reverse("event_list"))
+        self.assertContains(response, "Renamed")
+        self.assertNotContains(response, "Quietly renamed")
+        self.assertContains(response, "Event 1")
+
+    def test_ticket_price_change_refreshes_cards(self):
+        self.client.get(reverse("event_list"))
+        ticket = Ticket.objects.get(pk=self.tickets[0].pk)
+        ticket.price = 99
+        ticket.save()
+
+        self.assertContains(self.client.get(reverse("event_list")), "99.00$")
+
+    def test_registration_keeps_cached_card(self):
+        self.client.get(reverse("event_list"))
+        event = self.events[0]
+        Event.objects.filter(pk=event.pk).update(title="Quietly renamed")
+        Registration.objects.create(event=event, user=self.user)
+
+        response = self.client.get(reverse("event_list"))
+        self.assertNotContains(response, "Quietly renamed")
+        self.assertContains(response, "Event 0")
@@ -0,0 +1,133 @@
+"""
+Per-request timings reported in the ``Server-Timing`` response header.
+
+``ServerTimingMiddleware`` counts queries through connection execute wrappers and
+``TimedDjangoTemplates`` adds the time spent rendering templates. Both sync and async
+requests are measured. A sample of requests can also be logged through
+``SERVER_TIMING_LOG_SAMPLE_RATE``.
+"""
+
+import logging
+import random
+import time
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+logger = logging.getLogger(__name__)
+
+_current_timings = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    __slots__ = ("queries", "db", "render")
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.render = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        timings = _current_timings.get()
+        if timings is None:
+            return super().render(context, request)
+
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timings.render += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates backend that reports top level render time to ServerTimingMiddleware"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+def record_query(execute, sql, params, many, context):
+    timings = _current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    return timings(execute, sql, params, many, context)
+
+
+def install_query_timer(connection):
+    """
+    Time every query of ``connection`` while a request is measured. Connections are per
+    thread and async views run their queries in executor threads, so the wrapper is
+    installed on each connection and finds the request through a context variable.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class ServerTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_timings.reset(token)
+
+        self.report(request, response, timings, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_timings.reset(token)
+
+        self.report(request, response, timings, time.perf_counter() - started)
+        return response
+
+    def report(self, request, response, timings, total):
+        response["Server-Timing"] = (
+            f'db;dur={timings.db * 1000:.1f};desc="{timings.queries} queries", '
+            f"render;dur={timings.render * 1000:.1f}, "
+            f"total;dur={total * 1000:.1f}"
+        )
+
+        sample_rate = settings.SERVER_TIMING_LOG_SAMPLE_RATE
+        if sample_rate and random.random() < sample_rate:
+            logger.info(
+                f"{request.method} {request.path} {response.status_code} "
+                f"total={total * 1000:.1f}ms db={timings.db * 1000:.1f}ms "
+                f"queries={timings.queries} render={timings.render * 1000:.1f}ms"
+            )
@@ -28,8 +28,15 @@ urlpatterns = [
     path("accounts/delete/", views.account.account_delete, name="account_delete"),
     path("event/", views.event.event_create, name="event_create"),
     path("event/<uuid:pk>/", views.event.event_detail, name="event_detail"),
+    path(
+        "event/<uuid:pk>/archived/",
+        views.event.archived_event_detail,
+        name="archived_event_detail",
+    ),
     path("event/<uuid:pk>/edit/", views.event.event_update, name="event_update"),
     path("event/<uuid:pk>/delete/", views.event.event_delete, name="event_delete"),
+    path("event/<uuid:pk>/export/<str:kind>/", views.event.event_export, name="event_export"),
+    path("event/<uuid:pk>/dashboard/", views.dashboard.event_dashboard, name="event_dashboard"),
     path("event/<uuid:pk>/register/", views.event.register_for_event, name="register_event"),
     path("event/<uuid:pk>/ticket/checkout/", views.event.buy_ticket, name="ticket_buy"),
     path("event/search/", views.event.event_search, name="event_search"),
@@ -45,4 +52,5 @@ urlpatterns = [
         views.event.payment_success,
         name="ticket_payment_success",
     ),
+    path("stripe/webhook/", views.event.stripe_webhook, name="stripe_webhook"),
 ]
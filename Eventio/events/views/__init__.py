@@ -1,3 +1,3 @@
-from . import event, account, review
+from . import event, account, review, dashboard
 
-__all__ = [event, account, review]
+__all__ = [event, account, review, dashboard]
@@ -1,16 +1,18 @@
 from django.http import Http404
-from django.core.paginator import Paginator
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import logout
 from django.contrib import messages
 from allauth.account.decorators import reauthentication_required
-
-
-def paginate_queryset(request, queryset, page_param="page", per_page=4):
-    paginator = Paginator(queryset, per_page)
-    page_number = request.GET.get(page_param)
-    return paginator.get_page(page_number)
+from events.pagination import paginate_queryset
+from events.querysets import (
+    LATEST_PURCHASES,
+    LATEST_REGISTRATIONS,
+    NEWEST_FIRST,
+    account_events,
+    account_purchases,
+    account_registrations,
+)
 
 
 @login_required
@@ -23,13 +25,15 @@ def account_detail(request):
 
     purchases = paginate_queryset(
         request,
-        user.purchases.all().order_by("-purchased_at").select_related("user", "ticket__event"),
+        account_purchases(user),
+        ordering=LATEST_PURCHASES,
         page_param="purchases",
         per_page=5,
     )
     registers = paginate_queryset(
         request,
-        user.registartions.all().order_by("-registered_at").select_related("event", "user"),
+        account_registrations(user),
+        ordering=LATEST_REGISTRATIONS,
         page_param="registers",
         per_page=5,
     )
@@ -37,7 +41,8 @@ def account_detail(request):
     if status in ["pending", "approved"]:
         events = paginate_queryset(
             request,
-            user.events.filter(status=status).select_related("ticket"),
+            account_events(user, status),
+            ordering=NEWEST_FIRST,
             page_param="events",
             per_page=5,
         )
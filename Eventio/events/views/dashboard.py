@@ -0,0 +1,51 @@
+from datetime import timedelta
+from django.contrib.auth.decorators import login_required
+from django.db.models import Sum
+from django.http import Http404
+from django.shortcuts import render
+from django.utils import timezone
+from events.models import ArchivedEvent, Event
+
+SERIES = ("registrations", "tickets_sold", "revenue")
+
+
+def bar_width(value, peak):
+    return round(value / peak * 100) if peak else 0
+
+
+@login_required
+def event_dashboard(request, pk):
+    # Archived events keep their rollups
+    event = (
+        Event.objects.filter(pk=pk, created_by=request.user).first()
+        or ArchivedEvent.objects.filter(pk=pk, created_by=request.user).first()
+    )
+    if event is None:
+        raise Http404()
+    try:
+        period = min(max(int(request.GET.get("days", 30)), 1), 365)
+    except ValueError:
+        period = 30
+
+    # Reads the daily rollups only, never the registrations or purchases themselves
+    stats = event.daily_stats.all()
+    totals = stats.aggregate(**{name: Sum(name, default=0) for name in SERIES})
+    days = list(stats.filter(day__gt=timezone.localdate() - timedelta(days=period)))
+
+    peaks = {name: max((getattr(day, name) for day in days), default=0) for name in SERIES}
+    chart = [
+        {
+            "stats": day,
+            **{f"{name}_width": bar_width(getattr(day, name), peaks[name]) for name in SERIES},
+        }
+        for day in days
+    ]
+
+    context = {
+        "event": event,
+        "period": period,
+        "chart": chart,
+        "totals": totals,
+        "revenue_total": f"{totals['revenue'] // 100}.{totals['revenue'] % 100:02}",
+    }
+    return render(request, "event_dashboard.html", context)
@@ -1,57 +1,172 @@
 import logging
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.core.mail import send_mail
-from django.db.models import Avg, Count
-from django.db.models.functions import Round
 from django.http import Http404, HttpResponse
-from django.core.paginator import Paginator
-from django.shortcuts import render, get_object_or_404, redirect
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db import transaction
 from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
-import stripe
 from django.views.generic import FormView
+from django.core.handlers.asgi import ASGIRequest
 
-from events.models import Event, Registration, Ticket, Purchase, Review
+from events.models import ArchivedEvent, ArchivedPurchase, Event, Registration, Purchase, Review
 from django.core.exceptions import ObjectDoesNotExist
-from events.forms import EventForm, TicketForm, BuyTicketForm, ReviewForm, ContactForm
+from django.db.models import OuterRef, Subquery
+from events.forms import (
+    EventForm,
+    TicketForm,
+    BuyTicketForm,
+    ReviewForm,
+    ContactForm,
+    FacetForm,
+    NearForm,
+)
+from events.facets import (
+    FACET_LABELS,
+    active_facet_rows,
+    facet_rows,
+    filter_events,
+    selection_key,
+)
 from events import payment
+from events.gateways import PaymentError
+from events.exports import EXPORTS, FORMATS, export_response
+from events.caching import expire_started_events, get_generations, get_popular_ids
+from events.conditional import conditional
+from events.mail import enqueue_mail
+from events.membership import aget_membership, member_event_ids
+from events.routing import replica_reads
+from events.page_cache import cache_anonymous_page
+from events.pagination import apaginate_queryset, paginate_queryset
+from events.querysets import (
+    NEWEST_FIRST,
+    detail_events,
+    event_reviews,
+    listed_events,
+    search_results,
+)
 
 logger = logging.getLogger(__name__)
 
-
-def paginate_queryset(request, queryset, page_param="page", per_page=4):
-    paginator = Paginator(queryset, per_page)
-    page_number = request.GET.get(page_param)
-    return paginator.get_page(page_number)
-
-
-def event_list(request):
-    events = Event.objects.active().select_related("ticket")
-    popular = events.popular()[:4]
-    recent_list = events.recent().exclude(id__in=popular.values_list("id", flat=True))
-
-    recent = paginate_queryset(request, recent_list)
+# Templates and context processors still touch the ORM lazily, async views render in a thread
+arender = sync_to_async(render)
+
+
+def event_list_sections(request):
+    """Cache generations and popular event ids, everything the home page fragments vary on"""
+    if not hasattr(request, "_event_list_sections"):
+        generations = expire_started_events(get_generations())
+        request._event_list_sections = generations, get_popular_ids(generations["popular"])
+    return request._event_list_sections
+
+
+def event_list_state(request):
+    return list(event_list_sections(request)), None
+
+
+@replica_reads
+@cache_anonymous_page(lambda request: ["events"])
+@conditional(event_list_state)
+async def event_list(request):
+    user = await request.auser()
+    generations, popular_ids = await sync_to_async(event_list_sections)(request)
+    events = listed_events()
+    popular = events.filter(pk__in=popular_ids).popular()
+    recent_list = events.exclude(pk__in=popular_ids)
+
+    # Facets filter the recent section, loading more of it unfiltered needs no counts
+    rows = []
+    if not request.htmx or any(name in request.GET for name in FACET_LABELS):
+        rows = await sync_to_async(active_facet_rows)()
+        # The home page only lists upcoming events
+        rows = [row for row in rows if row["when"] != "past"]
+    facet_form = FacetForm(request.GET, rows=rows)
+    selection = facet_form.selection()
+    facet_key = ""
+    if selection:
+        # Popular events match filters too, their edits bump the popular generation
+        recent_list = filter_events(events, selection)
+        facet_key = f"{generations['popular']}:{selection_key(selection)}"
+
+    # Sections stay lazy, they are only queried when their cached fragment is stale
+    recent = paginate_queryset(request, recent_list, ordering=NEWEST_FIRST)
+    popular_key = ",".join(popular_ids)
     if request.htmx:
-        return render(request, "partials/_recent_events.html", {"recent": recent})
+        return await arender(
+            request,
+            "partials/_recent_events.html",
+            {
+                "recent": recent,
+                "generations": generations,
+                "popular_key": popular_key,
+                "facet_key": facet_key,
+            },
+        )
 
-    context = {"events": events[:4], "popular": popular, "recent": recent}
-    return render(request, "event_list.html", context)
+    context = {
+        "events": events[:4],
+        "popular": popular,
+        "recent": recent,
+        "generations": generations,
+        "popular_key": popular_key,
+        "facet_key": facet_key,
+        "facets": facet_form.facets(rows),
+    }
+    if user.is_authenticated:
+        context["member_events"] = member_event_ids(await aget_membership(user))
+    return await arender(request, "event_list.html", context)
 
 
-def event_detail(request, pk):
-    user = request.user
-    event = get_object_or_404(
-        Event.objects.select_related("created_by").annotate(
-            avg_rating=Round(Avg("reviews__rating"), 2), review_count=Count("reviews")
-        ),
-        pk=pk,
+def event_detail_state(request, pk):
+    latest_review = Review.objects.filter(event=OuterRef("pk")).order_by("-created_at")
+    latest_purchase = Purchase.objects.filter(ticket__event=OuterRef("pk")).order_by(
+        "-purchased_at"
+    )
+    state = (
+        Event.objects.filter(pk=pk)
+        .annotate(
+            latest_review=Subquery(latest_review.values("created_at")[:1]),
+            latest_purchase=Subquery(latest_purchase.values("purchased_at")[:1]),
+        )
+        .values_list(
+            "updated_at",
+            "status",
+            "registration_count",
+            "review_count",
+            "rating_sum",
+            "ticket__quantity",
+            "latest_review",
+            "latest_purchase",
+        )
+        .first()
+    )
+    if state is None:
+        return None
+
+    # Counter updates touch updated_at, ticket stock only changes with a purchase
+    updated_at, *_, latest_review, latest_purchase = state
+    return state, max(filter(None, (updated_at, latest_review, latest_purchase)))
+
+
+@replica_reads
+@cache_anonymous_page(lambda request, pk: [f"event:{pk}"])
+@conditional(event_detail_state)
+async def event_detail(request, pk):
+    user = await request.auser()
+    event = await detail_events().filter(pk=pk).afirst()
+    if event is None:
+        if await ArchivedEvent.objects.filter(pk=pk).aexists():
+            return redirect("archived_event_detail", pk=pk, permanent=True)
+        raise Http404()
+    reviews = await apaginate_queryset(
+        request, event_reviews(event), ordering=NEWEST_FIRST, per_page=4
     )
-    reviews = paginate_queryset(request, event.reviews.all().select_related("user"), per_page=4)
 
     if request.htmx:
-        return render(
+        return await arender(
             request,
             "partials/_reviews.html",
             {"event": event, "reviews": reviews},
@@ -73,14 +188,31 @@ def event_detail(request, pk):
     }
 
     if user.is_authenticated:
-        context["has_reviewed"] = Review.objects.filter(user=user, event=event).exists()
+        membership = await aget_membership(user)
+        context["has_reviewed"] = event.pk in membership["reviewed"]
+        context["has_joined"] = event.pk in membership["purchased" if event.is_paid else "joined"]
 
-        if event.is_paid:
-            context["has_joined"] = Purchase.objects.filter(user=user, ticket__event=event).exists()
-        else:
-            context["has_joined"] = Registration.objects.filter(event=event, user=user).exists()
+    return await arender(request, "event_detail.html", context)
 
-    return render(request, "event_detail.html", context)
+
+@replica_reads
+@cache_anonymous_page(lambda request, pk: [f"event:{pk}"])
+async def archived_event_detail(request, pk):
+    user = await request.auser()
+    event = await aget_object_or_404(ArchivedEvent.objects.select_related("created_by"), pk=pk)
+    if not event.is_active and (user.is_anonymous or not event.is_allowed_to_view(user)):
+        raise Http404()
+
+    reviews = await apaginate_queryset(
+        request,
+        event.reviews.all().select_related("user"),
+        ordering=("-created_at", "-id"),
+        per_page=4,
+    )
+    context = {"event": event, "reviews": reviews, "archived": True}
+    if request.htmx:
+        return await arender(request, "partials/_reviews.html", context)
+    return await arender(request, "archived_event_detail.html", context)
 
 
 @login_required
@@ -144,7 +276,7 @@ def event_update(request, pk, ticket_form=None):
             updated_event = event_form.save(commit=False)
 
             if updated_event.is_free:
-                updated_event.save()
+                updated_event.save_changes()
                 logger.info(f"Event {event.id} was updated by {request.user.id}")
                 messages.success(request, "Event was updated.")
                 return redirect("event_detail", pk=pk)
@@ -155,10 +287,10 @@ def event_update(request, pk, ticket_form=None):
                     pass
 
                 if ticket_form.is_valid():
-                    updated_event.save()
+                    updated_event.save_changes()
                     ticket = ticket_form.save(commit=False)
                     ticket.event = updated_event
-                    ticket.save()
+                    ticket.save_changes()
                     messages.success(request, "Event was updated.")
                     return redirect("event_detail", pk=pk)
     else:
@@ -182,8 +314,20 @@ def event_delete(request, pk):
     return render(request, "event_delete.html", {"event": event})
 
 
+@login_required
+def event_export(request, pk, kind):
+    event = get_object_or_404(Event, pk=pk, created_by=request.user)
+    fmt = request.GET.get("format", "csv")
+    if kind not in EXPORTS or fmt not in FORMATS:
+        raise Http404()
+
+    logger.info(f"User {request.user.id} exported {kind} of event {event.id} as {fmt}")
+    return export_response(event, kind, fmt, asynchronous=isinstance(request, ASGIRequest))
+
+
 @require_POST
 @login_required
+@transaction.atomic
 def register_for_event(request, pk):
     event = get_object_or_404(Event, pk=pk)
     register, created = Registration.objects.get_or_create(event=event, user=request.user)
@@ -198,8 +342,9 @@ def register_for_event(request, pk):
 
 
 @login_required
-def buy_ticket(request, pk):
-    event = get_object_or_404(Event.objects.select_related("ticket"), pk=pk)
+async def buy_ticket(request, pk):
+    user = await request.auser()
+    event = await aget_object_or_404(Event.objects.select_related("ticket"), pk=pk)
     form = BuyTicketForm(request.POST, ticket=event.ticket)
 
     if request.method == "POST":
@@ -213,7 +358,7 @@ def buy_ticket(request, pk):
             cancel_url = request.build_absolute_uri(reverse("ticket_buy", kwargs={"pk": event.pk}))
 
             try:
-                checkout_url = payment.start_checkout_session(
+                checkout_url = await payment.astart_checkout_session(
                     success_url=success_url,
                     cancel_url=cancel_url,
                     price=event.ticket.price_to_cents,
@@ -223,19 +368,21 @@ def buy_ticket(request, pk):
                         "description": event.description,
                         "images": [event.get_banner_url()],
                     },
+                    metadata={"user_id": str(user.id), "event_id": str(event.pk)},
                 )
                 logger.info(
-                    f"User {request.user.id} started payment on ticket {event.ticket.id} for {quantity} qty."
+                    f"User {user.id} started payment on ticket {event.ticket.id} "
+                    f"for {quantity} qty."
                 )
                 return redirect(checkout_url)
-            except stripe.error.StripeError as e:
-                logger.error(f"Stripe error: {e}")
+            except PaymentError as e:
+                logger.error(f"Payment error: {e}")
                 messages.error(
                     request,
                     "There was an error processing your payment. Please try again.",
                 )
 
-    return render(
+    return await arender(
         request,
         "ticket_buy.html",
         {"event": event, "form": form, "stripe_public_key": settings.STRIPE_API_PUBLIC},
@@ -243,57 +390,103 @@ def buy_ticket(request, pk):
 
 
 @login_required
-def payment_success(request, pk):
+async def payment_success(request, pk):
+    user = await request.auser()
     session_id = request.GET.get("session_id")
+    # Without a session the filter would match older purchases with no session_id
+    if not session_id:
+        raise Http404()
+    purchase = await Purchase.objects.filter(session_id=session_id, user=user).afirst()
 
-    checkout_session = payment.get_checkout_session(session_id)
-
-    quantity = int(checkout_session.metadata.get("quantity", 1))
-    amount_paid = int(checkout_session.amount_total)
-
-    try:
-        event = Event.objects.get(pk=pk)
-    except ObjectDoesNotExist:
-        messages.error(request, "Event not found.")
-        return redirect("event_list")
+    if purchase is None:
+        messages.info(
+            request,
+            "Payment received. Your tickets will appear in your account in a moment.",
+        )
+        return redirect("account_detail")
 
-    purchase = Ticket.buy(request.user, event, quantity, amount_paid)
     messages.success(
         request,
-        f"Purchased {quantity} tickets for {event.title}.",
+        f"Purchased {purchase.quantity} tickets for {purchase.event_name}.",
     )
-    logger.info(f"User {request.user.id} purchased successfully {quantity} tickets for {event}")
     return redirect("purchase_detail", pk=purchase.pk)
 
 
+@csrf_exempt
+@require_POST
+def stripe_webhook(request):
+    try:
+        webhook_event = payment.construct_webhook_event(
+            request.body, request.headers.get("Stripe-Signature")
+        )
+    except ValueError as e:
+        logger.warning(f"Rejected Stripe webhook: {e}")
+        return HttpResponse(status=400)
+
+    try:
+        payment.handle_webhook_event(webhook_event)
+    except PaymentError as e:
+        # The refund of an unfulfillable session failed, Stripe redelivers on errors
+        logger.error(f"Could not refund Stripe event {webhook_event['id']}: {e}")
+        return HttpResponse(status=502)
+
+    return HttpResponse(status=200)
+
+
 @login_required
 def purchase_detail(request, pk):
-    purchase = get_object_or_404(
-        Purchase.objects.select_related("ticket__event", "user"),
-        pk=pk,
-        user_id=request.user.id,
+    purchase = (
+        Purchase.objects.select_related("ticket__event", "user")
+        .filter(pk=pk, user_id=request.user.id)
+        .first()
     )
+    if purchase is not None:
+        event, archived = purchase.ticket.event, False
+    else:
+        # Archived purchases keep their id
+        purchase = get_object_or_404(
+            ArchivedPurchase.objects.select_related("event", "user"),
+            pk=pk,
+            user_id=request.user.id,
+        )
+        event, archived = purchase.event, True
 
-    return render(request, "purchase_detail.html", {"purchase": purchase})
+    return render(
+        request,
+        "purchase_detail.html",
+        {"purchase": purchase, "event": event, "archived": archived},
+    )
 
 
-def event_search(request):
+@replica_reads
+@cache_anonymous_page(lambda request: ["events"])
+async def event_search(request):
+    user = await request.auser()
     query = request.GET.get("q")
-    if query:
-        events = Event.objects.active().filter(title__icontains=query).select_related("ticket")
-        event_obj = paginate_queryset(request, events)
+    near = NearForm(request.GET)
+    events, ordering = search_results(query, near.cleaned_data if near.is_valid() else None)
+
+    # Counts of the unfiltered approved events are cached, narrowed ones take one query
+    if query or near.is_valid():
+        rows = await sync_to_async(facet_rows)(events)
     else:
-        events = Event.objects.all().select_related("ticket")
-        event_obj = paginate_queryset(request, events)
+        rows = await sync_to_async(active_facet_rows)()
+    facet_form = FacetForm(request.GET, rows=rows)
+    events = filter_events(events, facet_form.selection())
+    event_obj = await apaginate_queryset(request, events, ordering=ordering)
+    facets = facet_form.facets(rows)
 
     if request.htmx:
-        return render(
+        return await arender(
             request,
             "partials/_event_search.html",
-            {"events": event_obj, "query": query},
+            {"events": event_obj, "query": query, "facets": facets},
         )
 
-    return render(request, "event_search.html", {"events": event_obj, "query": query})
+    context = {"events": event_obj, "query": query, "near": near, "facets": facets}
+    if user.is_authenticated:
+        context["member_events"] = member_event_ids(await aget_membership(user))
+    return await arender(request, "event_search.html", context)
 
 
 class ContactFormView(FormView):
@@ -302,7 +495,7 @@ class ContactFormView(FormView):
     success_url = "/thanks/"
 
     def form_valid(self, form):
-        send_mail(
+        enqueue_mail(
             subject="Contact Form",
             message=form.cleaned_data["message"],
             from_email=form.cleaned_data["email"],
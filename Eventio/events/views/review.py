@@ -1,12 +1,14 @@
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db import transaction
 from events.models import Event, Review
 from events.forms import ReviewForm
 from django_htmx.http import HttpResponseClientRefresh, reswap, retarget
 
 
 @login_required
+@transaction.atomic
 def review_create(request, pk):
     event = get_object_or_404(Event, id=pk)
     review_form = ReviewForm(request.POST)
@@ -31,6 +33,7 @@ def review_create(request, pk):
 
 
 @login_required
+@transaction.atomic
 def review_delete(request, pk):
     review = get_object_or_404(Review, pk=pk, user=request.user)
 